@@ -1,40 +1,533 @@
+import asyncio
+import json
+import os
 import uvicorn
-from fastapi import FastAPI
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import Manager
+from queue import Empty, Queue
+from threading import Event
+from contextlib import asynccontextmanager
+from time import perf_counter, time
+from typing import Any, AsyncIterator, Optional, Union
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.params import Query
 from fastapi.middleware.cors import CORSMiddleware
-from rubik.cubes import Cube
-from rubik.solvers import KociembaSolver
+from rubik.cubes import Cube, Tables
+from rubik.cubes.coordinates import STATUS_MESSAGES, cube_status
+from rubik.metrics import Registry, enable_tracing, span
+from rubik.solvers import SolutionCache, SolveResult, load_tables, solve_cube
 
+# The number of processes solving cubes
+WORKERS = int(os.environ.get("RUBIK_API_WORKERS", os.cpu_count() or 1))
+# The number of solves that may wait for a free process before requests are turned away
+MAX_QUEUED = int(os.environ.get("RUBIK_API_MAX_QUEUED", 4 * WORKERS))
+# How long a solve may take before the request fails
+TIMEOUT_MS = int(os.environ.get("RUBIK_API_TIMEOUT_MS", 10000))
 
-app = FastAPI(docs_url="/api/docs", openapi_url="/api/openapi.json")
+# The number of solutions kept in memory (0 turns the cache off), how many seconds they are kept
+# for, and the SQLite database they are also stored in, if any
+CACHE_SIZE = int(os.environ.get("RUBIK_API_CACHE_SIZE", 10000))
+CACHE_TTL = os.environ.get("RUBIK_API_CACHE_TTL")
+CACHE_FILE = os.environ.get("RUBIK_API_CACHE_FILE")
 
+cache = (
+    SolutionCache(
+        CACHE_SIZE, float(CACHE_TTL) if CACHE_TTL else None, CACHE_FILE or None
+    )
+    if CACHE_SIZE > 0
+    else None
+)
 
+# Whether to record OpenTelemetry spans of each solve, if the package is installed
+TRACING = os.environ.get("RUBIK_API_TRACING", "0") != "0"
 
+# The solves handed to the pool that have not finished yet
+pending_solves = 0
+# The error given for a cube that is turned away because too many are waiting to be solved
+OVERLOADED = "Too many cubes are being solved. Try again later."
+
+# Stands in for a line of an NDJSON batch that is not valid JSON
+INVALID_JSON = object()
+
+# The reason given in `errors_total` for each status of `cube_status`
+ERROR_REASONS = {
+    -1: "colors",
+    -2: "edges",
+    -3: "edge_flip",
+    -4: "corners",
+    -5: "corner_twist",
+    -6: "parity",
+}
+
+metrics = Registry()
+request_seconds = metrics.histogram(
+    "rubik_api_request_duration_seconds", "Seconds taken to answer a request"
+)
+solve_seconds = metrics.histogram(
+    "rubik_api_solve_duration_seconds",
+    "Seconds from handing a cube to the pool until it is solved",
+)
+search_seconds = metrics.histogram(
+    "rubik_api_search_duration_seconds", "Seconds the solver spent on a cube"
+)
+solves_total = metrics.counter(
+    "rubik_api_solves_total", "Cubes solved, by where the solution came from"
+)
+errors_total = metrics.counter(
+    "rubik_api_errors_total", "Cubes that were not solved, by reason"
+)
+table_load_seconds = metrics.gauge(
+    "rubik_api_table_load_seconds",
+    "Seconds taken at startup to load the tables here and in every worker",
+)
+metrics.gauge("rubik_api_workers", "The number of solver processes", lambda: WORKERS)
+metrics.gauge(
+    "rubik_api_pending_solves",
+    "Solves handed to the pool that have not finished",
+    lambda: pending_solves,
+)
+metrics.gauge(
+    "rubik_api_queued_solves",
+    "Solves waiting for a free process",
+    lambda: max(pending_solves - WORKERS, 0),
+)
+metrics.gauge(
+    "rubik_api_worker_utilization",
+    "The fraction of the solver processes that are busy",
+    lambda: min(pending_solves, WORKERS) / WORKERS,
+)
+
+if cache is not None:
+    metrics.counter(
+        "rubik_api_cache_hits_total", "Solutions found in the cache", lambda: cache.hits
+    )
+    metrics.counter(
+        "rubik_api_cache_misses_total",
+        "Solutions not found in the cache",
+        lambda: cache.misses,
+    )
+    metrics.counter(
+        "rubik_api_cache_evictions_total",
+        "Solutions dropped from the cache",
+        lambda: cache.evictions,
+    )
+    metrics.gauge(
+        "rubik_api_cache_size",
+        "Solutions kept in memory",
+        lambda: cache.stats()["size"],
+    )
+    metrics.gauge(
+        "rubik_api_cache_hit_ratio",
+        "The fraction of lookups that found a solution in the cache",
+        lambda: cache.hits / max(cache.hits + cache.misses, 1),
+    )
+
+if TRACING:
+    enable_tracing("rubik.api")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Map the tables before taking requests, both here and in every worker, so that the first
+    # requests do not pay for it
+    start = perf_counter()
+    Tables()
+    app.state.executor = ProcessPoolExecutor(WORKERS, initializer=load_tables)
+    # Hands the solutions found by the workers to `solve_stream` as they come
+    app.state.manager = Manager()
+    await asyncio.gather(
+        *(
+            asyncio.get_running_loop().run_in_executor(app.state.executor, load_tables)
+            for i in range(WORKERS)
+        )
+    )
+    table_load_seconds.set(perf_counter() - start)
+
+    yield
+
+    app.state.executor.shutdown(cancel_futures=True)
+    app.state.manager.shutdown()
+
+
+app = FastAPI(docs_url="/api/docs", openapi_url="/api/openapi.json", lifespan=lifespan)
+
+
+@app.middleware("http")
+async def measure(request: Request, call_next):
+    start = perf_counter()
+    with span("request", path=request.url.path):
+        response = await call_next(request)
+
+    # Label by route rather than by path, so that unknown paths do not each add a series.
+    # Streamed responses are measured until they start.
+    route = request.scope.get("route")
+    if route is not None:
+        request_seconds.observe(
+            perf_counter() - start,
+            endpoint=route.path,
+            status=str(response.status_code),
+        )
+    return response
+
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """
+    Serves the metrics of the service in the Prometheus text format.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+def _prepare(cube_str: str, index: int = 0) -> Union[Cube, SolveResult]:
+    """
+    Returns the cube to hand to the pool, or its result straight away if it cannot be solved
+    or its solution is cached.
+    """
+    start = time()
 
-@app.get("/api/solve")
-async def solve(cube_str: str = Query(..., alias="cube", min_length=54, max_length=54)):  
-    
-    cube: Cube
-    solver: KociembaSolver
     try:
-        cube = Cube(cube_str)
+        with span("parse"):
+            cube = Cube(cube_str)
     except ValueError as e:
-        print(str(e))
-        return {"error": str(e)}
+        errors_total.inc(reason="malformed")
+        return SolveResult(index, cube_str, [], str(e), 0)
 
-    try:
-        solver = KociembaSolver(cube)
-        solver.solve()
-    except KeyError as e:  
-        return {"error": "Piece for a color is missing."}
-    except Exception as e:
-        return {"error": str(e)}
-
-    return {
+    with span("validate"):
+        status = cube_status(cube.facelets)
+    if status != 0:
+        errors_total.inc(reason=ERROR_REASONS[status])
+        return SolveResult(index, cube_str, [], STATUS_MESSAGES[status], 0)
+
+    if cache is not None:
+        moves = cache.get(cube)
+        if moves is not None:
+            solves_total.inc(source="cache")
+            return SolveResult(index, cube_str, moves, None, round(time() - start, 5))
+
+    return cube
+
+
+def _overloaded() -> bool:
+    """
+    Returns whether the pool already has as many solves as it may queue, in which case
+    another one is turned away and counted as an error.
+    """
+    if pending_solves < WORKERS + MAX_QUEUED:
+        return False
+
+    errors_total.inc(reason="overloaded")
+    return True
+
+
+def _submit(
+    cube: Cube,
+    index: int = 0,
+    max_length: Optional[int] = None,
+    timeout_ms: Optional[int] = None,
+    updates: Optional[Queue] = None,
+    collect_stats: bool = False,
+    stop: Optional[Event] = None,
+) -> asyncio.Future:
+    """
+    Hands `cube` to the pool. The solver gives up by itself once the time runs out, so that a
+    process is not kept busy for long with a solve that nobody is waiting for any more.
+
+    The solve counts as pending until the pool is done with it. Cancelling the returned future
+    or timing out waiting for it only drops a solve that has not started yet, while setting
+    `stop` ends a running one early.
+    """
+    global pending_solves
+
+    pending_solves += 1
+    submitted = perf_counter()
+    loop = asyncio.get_running_loop()
+    future = app.state.executor.submit(
+        solve_cube,
+        str(cube),
+        max_length,
+        timeout_ms,
+        "recursive",
+        TIMEOUT_MS,
+        index,
+        updates,
+        collect_stats,
+        stop,
+    )
+
+    def done(future: Future):
+        global pending_solves
+
+        pending_solves -= 1
+        if future.cancelled() or future.exception() is not None:
+            return
+
+        result = future.result()
+        if result.error is not None:
+            errors_total.inc(reason="unsolved")
+            return
+
+        solve_seconds.observe(perf_counter() - submitted)
+        search_seconds.observe(result.time_to_solve)
+        solves_total.inc(source="search")
+        if cache is not None:
+            cache.put(cube, result.moves)
+
+    # Called from a thread of the pool, so the work is handed to the event loop
+    future.add_done_callback(lambda future: loop.call_soon_threadsafe(done, future))
+    return asyncio.wrap_future(future)
+
+
+@app.get("/api/solve")
+async def solve(
+    cube_str: str = Query(..., alias="cube", min_length=54, max_length=54),
+    stats: bool = Query(False),
+):
+    """
+    Solves a cube. With `stats`, the response also describes what the search did (see
+    `SolverStats`), unless the solution was cached and no search was needed.
+    """
+    result = _prepare(cube_str)
+
+    if isinstance(result, Cube):
+        if _overloaded():
+            raise HTTPException(
+                status_code=503, detail=OVERLOADED, headers={"Retry-After": "1"}
+            )
+
+        try:
+            with span("search"):
+                result = await asyncio.wait_for(
+                    _submit(result, collect_stats=stats), TIMEOUT_MS / 1000
+                )
+        except asyncio.TimeoutError:
+            errors_total.inc(reason="timeout")
+            raise HTTPException(status_code=504, detail="The solve timed out.")
+
+    if result.error is not None:
+        return {"error": result.error}
+
+    with span("verify"):
+        cube = Cube(cube_str)
+        cube.apply(result.moves)
+        if not cube.is_solved():
+            errors_total.inc(reason="wrong_solution")
+            raise HTTPException(status_code=500, detail="The solution is wrong.")
+
+    response = {
         "cube": str(cube),
-        "moves": solver.moves,
-        "timeToSolve": solver.time_to_solve,
+        "moves": result.moves,
+        "timeToSolve": result.time_to_solve,
     }
+    if stats:
+        response["stats"] = result.stats
+
+    return response
+
+
+async def _batch_items(request: Request) -> AsyncIterator[tuple[int, Any, str]]:
+    """
+    Yields the cubes of a batch request along with their positions and the text they were
+    sent as, either from a JSON list or from an NDJSON body as its lines arrive. Lines that are
+    not valid JSON are yielded as `INVALID_JSON`.
+    """
+    if request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            items = json.loads(await request.body())
+        except ValueError:
+            items = None
+
+        if not isinstance(items, list):
+            raise HTTPException(
+                status_code=400, detail="Expected a list of cube strings."
+            )
+
+        for index, item in enumerate(items):
+            yield index, item, json.dumps(item)
+        return
+
+    index = 0
+    buffer = b""
+    async for data in request.stream():
+        *lines, buffer = (buffer + data).split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _parse_line(index, line)
+                index += 1
+
+    if buffer.strip():
+        yield _parse_line(index, buffer)
+
+
+def _parse_line(index: int, line: bytes) -> tuple[int, Any, str]:
+    text = line.decode(errors="replace").strip()
+    try:
+        return index, json.loads(line), text
+    except ValueError:
+        return index, INVALID_JSON, text
+
+
+def _batch_line(result: SolveResult) -> bytes:
+    return (
+        json.dumps(
+            {
+                "index": result.index,
+                "cube": result.cube_str,
+                "moves": result.moves,
+                "timeToSolve": result.time_to_solve,
+                "error": result.error,
+            }
+        ).encode()
+        + b"\n"
+    )
+
+
+@app.post("/api/solve/batch")
+async def solve_batch(request: Request):
+    """
+    Solves a JSON list of cube strings, or an NDJSON stream of them (one cube string, or object
+    with a "cube" field, per line), and streams a line of NDJSON back for each one as soon as
+    it is solved. The whole batch is turned away if the pool is overloaded when it starts,
+    and each cube that comes while it is overloaded gets an error line.
+    """
+    if _overloaded():
+        raise HTTPException(
+            status_code=503, detail=OVERLOADED, headers={"Retry-After": "1"}
+        )
+
+    items = _batch_items(request)
+    # Check the body up front, so that a malformed one is reported before the response starts
+    first = await anext(items, None)
+
+    async def results() -> AsyncIterator[bytes]:
+        running: set[asyncio.Future] = set()
+
+        async def items_from_first() -> AsyncIterator[tuple[int, Any, str]]:
+            if first is not None:
+                yield first
+                async for item in items:
+                    yield item
+
+        try:
+            async for index, item, text in items_from_first():
+                if item is INVALID_JSON:
+                    errors_total.inc(reason="malformed")
+                    yield _batch_line(
+                        SolveResult(index, text, [], "Expected a line of JSON.", 0)
+                    )
+                    continue
+
+                if isinstance(item, dict):
+                    item = item.get("cube")
+                if not isinstance(item, str):
+                    errors_total.inc(reason="malformed")
+                    yield _batch_line(
+                        SolveResult(index, text, [], "Expected a cube string.", 0)
+                    )
+                    continue
+
+                result = _prepare(item, index)
+                if isinstance(result, Cube) and _overloaded():
+                    yield _batch_line(SolveResult(index, item, [], OVERLOADED, 0))
+                elif isinstance(result, Cube):
+                    running.add(_submit(result, index))
+                else:
+                    yield _batch_line(result)
+
+                # Send what is done already, and keep the pool busy without taking more than
+                # its share of it
+                if len(running) >= 2 * WORKERS:
+                    done, running = await asyncio.wait(
+                        running, return_when=asyncio.FIRST_COMPLETED
+                    )
+                else:
+                    done = {future for future in running if future.done()}
+                    running -= done
+
+                for future in done:
+                    yield _batch_line(future.result())
+
+            for future in asyncio.as_completed(running):
+                yield _batch_line(await future)
+        finally:
+            # The client may have gone away
+            for future in running:
+                future.cancel()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+def _event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.get("/api/solve/stream")
+async def solve_stream(
+    cube_str: str = Query(..., alias="cube", min_length=54, max_length=54),
+    max_length: Optional[int] = Query(None, alias="maxLength", ge=0),
+    timeout_ms: Optional[int] = Query(None, alias="timeoutMs", ge=0, le=TIMEOUT_MS),
+):
+    """
+    Streams Server-Sent Events with each shorter solution as soon as it is found, until one
+    of at most `maxLength` moves is found or `timeoutMs` milliseconds have passed. A
+    "solution" event is sent for each one, then a "done" event with the best one (or an
+    "error" event).
+    """
+    start = time()
+    result = _prepare(cube_str)
+
+    if isinstance(result, SolveResult):
+        if result.error is None and (
+            max_length is None or len(result.moves) > max_length
+        ):
+            # The cached solution is not short enough
+            result = Cube(cube_str)
+
+    if isinstance(result, Cube) and _overloaded():
+        raise HTTPException(
+            status_code=503, detail=OVERLOADED, headers={"Retry-After": "1"}
+        )
+
+    async def events() -> AsyncIterator[str]:
+        final = result
+
+        if isinstance(final, Cube):
+            loop = asyncio.get_running_loop()
+            updates = app.state.manager.Queue()
+            stop = app.state.manager.Event()
+            future = _submit(final, 0, max_length, timeout_ms, updates, stop=stop)
+
+            try:
+                while True:
+                    try:
+                        moves = await loop.run_in_executor(None, updates.get, True, 0.1)
+                    except Empty:
+                        if future.done():
+                            break
+                        continue
+
+                    yield _event(
+                        "solution",
+                        {"moves": moves, "elapsed": round(time() - start, 5)},
+                    )
+            finally:
+                # The client may have gone away, so stop the solve rather than leave the process
+                # busy until the time runs out
+                if not future.done():
+                    stop.set()
+                    future.cancel()
+
+            final = future.result()
+
+        if final.error is not None:
+            yield _event("error", {"error": final.error})
+        else:
+            yield _event(
+                "done",
+                {"moves": final.moves, "elapsed": round(time() - start, 5)},
+            )
+
+    return StreamingResponse(events(), media_type="text/event-stream")
 
 
 if __name__ == "__main__":
@@ -1,6 +1,6 @@
 from argparse import ArgumentParser
 from rubik.cubes import Cube, print_cube
-from rubik.solvers import KociembaSolver
+from rubik.solvers import KociembaSolver, ParallelKociembaSolver
 
 
 def main():
@@ -16,6 +16,13 @@ def main():
         type=str,
         help="A 54-character string with the colors of each face of the cube",
     )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="The number of processes to search for the solution with (default: 1)",
+    )
 
     args = parser.parse_args()
     cube_str: str = args.cube_str
@@ -41,7 +48,10 @@ def main():
     print()
 
     try:
-        solver = KociembaSolver(cube)
+        if args.workers > 1:
+            solver = ParallelKociembaSolver(cube, args.workers)
+        else:
+            solver = KociembaSolver(cube)
         solver.solve()
     except Exception as e:
         print(f"rubik: error: {e}")
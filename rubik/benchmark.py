@@ -1,77 +1,406 @@
+"""
+Benchmarks the solvers on seeded corpora of scrambled cubes.
+
+Each corpus is generated from the seed alone, so every run solves the same cubes and runs can
+be compared with each other. After a few untimed warm-up solves, every cube is timed on its
+own, and the report gives percentiles of the times rather than the mean alone, which a few
+slow cubes would skew. The report can be written as JSON and compared with that of an earlier
+run, failing if any solver got slower by more than a threshold.
+"""
+import gc
+import json
+import platform
+import sys
+import tracemalloc
+import zlib
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+from time import perf_counter
+from typing import Any, Optional
+import numpy as np
 from prettytable import PrettyTable
-from rubik.cubes import Cube
-from rubik.solvers import KociembaSolver, Solver, KociembaFastSolver
+from rubik.cubes import Cube, CubeBatch, Tables
+from rubik.solvers import KociembaFastSolver, KociembaSolver
+from rubik.solvers.kociembasolver import ENGINES, SolverStats
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# The number of random moves made to scramble the cubes of each corpus, or `None` for cubes
+# drawn uniformly from every state
+CORPORA = {
+    "moves-10": 10,
+    "moves-25": 25,
+    "moves-40": 40,
+    "random-state": None,
+}
+
+# The engines of `KociembaSolver`, and "c" for `KociembaFastSolver`
+SOLVERS = [*ENGINES, "c"]
+
+# The percentiles of the solve times that are reported
+PERCENTILES = (50, 95, 99)
+
+# The number of cubes of each corpus whose memory use is measured. Tracing allocations slows
+# solving down, so this is done apart from the timed solves.
+MEMORY_SAMPLE = 10
+
+
+def corpus(name: str, size: int, seed: int = 0) -> list[str]:
+    """
+    Returns the cube strings of `size` cubes scrambled as corpus `name` of `CORPORA` says. The
+    same seed always gives the same cubes, and a larger size only adds cubes at the end.
+    """
+    shuffles_num = CORPORA[name]
+    # Each cube gets a generator of its own, so that it does not depend on `size`
+    seeds = np.random.SeedSequence([seed, zlib.crc32(name.encode())]).spawn(size)
+    cube_strs = []
+
+    for cube_seed in seeds:
+        rng = np.random.default_rng(cube_seed)
+        if shuffles_num is None:
+            batch = CubeBatch.random_states(1, rng)
+        else:
+            batch = CubeBatch.solved(1)
+            batch.randomize(shuffles_num, rng)
+        cube_strs.extend(batch.cube_strs())
+
+    return cube_strs
+
+
+def _solver(name: str, cube_str: str):
+    if name == "c":
+        return KociembaFastSolver(Cube(cube_str))
+
+    solver = KociembaSolver(Cube(cube_str), engine=name, collect_stats=True)
+    solver.verbose = False
+    return solver
+
+
+def _peak_rss() -> Optional[float]:
+    """
+    Returns the most memory this process has held at once so far, in MiB.
+    """
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in KiB elsewhere
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
 
 
 def benchmark(
-    trials: int = 100,
-    shuffles_num: int = 10,
-    solver_cls: type[Solver] = KociembaSolver,
-) -> list[int | float]:
+    solver_name: str,
+    cube_strs: list[str],
+    warmup_strs: list[str] = (),
+    repeats: int = 3,
+) -> dict[str, Any]:
+    """
+    Solves each of `cube_strs` with the solver named `solver_name` (see `SOLVERS`) after
+    solving `warmup_strs` untimed, and returns statistics of the solves. Each cube is solved
+    `repeats` times and its fastest time is kept, as anything slower than that is noise from
+    the rest of the system.
+    """
+    for cube_str in warmup_strs:
+        _solver(solver_name, cube_str).solve()
+
     times: list[float] = []
     moves: list[int] = []
+    nodes: list[int] = []
+    stats: list[SolverStats] = []
+
+    gc.collect()
+    for cube_str in cube_strs:
+        fastest = float("inf")
+        for i in range(repeats):
+            solver = _solver(solver_name, cube_str)
+            start = perf_counter()
+            solver.solve()
+            fastest = min(fastest, perf_counter() - start)
+        times.append(fastest)
 
-    for i in range(trials):
-        cube = Cube("RRRRRRRRRBBBBBBBBBWWWWWWWWWGGGGGGGGGYYYYYYYYYOOOOOOOOO")
-        cube.randomize(shuffles_num)
+        moves.append(len(solver.moves))
+        if isinstance(solver, KociembaSolver):
+            nodes.append(sum(solver.nodes))
+            stats.append(solver.stats)
 
-        solver = solver_cls(cube)
+    # Measure the memory allocated by a few more solves, apart from the timed ones
+    peak_allocated = 0
+    tracemalloc.start()
+    for cube_str in cube_strs[:MEMORY_SAMPLE]:
+        solver = _solver(solver_name, cube_str)
+        tracemalloc.reset_peak()
         solver.solve()
+        peak_allocated = max(peak_allocated, tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
 
-        times.append(solver.time_to_solve)
-        moves.append(len(solver.moves))
+    times_ms = np.array(times) * 1000
+    return {
+        "cubes": len(cube_strs),
+        "time_ms": {
+            "mean": round(float(times_ms.mean()), 4),
+            "stdev": round(float(times_ms.std(ddof=1)), 4) if len(times) > 1 else 0,
+            "min": round(float(times_ms.min()), 4),
+            "max": round(float(times_ms.max()), 4),
+            **{
+                f"p{q}": round(float(value), 4)
+                for q, value in zip(PERCENTILES, np.percentile(times_ms, PERCENTILES))
+            },
+        },
+        "moves": {
+            "mean": round(float(np.mean(moves)), 2),
+            "min": min(moves),
+            "max": max(moves),
+        },
+        "nodes_mean": round(float(np.mean(nodes)), 1) if nodes else None,
+        "nodes_per_second": round(sum(nodes) / sum(times)) if nodes else None,
+        # The means of `SolverStats`, with the counts at each depth added up
+        "stats": (
+            {
+                field: round(
+                    float(np.mean([np.sum(getattr(s, field)) for s in stats])), 6
+                )
+                for field in SolverStats._fields
+            }
+            if stats
+            else None
+        ),
+        "peak_allocated_kib": round(peak_allocated / 2**10, 1),
+        "peak_rss_mib": _peak_rss(),
+    }
 
-    average_time = round(sum(times) / trials, 5)
-    average_moves = sum(moves) / trials
-
-    return [
-        shuffles_num,
-        average_time,
-        round(min(times), 5),
-        round(max(times), 5),
-        average_moves,
-        min(moves),
-        max(moves),
-    ]
 
+def run(
+    solvers: list[str],
+    corpora: list[str],
+    trials: int = 100,
+    seed: int = 0,
+    warmup: int = 10,
+    repeats: int = 3,
+) -> dict[str, Any]:
+    """
+    Benchmarks each of `solvers` on `trials` cubes of each of `corpora`, and returns a report
+    that `compare` can take.
+    """
+    # Load the tables before timing anything
+    Tables()
 
-def main():
+    results = {}
+    for corpus_name in corpora:
+        # Warm up on the cubes after the timed ones
+        cube_strs = corpus(corpus_name, trials + warmup, seed)
+        for solver_name in solvers:
+            results[f"{solver_name}/{corpus_name}"] = benchmark(
+                solver_name, cube_strs[:trials], cube_strs[trials:], repeats
+            )
+
+    return {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "numpy": np.__version__,
+            "trials": trials,
+            "seed": seed,
+            "warmup": warmup,
+            "repeats": repeats,
+        },
+        "results": results,
+    }
+
+
+# The statistics that `compare` checks, and whether a higher value is worse
+COMPARED = {
+    ("time_ms", "p50"): True,
+    ("time_ms", "p95"): True,
+    ("nodes_per_second",): False,
+}
+
+
+def _statistic(result: dict[str, Any], path: tuple[str, ...]) -> Optional[float]:
+    for key in path:
+        result = result.get(key) if result is not None else None
+    return result
+
+
+def compare(
+    report: dict[str, Any], baseline: dict[str, Any], threshold: float = 0.1
+) -> tuple[PrettyTable, bool]:
     """
-    Generates a series of statistics about the running time and move count for
-    increasingly shuffled cubes. These statistics are calculated over a 100 trials.
+    Compares the results of `report` with those of `baseline` for every solver and corpus in
+    both, and returns a table of the changes and whether any statistic got worse by more than
+    `threshold` (a fraction of its baseline value).
     """
     table = PrettyTable()
-    table.title = "My Implementation"
+    table.title = f"Comparison with Baseline (Threshold {threshold:.0%})"
+    table.field_names = ["Benchmark", "Statistic", "Baseline", "Current", "Change", ""]
+    table.align["Benchmark"] = "l"
+    regressed = False
+
+    for name, result in report["results"].items():
+        if name not in baseline["results"]:
+            continue
+
+        for path, higher_is_worse in COMPARED.items():
+            current = _statistic(result, path)
+            previous = _statistic(baseline["results"][name], path)
+            if not current or not previous:
+                continue
+
+            change = current / previous - 1
+            worse = change > threshold if higher_is_worse else change < -threshold
+            regressed |= worse
+            table.add_row(
+                [
+                    name,
+                    ".".join(path),
+                    previous,
+                    current,
+                    f"{change:+.1%}",
+                    "REGRESSION" if worse else "",
+                ]
+            )
+
+    return table, regressed
+
+
+def report_table(report: dict[str, Any]) -> PrettyTable:
+    table = PrettyTable()
+    table.title = (
+        f"{report['meta']['trials']} Cubes per Corpus (Seed {report['meta']['seed']})"
+    )
     table.field_names = [
-        "Shuffles",
-        "Time",
-        "Min Time",
-        "Max Time",
-        "Moves",
-        "Min Moves",
-        "Max Moves",
-    ]
-    table.add_row(benchmark(trials=100, shuffles_num=10))
-    table.add_row(benchmark(trials=100, shuffles_num=25))
-    table.add_row(benchmark(trials=100, shuffles_num=40))
-
-    table_c = PrettyTable()
-    table_c.title = "C Implementation"
-    table_c.field_names = [
-        "Shuffles",
-        "Time",
-        "Min Time",
-        "Max Time",
+        "Benchmark",
+        "p50 (ms)",
+        "p95 (ms)",
+        "p99 (ms)",
+        "Mean (ms)",
+        "Max (ms)",
         "Moves",
-        "Min Moves",
-        "Max Moves",
+        "Nodes",
+        "Nodes/s",
+        "Phase 1 Solutions",
+        "Lookups",
+        "Peak Alloc (KiB)",
     ]
-    table_c.add_row(benchmark(shuffles_num=10, solver_cls=KociembaFastSolver))
-    table_c.add_row(benchmark(shuffles_num=25, solver_cls=KociembaFastSolver))
-    table_c.add_row(benchmark(shuffles_num=40, solver_cls=KociembaFastSolver))
+    table.align["Benchmark"] = "l"
+
+    for name, result in report["results"].items():
+        times = result["time_ms"]
+        table.add_row(
+            [
+                name,
+                times["p50"],
+                times["p95"],
+                times["p99"],
+                times["mean"],
+                times["max"],
+                result["moves"]["mean"],
+                result["nodes_mean"],
+                result["nodes_per_second"],
+                *(
+                    (stats["phase_1_solutions"], stats["table_lookups"])
+                    if (stats := result["stats"]) is not None
+                    else (None, None)
+                ),
+                result["peak_allocated_kib"],
+            ]
+        )
+
+    return table
+
+
+def main():
+    """
+    Benchmarks the solvers and prints the results, optionally writing them as JSON and
+    comparing them with an earlier run. Exits with status 1 if the comparison finds a
+    regression.
+    """
+    parser = ArgumentParser(description="Benchmark the solvers on seeded scrambles")
+    parser.add_argument(
+        "-s",
+        "--solver",
+        dest="solvers",
+        action="append",
+        choices=SOLVERS,
+        help="A solver to benchmark, given once for each (default: every solver)",
+    )
+    parser.add_argument(
+        "-c",
+        "--corpus",
+        dest="corpora",
+        action="append",
+        choices=list(CORPORA),
+        help="A corpus to solve, given once for each (default: every corpus)",
+    )
+    parser.add_argument(
+        "-n",
+        "--trials",
+        type=int,
+        default=100,
+        help="The number of timed cubes in each corpus (default: 100)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="The seed that the corpora are generated from (default: 0)",
+    )
+    parser.add_argument(
+        "--warmup",
+        type=int,
+        default=10,
+        help="The number of untimed solves before timing each solver (default: 10)",
+    )
+    parser.add_argument(
+        "-r",
+        "--repeats",
+        type=int,
+        default=3,
+        help="The number of times each cube is solved, keeping the fastest (default: 3)",
+    )
+    parser.add_argument("-o", "--output", help="A file to write the results to as JSON")
+    parser.add_argument(
+        "-b", "--baseline", help="A JSON file of earlier results to compare with"
+    )
+    parser.add_argument(
+        "-t",
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="How much worse than the baseline a result may get, as a fraction "
+        "(default: 0.1)",
+    )
+
+    args = parser.parse_args()
+    report = run(
+        args.solvers or SOLVERS,
+        args.corpora or list(CORPORA),
+        args.trials,
+        args.seed,
+        args.warmup,
+        args.repeats,
+    )
+    print(report_table(report))
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        if baseline["meta"]["seed"] != args.seed:
+            print("The baseline was run with another seed, so it solved other cubes.")
 
-    print(table)
-    print(table_c)
+        table, regressed = compare(report, baseline, args.threshold)
+        print(table)
+        if regressed:
+            sys.exit(1)
 
 
 if __name__ == "__main__":
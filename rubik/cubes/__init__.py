@@ -1,7 +1,9 @@
 from .pieces import *
 from .coordcube import *
 from .cube import *
+from .cubebatch import *
 from .cubiecube import *
 from .facecube import *
+from .moves import MoveSequence, compile_moves
 from .printer import print_cube
 from .tables import PruningTable, Tables
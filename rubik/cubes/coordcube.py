@@ -38,9 +38,12 @@ class CoordCube:
         )
 
     def move(self, move_num: int):
-        self.phase_1_corner = self.tables.twist_move[self.phase_1_corner][move_num]
-        self.phase_1_edge = self.tables.flip_move[self.phase_1_edge][move_num]
-        self.phase_1_ud_slice = self.tables.udslice_move[self.phase_1_ud_slice][move_num]  # fmt: skip
-        self.phase_2_corner = self.tables.corner_move[self.phase_2_corner][move_num]
-        self.phase_2_edge = self.tables.edge8_move[self.phase_2_edge][move_num]
-        self.phase_2_ud_slice = self.tables.edge4_move[self.phase_2_ud_slice][move_num]
+        tables = self.tables
+        self.phase_1_corner = tables.twist_move[18 * self.phase_1_corner + move_num]
+        self.phase_1_edge = tables.flip_move[18 * self.phase_1_edge + move_num]
+        self.phase_1_ud_slice = tables.udslice_move[
+            18 * self.phase_1_ud_slice + move_num
+        ]
+        self.phase_2_corner = tables.corner_move[18 * self.phase_2_corner + move_num]
+        self.phase_2_edge = tables.edge8_move[18 * self.phase_2_edge + move_num]
+        self.phase_2_ud_slice = tables.edge4_move[18 * self.phase_2_ud_slice + move_num]
@@ -0,0 +1,252 @@
+"""
+Reads the coordinates used by the solver straight from the facelets of `Cube`, for any number
+of cubes at once.
+
+Each corner and edge is identified by looking up the faces of its facelets in a table, rather
+than by building a `FaceCube` and a `CubieCube` first.
+"""
+import numpy as np
+from .cube import _FACE_STR_ORDER
+from .cubiecube import CubieCube
+from .facecube import FaceCube
+from .tablegen import (
+    flip_coordinates,
+    permutation_coordinates,
+    sorted_edges_coordinates,
+    twist_coordinates,
+    udslice_coordinates,
+)
+
+# The columns of the array returned by `facelet_coordinates`
+COORDINATES = (
+    "phase_1_corner",
+    "phase_1_edge",
+    "phase_1_ud_slice",
+    "phase_2_corner",
+    "phase_2_edge",
+    "phase_2_ud_slice",
+    "slice_sorted",
+    "u_edges",
+    "d_edges",
+)
+
+# The messages of the error codes returned by `facelet_status`, as in `CubieCube.validate`
+STATUS_MESSAGES = {
+    -1: "Not all colors appear exactly 9 times.",
+    -2: "Not all edges exist exactly once.",
+    -3: "One edge must be flipped.",
+    -4: "Not all corners exist exactly once.",
+    -5: "One corner must be twisted.",
+    -6: "Two corners or edges must be swapped.",
+}
+
+# The `Face` of each face in the order `Cube` stores them (U, L, F, R, B, D)
+_STORED_FACES = np.array([0, 4, 2, 1, 5, 3])
+
+# The index in `Cube.facelets` of each facelet of `FaceCube`
+_FACELET_INDICES = np.arange(54).reshape(6, 9)[_FACE_STR_ORDER].reshape(-1)
+_CORNER_FACELETS = _FACELET_INDICES[np.array(FaceCube.CORNER_FACELETS)]
+_EDGE_FACELETS = _FACELET_INDICES[np.array(FaceCube.EDGE_FACELETS)]
+
+
+def _cubie_lookup(colors: list[list[int]]) -> np.ndarray:
+    """
+    Returns a table mapping the faces of the facelets of a corner or edge position, as a base 6
+    number, to `orientations * piece + orientation`, or -1 if no piece has those colors.
+    """
+    orientations = len(colors[0])
+    lookup = np.full(6**orientations, -1, dtype=np.int64)
+
+    for piece, piece_colors in enumerate(colors):
+        for orientation in range(orientations):
+            # The first color of the piece is on facelet `orientation` of the position
+            rotated = np.roll(piece_colors, orientation)
+            lookup[rotated @ 6 ** np.arange(orientations - 1, -1, -1)] = (
+                orientations * piece + orientation
+            )
+
+    return lookup
+
+
+_CORNER_LOOKUP = _cubie_lookup(FaceCube.CORNER_COLORS)
+_EDGE_LOOKUP = _cubie_lookup(FaceCube.EDGE_COLORS)
+
+# Plain lists are much faster than arrays to index one entry at a time
+_STORED_FACES_LIST = _STORED_FACES.tolist()
+_CORNER_FACELETS_LIST = _CORNER_FACELETS.tolist()
+_EDGE_FACELETS_LIST = _EDGE_FACELETS.tolist()
+_CORNER_LOOKUP_LIST = _CORNER_LOOKUP.tolist()
+_EDGE_LOOKUP_LIST = _EDGE_LOOKUP.tolist()
+
+
+def facelet_cubie_cube(facelets: np.ndarray) -> CubieCube:
+    """
+    Returns the `CubieCube` of a single cube laid out like `Cube.facelets`, as
+    `FaceCube.to_cubie_cube` would. Positions whose colors match no piece get the piece one past
+    the last (corner 8 or edge 12), which `CubieCube.validate` rejects. The centers must have
+    different colors.
+    """
+    colors = facelets.tolist()
+    face_of_color = [0] * 6
+    for stored_face, color in enumerate(colors[4::9]):
+        face_of_color[color] = _STORED_FACES_LIST[stored_face]
+    faces = [face_of_color[color] for color in colors]
+
+    corners = [
+        _CORNER_LOOKUP_LIST[36 * faces[a] + 6 * faces[b] + faces[c]]
+        for a, b, c in _CORNER_FACELETS_LIST
+    ]
+    edges = [_EDGE_LOOKUP_LIST[6 * faces[a] + faces[b]] for a, b in _EDGE_FACELETS_LIST]
+
+    return CubieCube(
+        [corner // 3 if corner >= 0 else 8 for corner in corners],
+        [corner % 3 if corner >= 0 else 0 for corner in corners],
+        [edge // 2 if edge >= 0 else 12 for edge in edges],
+        [edge % 2 if edge >= 0 else 0 for edge in edges],
+    )
+
+
+def _faces(facelets: np.ndarray) -> np.ndarray:
+    """
+    Returns the `Face` that the color of each facelet belongs to, going by the centers.
+    """
+    centers = facelets.reshape(-1, 6, 9)[:, :, 4]
+    face_of_color = np.zeros((len(facelets), 6), dtype=np.int64)
+    np.put_along_axis(face_of_color, centers, _STORED_FACES[np.newaxis], axis=1)
+    return np.take_along_axis(face_of_color, facelets.astype(np.int64), axis=1)
+
+
+def facelet_cubies(
+    facelets: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns the corner permutation, corner orientation, edge permutation and edge orientation
+    of each cube in an (N, 54) array laid out like `Cube.facelets`, as `FaceCube.to_cubie_cube`
+    would. Positions whose colors match no piece hold -1.
+    """
+    faces = _faces(facelets)
+
+    corner_faces = faces[:, _CORNER_FACELETS] @ np.array([36, 6, 1])
+    corners = _CORNER_LOOKUP[corner_faces]
+    edge_faces = faces[:, _EDGE_FACELETS] @ np.array([6, 1])
+    edges = _EDGE_LOOKUP[edge_faces]
+
+    return (
+        np.where(corners >= 0, corners // 3, -1),
+        np.where(corners >= 0, corners % 3, 0),
+        np.where(edges >= 0, edges // 2, -1),
+        np.where(edges >= 0, edges % 2, 0),
+    )
+
+
+def _piece_faces(colors: list[list[int]]) -> np.ndarray:
+    """
+    Returns the faces on the facelets of a corner or edge position holding each piece, in
+    each orientation, indexed like the values of `_cubie_lookup`.
+    """
+    return np.array(
+        [
+            np.roll(piece_colors, orientation)
+            for piece_colors in colors
+            for orientation in range(len(piece_colors))
+        ]
+    )
+
+
+_CORNER_FACES = _piece_faces(FaceCube.CORNER_COLORS)
+_EDGE_FACES = _piece_faces(FaceCube.EDGE_COLORS)
+# The color index, in a cube laid out like `Cube.facelets`, of the center of each `Face`
+_FACE_COLORS = np.argsort(_STORED_FACES)
+
+
+def cubies_facelets(
+    cp: np.ndarray, co: np.ndarray, ep: np.ndarray, eo: np.ndarray
+) -> np.ndarray:
+    """
+    Returns the facelets of each cube, laid out like `Cube.facelets` and colored like a
+    solved cube, whose corners and edges are given as by `facelet_cubies`.
+    """
+    cp, co, ep, eo = (
+        np.atleast_2d(np.asarray(a, dtype=np.int64)) for a in (cp, co, ep, eo)
+    )
+    facelets = np.repeat(np.arange(6, dtype=np.uint8), 9)[np.newaxis].repeat(len(cp), 0)
+    rows = np.arange(len(cp))[:, np.newaxis, np.newaxis]
+    facelets[rows, _CORNER_FACELETS] = _FACE_COLORS[_CORNER_FACES[3 * cp + co]]
+    facelets[rows, _EDGE_FACELETS] = _FACE_COLORS[_EDGE_FACES[2 * ep + eo]]
+    return facelets
+
+
+def cube_status(facelets: np.ndarray) -> int:
+    """
+    Returns `facelet_status` of a single cube.
+    """
+    counts = np.bincount(facelets, minlength=6)
+    centers = set(facelets[4::9].tolist())
+    if (counts != 9).any() or len(centers) != 6:
+        return -1
+
+    return facelet_cubie_cube(facelets).validate()
+
+
+def _is_permutation(p: np.ndarray) -> np.ndarray:
+    return (np.sort(p, axis=1) == np.arange(p.shape[1])).all(axis=1)
+
+
+def _parities(p: np.ndarray) -> np.ndarray:
+    n = p.shape[1]
+    before = np.triu(np.ones((n, n), dtype=bool), 1)
+    return ((p[:, :, np.newaxis] > p[:, np.newaxis, :]) & before).sum(axis=(1, 2)) % 2
+
+
+def facelet_status(facelets: np.ndarray) -> np.ndarray:
+    """
+    Returns 0 for each cube in an (N, 54) array of facelets that can be solved, or the error
+    code that `CubieCube.validate` gives it (see `STATUS_MESSAGES`).
+    """
+    cp, co, ep, eo = facelet_cubies(facelets)
+    counts = (facelets[:, :, np.newaxis] == np.arange(6)).sum(axis=1)
+    centers = np.sort(facelets.reshape(-1, 6, 9)[:, :, 4], axis=1)
+
+    # Check in the same order as `CubieCube.validate`, and report the first failure
+    checks = [
+        (-1, (counts == 9).all(axis=1) & (centers == np.arange(6)).all(axis=1)),
+        (-2, _is_permutation(ep)),
+        (-3, eo.sum(axis=1) % 2 == 0),
+        (-4, _is_permutation(cp)),
+        (-5, co.sum(axis=1) % 3 == 0),
+        (-6, _parities(ep) == _parities(cp)),
+    ]
+
+    status = np.zeros(len(facelets), dtype=np.int64)
+    for code, passed in reversed(checks):
+        status[~passed] = code
+
+    return status
+
+
+def facelet_coordinates(facelets: np.ndarray) -> np.ndarray:
+    """
+    Returns an (N, 9) array with the coordinates named in `COORDINATES` of each cube in an
+    (N, 54) array of facelets. They are only meaningful for cubes that `facelet_status` accepts.
+    """
+    cp, co, ep, eo = facelet_cubies(facelets)
+    # Edges that are missing or repeated would break the coordinates of the tracked edges
+    ep = np.where(_is_permutation(ep)[:, np.newaxis], ep, np.arange(12))
+
+    def tracked(first: int) -> np.ndarray:
+        return np.where((ep >= first) & (ep < first + 4), ep - first, -1)
+
+    return np.stack(
+        [
+            twist_coordinates(co),
+            flip_coordinates(eo),
+            udslice_coordinates(ep >= 8),
+            permutation_coordinates(cp),
+            permutation_coordinates(ep[:, :8]),
+            permutation_coordinates(ep[:, 8:]),
+            sorted_edges_coordinates(tracked(8)),
+            sorted_edges_coordinates(tracked(0)),
+            sorted_edges_coordinates(tracked(4)),
+        ],
+        axis=1,
+    )
@@ -1,7 +1,145 @@
+"""
+The facelet representation of the cube that the solvers take as input.
+
+The 54 facelets are stored as a flat array of color indices in the order of the faces up,
+left, front, right, back and down, with each face listed row by row. Every move is a
+permutation of these 54 positions, precomputed once, so applying a move to a cube is a
+single NumPy gather.
+
+`Cube.pieces` and the face accessors such as `Cube.front_face` are worked out from that array
+on each call. Unlike when the facelets were stored as characters, they return copies rather
+than views, so writing to them does not change the cube. Changes are made by assigning to
+`pieces` or calling the setter of the face.
+"""
+from __future__ import annotations
 import numpy as np
 from .facecube import FaceCube
 from random import choice
-from typing import Optional
+from typing import Iterable, Optional
+
+# The colors in the order of the faces on which they lie in a solved cube
+COLORS = "RBWGYO"
+SOLVED_CUBE_STR = "".join(color * 9 for color in COLORS)
+
+# The color indices of each character, with 255 marking characters that are not a color
+_COLOR_INDICES = np.full(256, 255, dtype=np.uint8)
+_COLOR_INDICES[np.frombuffer(COLORS.encode(), dtype=np.uint8)] = np.arange(len(COLORS))
+_COLOR_CHARS = np.frombuffer(COLORS.encode(), dtype=np.uint8)
+
+# The faces in the order they are stored, and the order `face_str` lists them in
+_FACE_LETTERS = np.frombuffer(b"ULFRBD", dtype=np.uint8)
+_FACE_STR_ORDER = [0, 3, 2, 5, 1, 4]
+
+# The cycles of facelets that a clockwise quarter turn of each face (and a rotation of the
+# whole cube around the UD axis) moves, where each facelet moves to the place of the one
+# after it
+# fmt: off
+_QUARTER_TURN_CYCLES = {
+    "U": [(0, 2, 8, 6), (1, 5, 7, 3), (9, 36, 27, 18), (10, 37, 28, 19),
+          (11, 38, 29, 20)],
+    "L": [(0, 18, 45, 44), (3, 21, 48, 41), (6, 24, 51, 38), (9, 11, 17, 15),
+          (10, 14, 16, 12)],
+    "F": [(6, 27, 47, 17), (7, 30, 46, 14), (8, 33, 45, 11), (18, 20, 26, 24),
+          (19, 23, 25, 21)],
+    "R": [(2, 42, 47, 20), (5, 39, 50, 23), (8, 36, 53, 26), (27, 29, 35, 33),
+          (28, 32, 34, 30)],
+    "B": [(0, 15, 53, 29), (1, 12, 52, 32), (2, 9, 51, 35), (36, 38, 44, 42),
+          (37, 41, 43, 39)],
+    "D": [(15, 24, 33, 42), (16, 25, 34, 43), (17, 26, 35, 44), (45, 47, 53, 51),
+          (46, 50, 52, 48)],
+    "Y": [(0, 2, 8, 6), (1, 5, 7, 3), (9, 36, 27, 18), (10, 37, 28, 19),
+          (11, 38, 29, 20), (12, 39, 30, 21), (13, 40, 31, 22), (14, 41, 32, 23),
+          (15, 42, 33, 24), (16, 43, 34, 25), (17, 44, 35, 26), (45, 51, 53, 47),
+          (46, 48, 52, 50)],
+    "X": [(0, 44, 45, 18), (1, 43, 46, 19), (2, 42, 47, 20), (3, 41, 48, 21),
+          (4, 40, 49, 22), (5, 39, 50, 23), (6, 38, 51, 24), (7, 37, 52, 25),
+          (8, 36, 53, 26), (9, 15, 17, 11), (10, 12, 16, 14), (27, 29, 35, 33),
+          (28, 32, 34, 30)],
+    "Z": [(0, 29, 53, 15), (1, 32, 52, 12), (2, 35, 51, 9), (3, 28, 50, 16),
+          (4, 31, 49, 13), (5, 34, 48, 10), (6, 27, 47, 17), (7, 30, 46, 14),
+          (8, 33, 45, 11), (18, 20, 26, 24), (19, 23, 25, 21), (36, 42, 44, 38),
+          (37, 39, 43, 41)],
+}
+# fmt: on
+
+# Slice and wide moves as face turns followed by a rotation of the whole cube. Rotations and
+# wide moves can also be written in lowercase, and wide moves with a "w" as well
+_COMPOSITE_QUARTER_TURNS = {
+    "M": ("R", "L'", "X'"),
+    "E": ("U", "D'", "Y'"),
+    "S": ("F'", "B", "Z"),
+    "u": ("D", "Y"),
+    "l": ("R", "X'"),
+    "f": ("B", "Z"),
+    "r": ("L", "X"),
+    "b": ("F", "Z'"),
+    "d": ("U", "Y'"),
+}
+_ALIASES = {
+    **{face.lower() + "w": face.lower() for face in "ULFRBD"},
+    **{face + "w": face.lower() for face in "ULFRBD"},
+    **{rotation.lower(): rotation for rotation in "XYZ"},
+}
+
+
+def _quarter_turn(cycles: list[tuple[int, ...]]) -> np.ndarray:
+    """
+    Returns the permutation `p` of a quarter turn, such that the facelets of a cube after the
+    turn are `facelets[p]`.
+    """
+    permutation = np.arange(54)
+    for cycle in cycles:
+        permutation[list(cycle)] = np.roll(cycle, 1)
+    return permutation
+
+
+def _transformations() -> dict[str, np.ndarray]:
+    quarter_turns = {
+        name: _quarter_turn(cycles) for name, cycles in _QUARTER_TURN_CYCLES.items()
+    }
+
+    def with_turns(quarter_turn: np.ndarray) -> dict[str, np.ndarray]:
+        return {
+            "": quarter_turn,
+            "2": quarter_turn[quarter_turn],
+            "'": np.argsort(quarter_turn),
+        }
+
+    for name, parts in _COMPOSITE_QUARTER_TURNS.items():
+        permutation = np.arange(54)
+        for part in parts:
+            permutation = permutation[with_turns(quarter_turns[part[0]])[part[1:]]]
+        quarter_turns[name] = permutation
+
+    for alias, name in _ALIASES.items():
+        quarter_turns[alias] = quarter_turns[name]
+
+    return {
+        name + suffix: permutation
+        for name, quarter_turn in quarter_turns.items()
+        for suffix, permutation in with_turns(quarter_turn).items()
+    }
+
+
+TRANSFORMATIONS = _transformations()
+
+# The permutation of each move in the numbering used by the solvers, in which move
+# `3 * face + turns - 1` turns the face U, R, F, D, L or B clockwise `turns` times
+MOVE_NAMES = [face + suffix for face in "URFDLB" for suffix in ("", "2", "'")]
+MOVE_PERMUTATIONS = np.array([TRANSFORMATIONS[name] for name in MOVE_NAMES])
+
+# fmt: off
+_RANDOM_TRANSFORMATIONS = [
+    TRANSFORMATIONS[name] for name in (
+        "F", "F'", "F2",
+        "U", "U'", "U2",
+        "L", "L'", "L2",
+        "R", "R'", "R2",
+        "B", "B'", "B2",
+        "D", "D'", "D2"
+    )
+]
+# fmt: on
 
 
 class Cube:
@@ -9,8 +147,7 @@ class Cube:
         randomize_cube = False
 
         if cube_str is None:
-            cube_str = "RRRRRRRRRBBBBBBBBBWWWWWWWWWGGGGGGGGGYYYYYYYYYOOOOOOOOO"
-            # assert len(cube_str) == 54
+            cube_str = SOLVED_CUBE_STR
             randomize_cube = True
         else:
             # Convert all the characters of the string to uppercase
@@ -20,355 +157,138 @@ class Cube:
             if len(cube_str) != 54:
                 raise ValueError("The cube string argument must be 54 characters long.")
 
-            # Verify cube_str is valid
-            for char in cube_str:
-                if char not in ("W", "B", "R", "G", "Y", "O"):
-                    raise ValueError(
-                        "The cube string argument contains invalid characters "
-                        "(i.e. something other than 'W', 'B', 'R', 'G', 'Y', 'O')."
-                    )
-
-        self.pieces: np.ndarray = np.array(
-            [
-                # Up
-                [
-                    [cube_str[0], cube_str[1], cube_str[2]],
-                    [cube_str[3], cube_str[4], cube_str[5]],
-                    [cube_str[6], cube_str[7], cube_str[8]],
-                ],
-                # Left
-                [
-                    [cube_str[9], cube_str[10], cube_str[11]],
-                    [cube_str[12], cube_str[13], cube_str[14]],
-                    [cube_str[15], cube_str[16], cube_str[17]],
-                ],
-                # Front
-                [
-                    [cube_str[18], cube_str[19], cube_str[20]],
-                    [cube_str[21], cube_str[22], cube_str[23]],
-                    [cube_str[24], cube_str[25], cube_str[26]],
-                ],
-                # Right
-                [
-                    [cube_str[27], cube_str[28], cube_str[29]],
-                    [cube_str[30], cube_str[31], cube_str[32]],
-                    [cube_str[33], cube_str[34], cube_str[35]],
-                ],
-                # Back
-                [
-                    [cube_str[36], cube_str[37], cube_str[38]],
-                    [cube_str[39], cube_str[40], cube_str[41]],
-                    [cube_str[42], cube_str[43], cube_str[44]],
-                ],
-                # Down
-                [
-                    [cube_str[45], cube_str[46], cube_str[47]],
-                    [cube_str[48], cube_str[49], cube_str[50]],
-                    [cube_str[51], cube_str[52], cube_str[53]],
-                ],
-            ]
-        )
+        self.facelets = _COLOR_INDICES[
+            np.frombuffer(cube_str.encode("ascii", "replace"), dtype=np.uint8)
+        ]
+
+        # Verify cube_str is valid
+        if (self.facelets == 255).any():
+            raise ValueError(
+                "The cube string argument contains invalid characters "
+                "(i.e. something other than 'W', 'B', 'R', 'G', 'Y', 'O')."
+            )
 
         if randomize_cube:
             self.randomize()
 
-    def randomize(self, shuffles_num: int = 18):
-        # fmt: off
-        transformations = [
-            "F", "F'", "F2",
-            "U", "U'", "U2",
-            "L", "L'", "L2",
-            "R", "R'", "R2",
-            "B", "B'", "B2",
-            "D", "D'", "D2"
+    @classmethod
+    def from_facelets(cls, facelets: np.ndarray) -> Cube:
+        """
+        Creates a cube from an array of 54 color indices (see `COLORS`) without validating it.
+        """
+        cube = cls.__new__(cls)
+        cube.facelets = np.array(facelets, dtype=np.uint8)
+        return cube
+
+    @property
+    def pieces(self) -> np.ndarray:
+        """
+        The colors of the facelets as a 6x3x3 array of characters. The array is a copy, so
+        changes to it only take effect when it is assigned back.
+        """
+        return _COLOR_CHARS[self.facelets].view("S1").astype("U1").reshape(6, 3, 3)
+
+    @pieces.setter
+    def pieces(self, pieces: np.ndarray):
+        self.facelets = _COLOR_INDICES[
+            np.asarray(pieces, dtype="S1").reshape(54).view(np.uint8)
         ]
-        # fmt: on
+
+    def randomize(self, shuffles_num: int = 18):
         for i in range(shuffles_num):
-            self.transform(choice(transformations))
+            self.facelets = self.facelets[choice(_RANDOM_TRANSFORMATIONS)]
 
     def is_solved(self) -> bool:
-        is_solved = True
-
-        for face in self.pieces:
-            middle = face[1][1]
-            for row in face:
-                for item in row:
-                    is_solved &= item == middle
-
-        return is_solved
-
-    def transform(self, transformation: Optional[str] = None):
-        action = transformation[0]
-        times = 1
-        ccw = False
-
-        try:
-            if transformation[1] != "'":
-                raise Exception
-            ccw = True
-        except:
-            ccw = False
-
-        try:
-            times = int(transformation[1])
-        except:
-            times = 1
-
-        # TODO: Replace with match statement once Python 3.10 is out
-        if action == "F":
-            self._front(times, ccw)
-        elif action == "R":
-            self._right(times, ccw)
-        elif action == "U":
-            self._up(times, ccw)
-        elif action == "L":
-            self._left(times, ccw)
-        elif action == "B":
-            self._back(times, ccw)
-        elif action == "D":
-            self._down(times, ccw)
-        elif action == "Y":
-            self._rotate_y(times, ccw)
-        else:
-            print("Invalid transformation", transformation)
+        faces = self.facelets.reshape(6, 9)
+        return bool((faces == faces[:, 4:5]).all())
+
+    def transform(self, transformation: str):
+        """
+        Applies a single move, such as "R", "U2", "M'", "Rw" or "y".
+        """
+        permutation = TRANSFORMATIONS.get(transformation)
+
+        if permutation is None:
+            raise ValueError(f"Invalid transformation {transformation!r}")
+
+        self.facelets = self.facelets[permutation]
+
+    def apply(self, transformations: Iterable[str]):
+        """
+        Applies each of `transformations` in turn.
+        """
+        for transformation in transformations:
+            self.transform(transformation)
+
+    def move(self, move_num: int):
+        """
+        Applies move `move_num`, numbered as in `MOVE_PERMUTATIONS`.
+        """
+        self.facelets = self.facelets[MOVE_PERMUTATIONS[move_num]]
+
+    def _face(self, index: int) -> np.ndarray:
+        """
+        Returns a copy of face `index` of `pieces`, which the matching setter changes.
+        """
+        return self.pieces[index]
+
+    def _set_face(self, index: int, face: np.ndarray):
+        pieces = self.pieces
+        pieces[index] = face
+        self.pieces = pieces
 
     def front_face(self) -> np.ndarray:
-        return self.pieces[2]
+        return self._face(2)
 
     def set_front_face(self, face: np.ndarray):
-        self.pieces[2] = face
+        self._set_face(2, face)
 
     def left_face(self) -> np.ndarray:
-        return self.pieces[1]
+        return self._face(1)
 
     def set_left_face(self, face: np.ndarray):
-        self.pieces[1] = face
+        self._set_face(1, face)
 
     def right_face(self) -> np.ndarray:
-        return self.pieces[3]
+        return self._face(3)
 
     def set_right_face(self, face: np.ndarray):
-        self.pieces[3] = face
+        self._set_face(3, face)
 
     def back_face(self) -> np.ndarray:
-        return self.pieces[4]
+        return self._face(4)
 
     def set_back_face(self, face: np.ndarray):
-        self.pieces[4] = face
+        self._set_face(4, face)
 
     def up_face(self) -> np.ndarray:
-        return self.pieces[0]
+        return self._face(0)
 
     def set_up_face(self, face: np.ndarray):
-        self.pieces[0] = face
+        self._set_face(0, face)
 
     def down_face(self) -> np.ndarray:
-        return self.pieces[5]
+        return self._face(5)
 
     def set_down_face(self, face: np.ndarray):
-        self.pieces[5] = face
-
-    def _rotate_face(
-        self, face: np.ndarray, times: int = 1, ccw: bool = False
-    ) -> np.ndarray:
-        times = -times if not ccw else times
-        return np.rot90(face, times)
-
-    def _up(self, times: int = 1, ccw: bool = False):
-        for i in range(times):
-            # We need a copy because otherwise the pointers point to the same row
-            front_top_row = self.front_face()[0].copy()
-            right_top_row = self.right_face()[0].copy()
-            back_top_row = self.back_face()[0].copy()
-            left_top_row = self.left_face()[0].copy()
-
-            if not ccw:
-                self.left_face()[0] = front_top_row
-                self.back_face()[0] = left_top_row
-                self.right_face()[0] = back_top_row
-                self.front_face()[0] = right_top_row
-            else:
-                self.right_face()[0] = front_top_row
-                self.back_face()[0] = right_top_row
-                self.left_face()[0] = back_top_row
-                self.front_face()[0] = left_top_row
-
-        self.set_up_face(self._rotate_face(self.up_face(), times, ccw))
-
-    def _down(self, times: int = 1, ccw: bool = False):
-        for i in range(times):
-            # We need a copy because otherwise the pointers point to the same row
-            front_bottom_row = self.front_face()[2].copy()
-            right_bottom_row = self.right_face()[2].copy()
-            back_bottom_row = self.back_face()[2].copy()
-            left_bottom_row = self.left_face()[2].copy()
-
-            if not ccw:
-                self.right_face()[2] = front_bottom_row
-                self.back_face()[2] = right_bottom_row
-                self.left_face()[2] = back_bottom_row
-                self.front_face()[2] = left_bottom_row
-            else:
-                self.left_face()[2] = front_bottom_row
-                self.back_face()[2] = left_bottom_row
-                self.right_face()[2] = back_bottom_row
-                self.front_face()[2] = right_bottom_row
-
-        self.set_down_face(self._rotate_face(self.down_face(), times, ccw))
-
-    def _left(self, times: int = 1, ccw: bool = False):
-        for i in range(times):
-            front_face = self.front_face().copy()
-            up_face = self.up_face().copy()
-            back_face = self.back_face().copy()
-            down_face = self.down_face().copy()
-
-            # Swap the columns
-            if not ccw:
-                self.down_face()[:, 0] = front_face[:, 0]
-                self.back_face()[:, 2] = np.flip(down_face, 0)[:, 0]
-                # The column needs to be flipped to work
-                self.up_face()[:, 0] = np.flip(back_face, 0)[:, 2]
-                self.front_face()[:, 0] = up_face[:, 0]
-            else:
-                self.up_face()[:, 0] = front_face[:, 0]
-                self.back_face()[:, 2] = np.flip(up_face, 0)[:, 0]
-                self.down_face()[:, 0] = np.flip(back_face, 0)[:, 2]
-                self.front_face()[:, 0] = down_face[:, 0]
-
-        self.set_left_face(self._rotate_face(self.left_face(), times, ccw))
-
-    def _right(self, times: int = 1, ccw: bool = False):
-        for i in range(times):
-            front_face = self.front_face().copy()
-            up_face = self.up_face().copy()
-            back_face = self.back_face().copy()
-            down_face = self.down_face().copy()
-
-            # Swap the columns
-            if not ccw:
-                self.up_face()[:, 2] = front_face[:, 2]
-                self.back_face()[:, 0] = np.flip(up_face, 0)[:, 2]
-                self.down_face()[:, 2] = np.flip(back_face, 0)[:, 0]
-                self.front_face()[:, 2] = down_face[:, 2]
-            else:
-                self.down_face()[:, 2] = front_face[:, 2]
-                self.back_face()[:, 0] = np.flip(down_face, 0)[:, 2]
-                self.up_face()[:, 2] = np.flip(back_face, 0)[:, 0]
-                self.front_face()[:, 2] = up_face[:, 2]
-
-        self.set_right_face(self._rotate_face(self.right_face(), times, ccw))
-
-    def _front(self, times: int = 1, ccw: bool = False):
-        self.set_front_face(self._rotate_face(self.front_face(), times, ccw))
-
-        # Move edge columns up as well
-        # Apply R to the left face
-        for i in range(times):
-            left_face = self.left_face().copy()
-            up_face = self.up_face().copy()
-            right_face = self.right_face().copy()
-            down_face = self.down_face().copy()
-
-            # Swap the columns
-            if not ccw:
-                self.up_face()[2] = np.flip(left_face, 0)[:, 2]
-                self.right_face()[:, 0] = up_face[2]
-                self.down_face()[0] = np.flip(right_face, 0)[:, 0]
-                self.left_face()[:, 2] = down_face[0]
-            else:
-                self.left_face()[:, 2] = np.flip(up_face, 1)[2]
-                self.down_face()[0] = left_face[:, 2]
-                self.right_face()[:, 0] = np.flip(down_face, 1)[0]
-                self.up_face()[2] = right_face[:, 0]
-
-    def _back(self, times: int = 1, ccw: bool = False):
-        self.set_back_face(self._rotate_face(self.back_face(), times, ccw))
-
-        # Move edge columns up as well
-        # Apply R to the right face
-        for i in range(times):
-            right_face = self.right_face().copy()
-            up_face = self.up_face().copy()
-            left_face = self.left_face().copy()
-            down_face = self.down_face().copy()
-
-            # Swap the columns
-            if not ccw:
-                self.up_face()[0] = right_face[:, 2]
-                self.left_face()[:, 0] = np.flip(up_face, 1)[0]
-                self.down_face()[2] = left_face[:, 0]
-                self.right_face()[:, 2] = np.flip(down_face, 1)[2]
-            else:
-                self.right_face()[:, 2] = up_face[0]
-                self.down_face()[2] = np.flip(right_face, 0)[:, 2]
-                self.left_face()[:, 0] = down_face[2]
-                self.up_face()[0] = np.flip(left_face, 0)[:, 0]
-
-    def _rotate_y(self, times: int = 1, ccw: bool = False):
-        for i in range(times):
-            up = self.up_face().copy()
-            left = self.left_face().copy()
-            front = self.front_face().copy()
-            right = self.right_face().copy()
-            back = self.back_face().copy()
-            down = self.down_face().copy()
-
-            if not ccw:
-                self.set_front_face(right)
-                self.set_left_face(front)
-                self.set_right_face(back)
-                self.set_back_face(left)
-                self.set_up_face(self._rotate_face(up))
-                self.set_down_face(self._rotate_face(down, ccw=True))
-            else:
-                self.set_front_face(left)
-                self.set_left_face(back)
-                self.set_right_face(front)
-                self.set_back_face(right)
-                self.set_up_face(self._rotate_face(up, ccw=True))
-                self.set_down_face(self._rotate_face(down))
+        self._set_face(5, face)
 
     def face_str(self) -> str:
-        up = self.up_face().flatten()
-        right = self.right_face().flatten()
-        front = self.front_face().flatten()
-        down = self.down_face().flatten()
-        left = self.left_face().flatten()
-        back = self.back_face().flatten()
-        cube_str = "".join(np.concatenate([up, right, front, down, left, back]))
-
-        # Grab the middle color of each face to determine each face's color
-        # Convert the colors to lowercase so that they do not conflict with the face
-        # letters
-        up_color = self.up_face()[1][1].lower()
-        right_color = self.right_face()[1][1].lower()
-        front_color = self.front_face()[1][1].lower()
-        down_color = self.down_face()[1][1].lower()
-        left_color = self.left_face()[1][1].lower()
-        back_color = self.back_face()[1][1].lower()
-
-        # Convert the colors to lowercase so that they do not conflict with the face
-        # letters
-        cube_str = cube_str.lower()
-        # Convert colors to face letter
-        return (
-            cube_str.replace(up_color, "U")
-            .replace(right_color, "R")
-            .replace(front_color, "F")
-            .replace(down_color, "D")
-            .replace(left_color, "L")
-            .replace(back_color, "B")
-        )
+        faces = self.facelets.reshape(6, 9)
+
+        # Each color is named after the face whose center it is on
+        face_letters = np.full(len(COLORS), 255, dtype=np.uint8)
+        face_letters[faces[:, 4]] = _FACE_LETTERS
+
+        letters = face_letters[faces[_FACE_STR_ORDER]]
+        if (letters == 255).any():
+            # A color on no center has no face to be named after
+            raise ValueError("The centers must all be different colors.")
+
+        return letters.tobytes().decode()
 
     def to_face_cube(self) -> FaceCube:
         return FaceCube(self.face_str())
 
     def __str__(self) -> str:
-        up = self.up_face().flatten()
-        left = self.left_face().flatten()
-        front = self.front_face().flatten()
-        right = self.right_face().flatten()
-        back = self.back_face().flatten()
-        down = self.down_face().flatten()
-        return "".join(np.concatenate([up, left, front, right, back, down]))
+        return _COLOR_CHARS[self.facelets].tobytes().decode()
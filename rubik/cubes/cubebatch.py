@@ -0,0 +1,205 @@
+"""
+Many cubes in the facelet representation of `Cube`, stored together so that moves, checks and
+conversions run over all of them at once.
+"""
+from __future__ import annotations
+import numpy as np
+from typing import Iterable, Optional, Sequence, Union
+from .coordinates import (
+    _parities,
+    cubies_facelets,
+    facelet_coordinates,
+    facelet_status,
+)
+from .cube import (
+    COLORS,
+    MOVE_PERMUTATIONS,
+    SOLVED_CUBE_STR,
+    TRANSFORMATIONS,
+    Cube,
+    _COLOR_CHARS,
+    _COLOR_INDICES,
+    _FACE_LETTERS,
+    _FACE_STR_ORDER,
+)
+
+# The move permutations followed by the identity, so that a move of -1 leaves a cube as it is
+_MOVE_PERMUTATIONS = np.concatenate([MOVE_PERMUTATIONS, np.arange(54)[None]])
+
+
+def _strs(chars: np.ndarray) -> list[str]:
+    """
+    Decodes each row of an (N, 54) array of characters into a string.
+    """
+    return np.ascontiguousarray(chars).view("S54").ravel().astype(str).tolist()
+
+
+class CubeBatch:
+    """
+    N cubes held as an (N, 54) array of color indices, laid out like `Cube.facelets`.
+    """
+
+    def __init__(self, facelets: np.ndarray):
+        self.facelets = np.array(facelets, dtype=np.uint8).reshape(-1, 54)
+
+    @classmethod
+    def solved(cls, n: int) -> CubeBatch:
+        return cls.from_strs([SOLVED_CUBE_STR]).repeat(n)
+
+    @classmethod
+    def random_states(
+        cls, n: int, rng: Optional[np.random.Generator] = None
+    ) -> CubeBatch:
+        """
+        Creates `n` cubes drawn uniformly from every state that can be solved, rather than by
+        making random moves, which leaves the cubes closer to solved than they would be.
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+
+        cp = rng.permuted(np.tile(np.arange(8), (n, 1)), axis=1)
+        ep = rng.permuted(np.tile(np.arange(12), (n, 1)), axis=1)
+        # Swapping two edges makes the parities of the corners and edges match
+        swap = _parities(cp) != _parities(ep)
+        ep[swap, 10:] = ep[swap, :9:-1]
+
+        # The last orientations make the twists and flips add up to 0
+        co = rng.integers(0, 3, size=(n, 8))
+        co[:, 7] = -co[:, :7].sum(axis=1) % 3
+        eo = rng.integers(0, 2, size=(n, 12))
+        eo[:, 11] = eo[:, :11].sum(axis=1) % 2
+
+        return cls(cubies_facelets(cp, co, ep, eo))
+
+    @classmethod
+    def from_strs(cls, cube_strs: Sequence[str]) -> CubeBatch:
+        """
+        Creates a batch from cube strings in the format taken by `Cube`.
+        """
+        if any(len(cube_str) != 54 for cube_str in cube_strs):
+            raise ValueError("The cube string argument must be 54 characters long.")
+
+        chars = np.array([cube_str.upper() for cube_str in cube_strs], dtype="S54")
+        facelets = _COLOR_INDICES[chars.view(np.uint8).reshape(-1, 54)]
+
+        if (facelets == 255).any():
+            raise ValueError(
+                "The cube string argument contains invalid characters "
+                "(i.e. something other than 'W', 'B', 'R', 'G', 'Y', 'O')."
+            )
+
+        return cls(facelets)
+
+    @classmethod
+    def from_cubes(cls, cubes: Iterable[Cube]) -> CubeBatch:
+        return cls(np.array([cube.facelets for cube in cubes], dtype=np.uint8))
+
+    def __len__(self) -> int:
+        return len(self.facelets)
+
+    def __getitem__(self, index: int) -> Cube:
+        return Cube.from_facelets(self.facelets[index])
+
+    def to_cubes(self) -> list[Cube]:
+        return [Cube.from_facelets(facelets) for facelets in self.facelets]
+
+    def repeat(self, n: int) -> CubeBatch:
+        """
+        Returns a batch with each cube repeated `n` times.
+        """
+        return CubeBatch(np.repeat(self.facelets, n, axis=0))
+
+    def move(self, move_nums: Union[int, np.ndarray]):
+        """
+        Applies a move, numbered as in `MOVE_PERMUTATIONS`, to every cube, or applies
+        `move_nums[i]` to cube `i` when given one move per cube. Cubes given a move of -1 are
+        left as they are.
+        """
+        if np.ndim(move_nums) == 0:
+            self.facelets = self.facelets[:, _MOVE_PERMUTATIONS[move_nums]]
+        else:
+            self.facelets = np.take_along_axis(
+                self.facelets, _MOVE_PERMUTATIONS[move_nums], axis=1
+            )
+
+    def apply(self, transformations: Iterable[str]):
+        """
+        Applies each of `transformations` in turn to every cube.
+        """
+        permutation = np.arange(54)
+        for transformation in transformations:
+            permutation = permutation[TRANSFORMATIONS[transformation]]
+
+        self.facelets = self.facelets[:, permutation]
+
+    def apply_moves(self, moves: np.ndarray):
+        """
+        Applies move sequences given as an (N, L) array, with row `i` holding the moves of cube
+        `i`. Shorter sequences can be padded with -1.
+        """
+        for column in np.asarray(moves).T:
+            self.move(column)
+
+    def randomize(
+        self, shuffles_num: int = 18, rng: Optional[np.random.Generator] = None
+    ):
+        """
+        Applies `shuffles_num` random moves to each cube independently.
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+
+        self.apply_moves(rng.integers(0, 18, size=(len(self), shuffles_num)))
+
+    def is_solved(self) -> np.ndarray:
+        faces = self.facelets.reshape(-1, 6, 9)
+        return (faces == faces[:, :, 4:5]).all(axis=(1, 2))
+
+    def is_valid(self) -> np.ndarray:
+        """
+        Returns whether each cube can be solved.
+        """
+        return self.status() == 0
+
+    def status(self) -> np.ndarray:
+        """
+        Returns 0 for each cube that can be solved, or an error code from `STATUS_MESSAGES`.
+        """
+        return facelet_status(self.facelets)
+
+    def coordinates(self) -> np.ndarray:
+        """
+        Returns the coordinates named in `COORDINATES` of every cube, as an (N, 9) array.
+        """
+        return facelet_coordinates(self.facelets)
+
+    def face_str(self) -> list[str]:
+        """
+        Returns `Cube.face_str` of every cube.
+        """
+        faces = self.facelets.reshape(-1, 6, 9)
+
+        # Each color is named after the face whose center it is on
+        face_letters = np.full((len(self), len(COLORS)), 255, dtype=np.uint8)
+        np.put_along_axis(
+            face_letters,
+            faces[:, :, 4],
+            _FACE_LETTERS[None].repeat(len(self), 0),
+            axis=1,
+        )
+
+        letters = np.take_along_axis(
+            face_letters, faces[:, _FACE_STR_ORDER].reshape(-1, 54), axis=1
+        )
+        invalid = np.flatnonzero((letters == 255).any(axis=1))
+        if len(invalid):
+            raise ValueError(
+                f"The centers of cube {invalid[0]} must all be different colors."
+            )
+        return _strs(letters)
+
+    def cube_strs(self) -> list[str]:
+        """
+        Returns `str` of every cube.
+        """
+        return _strs(_COLOR_CHARS[self.facelets])
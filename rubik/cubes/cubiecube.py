@@ -1,10 +1,43 @@
 from __future__ import annotations
 from functools import reduce
 from math import comb
+from operator import itemgetter
+from typing import Optional
 from .pieces import Corner, Edge
+from .ranking import (
+    permutation_parity,
+    rank_combination,
+    rank_permutation,
+    unrank_combination,
+    unrank_permutation,
+)
+
+
+# The pieces are packed into single bytes: 3 * permutation + orientation for the corners and
+# 2 * permutation + orientation for the edges. Composing two packed pieces `x` (the piece of
+# the first cube at the position the second one takes it from) and `y` (the piece of the
+# second cube) gives `_CORNER_MULTIPLY[y][x]` or `_EDGE_MULTIPLY[y][x]`. Each row also holds
+# the position that `y` takes its piece from, since that only depends on `y`
+_CORNER_MULTIPLY = [
+    (y // 3, [3 * (x // 3) + (x + y) % 3 for x in range(24)]) for y in range(24)
+]
+_EDGE_MULTIPLY = [
+    (y // 2, [2 * (x // 2) + (x + y) % 2 for x in range(24)]) for y in range(24)
+]
+
+# `bytes.translate` tables unpacking the permutation or orientation of each packed piece
+_CORNER_PERMUTATIONS = bytes(min(x // 3, 255) for x in range(256))
+_CORNER_ORIENTATIONS = bytes(x % 3 for x in range(256))
+_EDGE_PERMUTATIONS = bytes(x // 2 for x in range(256))
+_EDGE_ORIENTATIONS = bytes(x % 2 for x in range(256))
+
+_CORNER_ROWS = _CORNER_MULTIPLY.__getitem__
+_EDGE_ROWS = _EDGE_MULTIPLY.__getitem__
 
 
 class CubieCube:
+    __slots__ = ("corners", "edges")
+
     def __init__(self, cp=None, co=None, ep=None, eo=None):
         """
         :param cp: A list of the corner permutations
@@ -13,15 +46,71 @@ class CubieCube:
         :param eo: A list of the edge orientations
         """
         if cp is not None and co is not None and ep is not None and eo is not None:
-            self.corner_permutations = cp
-            self.corner_orientations = co
-            self.edge_permutations = ep
-            self.edge_orientations = eo
+            self.corners = bytearray(3 * p + o for p, o in zip(cp, co))
+            self.edges = bytearray(2 * p + o for p, o in zip(ep, eo))
         else:
-            self.corner_permutations = [corner for corner in Corner]
-            self.corner_orientations = [0 for i in range(len(Corner))]
-            self.edge_permutations = [edge for edge in Edge]
-            self.edge_orientations = [0 for i in range(len(Edge))]
+            self.corners = bytearray(range(0, 24, 3))
+            self.edges = bytearray(range(0, 24, 2))
+
+    def copy(self) -> CubieCube:
+        cube = CubieCube.__new__(CubieCube)
+        cube.corners = self.corners[:]
+        cube.edges = self.edges[:]
+        return cube
+
+    @property
+    def corner_permutations(self) -> list[int]:
+        """
+        The corner at each position, unpacked from `corners` into a new list on each read.
+        Writing into the list does not change the cube, so a changed list must be assigned
+        back.
+        """
+        return list(self.corners.translate(_CORNER_PERMUTATIONS))
+
+    @corner_permutations.setter
+    def corner_permutations(self, cp: list[int]):
+        self.corners = bytearray(
+            3 * p + o for p, o in zip(cp, self.corner_orientations)
+        )
+
+    @property
+    def corner_orientations(self) -> list[int]:
+        """
+        The orientation of the corner at each position, as a new list on each read (see
+        `corner_permutations`).
+        """
+        return list(self.corners.translate(_CORNER_ORIENTATIONS))
+
+    @corner_orientations.setter
+    def corner_orientations(self, co: list[int]):
+        self.corners = bytearray(
+            3 * p + o for p, o in zip(self.corner_permutations, co)
+        )
+
+    @property
+    def edge_permutations(self) -> list[int]:
+        """
+        The edge at each position, unpacked from `edges` into a new list on each read.
+        Writing into the list does not change the cube, so a changed list must be assigned
+        back.
+        """
+        return list(self.edges.translate(_EDGE_PERMUTATIONS))
+
+    @edge_permutations.setter
+    def edge_permutations(self, ep: list[int]):
+        self.edges = bytearray(2 * p + o for p, o in zip(ep, self.edge_orientations))
+
+    @property
+    def edge_orientations(self) -> list[int]:
+        """
+        The orientation of the edge at each position, as a new list on each read (see
+        `edge_permutations`).
+        """
+        return list(self.edges.translate(_EDGE_ORIENTATIONS))
+
+    @edge_orientations.setter
+    def edge_orientations(self, eo: list[int]):
+        self.edges = bytearray(2 * p + o for p, o in zip(self.edge_permutations, eo))
 
     def choose(self, n: int, k: int) -> int:
         if 0 <= k <= n:
@@ -29,49 +118,44 @@ class CubieCube:
         else:
             return 0
 
-    def corner_multiply(self, other: CubieCube):
-        cp = []
-        co = []
-
-        for corner in Corner:
-            cp.append(self.corner_permutations[other.corner_permutations[corner]])
-            co.append(
-                (
-                    self.corner_orientations[other.corner_permutations[corner]]
-                    + other.corner_orientations[corner]
-                )
-                % 3
-            )
-
-        self.corner_orientations = co
-        self.corner_permutations = cp
-
-    def edge_multiply(self, other: CubieCube):
-        ep = []
-        eo = []
-
-        for edge in Edge:
-            ep.append(self.edge_permutations[other.edge_permutations[edge]])
-            eo.append(
-                (
-                    other.edge_orientations[edge]
-                    + self.edge_orientations[other.edge_permutations[edge]]
-                )
-                % 2
-            )
+    def corner_multiply(self, other: CubieCube, out: Optional[CubieCube] = None):
+        """
+        Replaces the corners of this cube (or of `out`) with those of this cube followed by
+        `other`.
+        """
+        a = self.corners
+        corners = [
+            row[a[position]] for position, row in map(_CORNER_ROWS, other.corners)
+        ]
+        (self if out is None else out).corners[:] = bytes(corners)
 
-        self.edge_orientations = eo
-        self.edge_permutations = ep
+    def edge_multiply(self, other: CubieCube, out: Optional[CubieCube] = None):
+        """
+        Replaces the edges of this cube (or of `out`) with those of this cube followed by
+        `other`.
+        """
+        a = self.edges
+        edges = [row[a[position]] for position, row in map(_EDGE_ROWS, other.edges)]
+        (self if out is None else out).edges[:] = bytes(edges)
 
-    def multiply(self, other: CubieCube):
-        self.corner_multiply(other)
-        self.edge_multiply(other)
+    def multiply(self, other: CubieCube, out: Optional[CubieCube] = None):
+        """
+        Replaces this cube (or `out`) with this cube followed by `other`. `out` may be `other`.
+        """
+        self.corner_multiply(other, out)
+        self.edge_multiply(other, out)
 
     def move(self, move_num: int):
         """
         Applies one of the 6 main moves to the cube.
         """
-        self.multiply(MOVE_CUBE[move_num])
+        corner_rows, corner_sources, edge_rows, edge_sources = _MOVES[move_num]
+        self.corners[:] = bytes(
+            map(list.__getitem__, corner_rows, corner_sources(self.corners))
+        )
+        self.edges[:] = bytes(
+            map(list.__getitem__, edge_rows, edge_sources(self.edges))
+        )
 
     # COORDINATES NEEDED FOR KOCIEMBA ALGORITHM
 
@@ -85,15 +169,13 @@ class CubieCube:
 
     @phase_1_corner.setter
     def phase_1_corner(self, new: int):
-        total = 0
+        co = [0] * 8
 
-        for i in range(7):
-            x = new % 3
-            self.corner_orientations[6 - i] = x
-            total += x
-            new //= 3
+        for i in range(6, -1, -1):
+            new, co[i] = divmod(new, 3)
 
-        self.corner_orientations[7] = (-total) % 3
+        co[7] = -sum(co) % 3
+        self.corner_orientations = co
 
     @property
     def phase_1_edge(self):
@@ -105,15 +187,13 @@ class CubieCube:
 
     @phase_1_edge.setter
     def phase_1_edge(self, new: int):
-        total = 0
+        eo = [0] * 12
 
-        for i in range(11):
-            x = new % 2
-            self.edge_orientations[10 - i] = x
-            total += x
-            new //= 2
+        for i in range(10, -1, -1):
+            new, eo[i] = divmod(new, 2)
 
-        self.edge_orientations[11] = (-total) % 2
+        eo[11] = sum(eo) % 2
+        self.edge_orientations = eo
 
     @property
     def phase_1_ud_slice(self):
@@ -121,83 +201,30 @@ class CubieCube:
         Get the UD slice coordinate of this cube. This is determined by the positions of the 4
         UD slice edges (FL, FR, BL, BR). This is needed for phase 1 of the kociemba algorithm.
         """
-        ud_slice = 0
-        seen = 0
-
-        for i in range(12):
-            if 8 <= self.edge_permutations[i] < 12:
-                seen += 1
-            elif seen >= 1:
-                ud_slice += self.choose(i, seen - 1)
-
-        return ud_slice
+        return rank_combination([edge >= Edge.FR for edge in self.edge_permutations])
 
     @phase_1_ud_slice.setter
     def phase_1_ud_slice(self, new: int):
-        seen = 3
-        x = 0
-        udslice_edges = [Edge.FR, Edge.FL, Edge.BL, Edge.BR]
-        other_edges = [
-            Edge.UR,
-            Edge.UF,
-            Edge.UL,
-            Edge.UB,
-            Edge.DR,
-            Edge.DF,
-            Edge.DL,
-            Edge.DB,
+        # The slice edges go to the chosen positions in order, and the other edges fill the rest
+        positions = unrank_combination(new, 12, 4)
+        other_edges = iter(range(Edge.FR))
+        udslice_edges = iter(range(Edge.FR, 12))
+        self.edge_permutations = [
+            next(udslice_edges) if i in positions else next(other_edges)
+            for i in range(12)
         ]
 
-        # Invalidate edges
-        for i in range(12):
-            self.edge_permutations[i] = Edge.DB
-
-        # First position the slice edges
-        for i in range(11, -1, -1):
-            if new - self.choose(i, seen) < 0:
-                self.edge_permutations[i] = udslice_edges[seen]
-                seen -= 1
-            else:
-                new -= self.choose(i, seen)
-
-        # Then the remaining edges
-        for i in range(12):
-            if self.edge_permutations[i] == Edge.DB:
-                self.edge_permutations[i] = other_edges[x]
-                x += 1
-
     @property
     def phase_2_corner(self):
         """
         Get the corner permutation coordinate of this cube. This is needed for phase 2 of the
         kociemba algorithm.
         """
-        corner = 0
-
-        for j in range(7, 0, -1):
-            s = 0
-            for i in range(j):
-                if self.corner_permutations[i] > self.corner_permutations[j]:
-                    s += 1
-            corner = j * (corner + s)
-
-        return corner
+        return rank_permutation(self.corner_permutations)
 
     @phase_2_corner.setter
     def phase_2_corner(self, new: int):
-        corners = [i for i in range(8)]
-        permutations = [0 for i in range(8)]
-        coeffecients = [0 for i in range(7)]
-
-        for i in range(1, 8):
-            coeffecients[i - 1] = new % (i + 1)
-            new //= i + 1
-
-        for i in range(6, -1, -1):
-            permutations[i + 1] = corners.pop(i + 1 - coeffecients[i])
-
-        permutations[0] = corners[0]
-        self.corner_permutations = permutations
+        self.corner_permutations = unrank_permutation(new, 8)
 
     @property
     def phase_2_edge(self):
@@ -206,32 +233,11 @@ class CubieCube:
         permutations of the 8 edges not inside the UD slice. This is needed for phase 2 of the
         kociemba algorithm.
         """
-        edge = 0
-
-        for j in range(7, 0, -1):
-            s = 0
-            for i in range(j):
-                if self.edge_permutations[i] > self.edge_permutations[j]:
-                    s += 1
-            edge = j * (edge + s)
-
-        return edge
+        return rank_permutation(self.edge_permutations[:8])
 
     @phase_2_edge.setter
     def phase_2_edge(self, new: int):
-        edges = [i for i in range(8)]
-        permutations = [0 for i in range(8)]
-        coeffecients = [0 for i in range(7)]
-
-        for i in range(1, 8):
-            coeffecients[i - 1] = new % (i + 1)
-            new //= i + 1
-
-        for i in range(6, -1, -1):
-            permutations[i + 1] = edges.pop(i + 1 - coeffecients[i])
-
-        permutations[0] = edges[0]
-        self.edge_permutations[:8] = permutations  # type: ignore
+        self.edge_permutations = unrank_permutation(new, 8) + self.edge_permutations[8:]
 
     @property
     def phase_2_ud_slice(self):
@@ -239,85 +245,68 @@ class CubieCube:
         Get the phase 2 UD slice coordinate of this cube. This is determined by the permutations
         of the 4 UD slice edges. This is needed for phase 2 of the kociemba algorithm.
         """
-        ud_slice = self.edge_permutations[8:]
-        ret = 0
-
-        for j in range(3, 0, -1):
-            s = 0
-            for i in range(j):
-                if ud_slice[i] > ud_slice[j]:
-                    s += 1
-            ret = j * (ret + s)
-
-        return ret
+        return rank_permutation(self.edge_permutations[8:])
 
     @phase_2_ud_slice.setter
     def phase_2_ud_slice(self, new: int):
-        ud_slice_edges = [Edge.FR, Edge.FL, Edge.BL, Edge.BR]
-        permutations = [0 for i in range(4)]
-        coeffecients = [0 for i in range(3)]
+        self.edge_permutations = self.edge_permutations[:8] + [
+            Edge.FR + e for e in unrank_permutation(new, 4)
+        ]
 
-        for i in range(1, 4):
-            coeffecients[i - 1] = new % (i + 1)
-            new //= i + 1
+    def _sorted_edges(self, first: int) -> int:
+        """
+        Get the coordinate of the positions and order of the 4 edges starting from `first`,
+        which is defined for every cube, unlike the phase 2 edge coordinates.
+        """
+        tracked = [first <= edge < first + 4 for edge in self.edge_permutations]
+        order = [edge for edge in self.edge_permutations if first <= edge < first + 4]
+        return 24 * rank_combination(tracked) + rank_permutation(order)
 
-        for i in range(2, -1, -1):
-            permutations[i + 1] = ud_slice_edges.pop(i + 1 - coeffecients[i])
+    @property
+    def slice_sorted(self):
+        """
+        Get the positions and order of the 4 UD slice edges. Once phase 1 is solved, this is
+        equal to the phase 2 UD slice coordinate.
+        """
+        return self._sorted_edges(Edge.FR)
 
-        permutations[0] = ud_slice_edges[0]
-        self.edge_permutations[8:] = permutations  # type: ignore
+    @property
+    def u_edges(self):
+        """
+        Get the positions and order of the UR, UF, UL and UB edges.
+        """
+        return self._sorted_edges(Edge.UR)
+
+    @property
+    def d_edges(self):
+        """
+        Get the positions and order of the DR, DF, DL and DB edges.
+        """
+        return self._sorted_edges(Edge.DR)
 
     # FUNCTIONS TO DETERMINE THE VALIDITY OF CUBE
 
     @property
     def corner_parity(self):
-        s = 0
-        for i in range(7, 0, -1):
-            for j in range(i - 1, -1, -1):
-                if self.corner_permutations[j] > self.corner_permutations[i]:
-                    s += 1
-
-        return s % 2
+        return permutation_parity(self.corner_permutations)
 
     @property
     def edge_parity(self):
-        s = 0
-        for i in range(11, 0, -1):
-            for j in range(i - 1, -1, -1):
-                if self.edge_permutations[j] > self.edge_permutations[i]:
-                    s += 1
-
-        return s % 2
+        return permutation_parity(self.edge_permutations)
 
     def validate(self):
-        total = 0
-        edge_count = [0 for edge in Edge]
-        corner_count = [0 for corner in Corner]
-
-        for i in range(12):
-            edge_count[self.edge_permutations[i]] += 1
-        for i in range(12):
-            if edge_count[i] != 1:
-                return -2
-
-        for i in range(12):
-            total += self.edge_orientations[i]
-        if total % 2 != 0:
-            return -3
-
-        for i in range(8):
-            corner_count[self.corner_permutations[i]] += 1
-        for i in range(8):
-            if corner_count[i] != 1:
-                return -4
+        cp = self.corner_permutations
+        ep = self.edge_permutations
 
-        total = 0
-        for i in range(8):
-            total += self.corner_orientations[i]
-
-        if total % 3 != 0:
+        if sorted(ep) != list(range(12)):
+            return -2
+        elif sum(self.edge_orientations) % 2 != 0:
+            return -3
+        elif sorted(cp) != list(range(8)):
+            return -4
+        elif sum(self.corner_orientations) % 3 != 0:
             return -5
-        elif self.edge_parity != self.corner_parity:
+        elif permutation_parity(ep) != permutation_parity(cp):
             return -6
 
         return 0
@@ -487,34 +476,30 @@ _epB = (
 )
 _eoB = (0, 0, 0, 1, 0, 0, 0, 1, 0, 0, 1, 1)
 
-MOVE_CUBE = [CubieCube() for i in range(6)]
-
-MOVE_CUBE[0].corner_permutations = _cpU
-MOVE_CUBE[0].corner_orientations = _coU
-MOVE_CUBE[0].edge_permutations = _epU
-MOVE_CUBE[0].edge_orientations = _eoU
-
-MOVE_CUBE[1].corner_permutations = _cpR
-MOVE_CUBE[1].corner_orientations = _coR
-MOVE_CUBE[1].edge_permutations = _epR
-MOVE_CUBE[1].edge_orientations = _eoR
-
-MOVE_CUBE[2].corner_permutations = _cpF
-MOVE_CUBE[2].corner_orientations = _coF
-MOVE_CUBE[2].edge_permutations = _epF
-MOVE_CUBE[2].edge_orientations = _eoF
-
-MOVE_CUBE[3].corner_permutations = _cpD
-MOVE_CUBE[3].corner_orientations = _coD
-MOVE_CUBE[3].edge_permutations = _epD
-MOVE_CUBE[3].edge_orientations = _eoD
-
-MOVE_CUBE[4].corner_permutations = _cpL
-MOVE_CUBE[4].corner_orientations = _coL
-MOVE_CUBE[4].edge_permutations = _epL
-MOVE_CUBE[4].edge_orientations = _eoL
-
-MOVE_CUBE[5].corner_permutations = _cpB
-MOVE_CUBE[5].corner_orientations = _coB
-MOVE_CUBE[5].edge_permutations = _epB
-MOVE_CUBE[5].edge_orientations = _eoB
+MOVE_CUBE = [
+    CubieCube(_cpU, _coU, _epU, _eoU),
+    CubieCube(_cpR, _coR, _epR, _eoR),
+    CubieCube(_cpF, _coF, _epF, _eoF),
+    CubieCube(_cpD, _coD, _epD, _eoD),
+    CubieCube(_cpL, _coL, _epL, _eoL),
+    CubieCube(_cpB, _coB, _epB, _eoB),
+]
+
+
+def _move(cube: CubieCube) -> tuple:
+    """
+    Returns the rows of `_CORNER_MULTIPLY` and `_EDGE_MULTIPLY` for the pieces of `cube`, and
+    getters of the pieces it takes from each position, so that `CubieCube.move` does not have to
+    look them up every time.
+    """
+    corners = [_CORNER_MULTIPLY[y] for y in cube.corners]
+    edges = [_EDGE_MULTIPLY[y] for y in cube.edges]
+    return (
+        [row for _, row in corners],
+        itemgetter(*[position for position, _ in corners]),
+        [row for _, row in edges],
+        itemgetter(*[position for position, _ in edges]),
+    )
+
+
+_MOVES = [_move(cube) for cube in MOVE_CUBE]
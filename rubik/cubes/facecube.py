@@ -60,7 +60,10 @@ class FaceCube:
         self.pieces = [Face[cube_str[i]] for i in range(54)]
 
     def to_cubie_cube(self) -> CubieCube:
-        cubie_cube = CubieCube()
+        cp = list(range(8))
+        co = [0] * 8
+        ep = list(range(12))
+        eo = [0] * 12
         orientation = 0
 
         for i in Corner:
@@ -80,8 +83,8 @@ class FaceCube:
                     color_1 == FaceCube.CORNER_COLORS[j][1]
                     and color_2 == FaceCube.CORNER_COLORS[j][2]
                 ):
-                    cubie_cube.corner_permutations[i] = j
-                    cubie_cube.corner_orientations[i] = orientation
+                    cp[i] = j
+                    co[i] = orientation
                     break
 
         for i in Edge:
@@ -92,8 +95,8 @@ class FaceCube:
                     and self.pieces[FaceCube.EDGE_FACELETS[i][1]]
                     == FaceCube.EDGE_COLORS[j][1]
                 ):
-                    cubie_cube.edge_permutations[i] = j
-                    cubie_cube.edge_orientations[i] = 0
+                    ep[i] = j
+                    eo[i] = 0
                     break
                 if (
                     self.pieces[FaceCube.EDGE_FACELETS[i][0]]
@@ -101,8 +104,8 @@ class FaceCube:
                     and self.pieces[FaceCube.EDGE_FACELETS[i][1]]
                     == FaceCube.EDGE_COLORS[j][0]
                 ):
-                    cubie_cube.edge_permutations[i] = j
-                    cubie_cube.edge_orientations[i] = 1
+                    ep[i] = j
+                    eo[i] = 1
                     break
 
-        return cubie_cube
+        return CubieCube(cp, co, ep, eo)
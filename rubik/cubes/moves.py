@@ -0,0 +1,184 @@
+"""
+Compiles move strings such as "R U R' U2 x y'" into sequences of the 18 face turns, so that
+they are parsed once and can then be applied to any kind of cube.
+
+Slice moves, wide moves and rotations turn the centers, which `CubieCube` and the coordinate
+cubes keep fixed. They are rewritten as turns of the outer faces, and the moves after them are
+relabeled with the faces that their layers now hold. Consecutive turns of a face, including
+turns separated only by turns of the opposite face, are merged, and turns that cancel out are
+dropped.
+"""
+from __future__ import annotations
+import re
+import numpy as np
+from functools import lru_cache
+from typing import Iterable, Union
+from .coordcube import CoordCube
+from .cube import (
+    MOVE_NAMES,
+    MOVE_PERMUTATIONS,
+    TRANSFORMATIONS,
+    Cube,
+    _ALIASES,
+    _COMPOSITE_QUARTER_TURNS,
+)
+from .cubebatch import CubeBatch
+from .cubiecube import CubieCube
+from .pieces import Face
+
+# The faces that the centers move to when the whole cube is rotated like each of the faces R,
+# U and F, with the center on each face moving to the next one
+_ROTATION_CYCLES = {"X": "FUBD", "Y": "FLBR", "Z": "URDL"}
+
+_BASE_NAMES = sorted(
+    {name.rstrip("2'") for name in TRANSFORMATIONS}, key=len, reverse=True
+)
+_MOVE_PATTERN = re.compile(r"\s*(" + "|".join(_BASE_NAMES) + r")(2'|2|')?")
+_END_PATTERN = re.compile(r"\s*$")
+
+# The number of clockwise quarter turns of each suffix
+_SUFFIX_TURNS = {None: 1, "": 1, "2": 2, "2'": 2, "'": 3}
+_TURN_SUFFIXES = {1: "", 2: "2", 3: "'"}
+
+
+class MoveSequence:
+    """
+    A compiled sequence of face turns, numbered as in `MOVE_PERMUTATIONS`, along with the
+    permutation of the facelets of `Cube` that the original moves (including any rotations)
+    make.
+    """
+
+    __slots__ = ("moves", "permutation")
+
+    def __init__(self, moves: np.ndarray, permutation: np.ndarray):
+        self.moves = moves
+        self.permutation = permutation
+        self.moves.flags.writeable = False
+        self.permutation.flags.writeable = False
+
+    @classmethod
+    def from_moves(cls, moves: Iterable[int]) -> MoveSequence:
+        """
+        Compiles a sequence of move numbers, folding and cancelling turns as `compile_moves`
+        does.
+        """
+        folded = _fold((move_num // 3, move_num % 3 + 1) for move_num in moves)
+        move_nums = np.array(
+            [3 * face + turns - 1 for face, turns in folded], dtype=np.int8
+        )
+
+        permutation = np.arange(54)
+        for move_num in move_nums:
+            permutation = permutation[MOVE_PERMUTATIONS[move_num]]
+
+        return cls(move_nums, permutation)
+
+    def __len__(self) -> int:
+        return len(self.moves)
+
+    def __iter__(self):
+        return iter(self.moves.tolist())
+
+    def __str__(self) -> str:
+        return " ".join(MOVE_NAMES[move_num] for move_num in self.moves)
+
+    def __repr__(self) -> str:
+        return f"MoveSequence({str(self)!r})"
+
+    def inverse(self) -> MoveSequence:
+        """
+        Returns the sequence that undoes this one.
+        """
+        face, turns = np.divmod(self.moves[::-1], 3)
+        return MoveSequence(
+            (3 * face + 2 - turns).astype(np.int8), np.argsort(self.permutation)
+        )
+
+    def apply(self, cube: Union[Cube, CubeBatch, CubieCube, CoordCube]):
+        """
+        Applies the moves to `cube`. Cubes in the facelet representation are moved with a single
+        gather, and also undergo any rotations of the whole cube in the original moves.
+        """
+        if isinstance(cube, (Cube, CubeBatch)):
+            cube.facelets = cube.facelets[..., self.permutation]
+        elif isinstance(cube, CubieCube):
+            for move_num in self.moves.tolist():
+                face, turns = divmod(move_num, 3)
+                for i in range(turns + 1):
+                    cube.move(face)
+        elif isinstance(cube, CoordCube):
+            for move_num in self.moves.tolist():
+                cube.move(move_num)
+        else:
+            raise TypeError(f"Cannot apply moves to {type(cube).__name__}")
+
+
+@lru_cache(maxsize=1024)
+def compile_moves(moves: str) -> MoveSequence:
+    """
+    Compiles a string of moves separated by optional whitespace. Each move is a face (U, R, F,
+    D, L or B), a wide move (Uw or u, ...), a slice (M, E or S) or a rotation (x, y or z),
+    followed by nothing, 2 or ' for a clockwise, half or counterclockwise turn. A
+    `ValueError` is raised for anything else.
+    """
+    # The face whose center is at each position, which rotations change
+    frame = {face: face for face in "URFDLB"}
+    turns = []
+    permutation = np.arange(54)
+    position = 0
+
+    while not _END_PATTERN.match(moves, position):
+        match = _MOVE_PATTERN.match(moves, position)
+        if match is None:
+            raise ValueError(f"Invalid move at position {position} of {moves!r}")
+
+        name, suffix = match.groups()
+        position = match.end()
+        quarter_turns = _SUFFIX_TURNS[suffix]
+        permutation = permutation[TRANSFORMATIONS[name + _TURN_SUFFIXES[quarter_turns]]]
+
+        name = _ALIASES.get(name, name)
+        for part in _COMPOSITE_QUARTER_TURNS.get(name, (name,)):
+            part_turns = quarter_turns * _SUFFIX_TURNS[part[1:]] % 4
+
+            if part[0] in _ROTATION_CYCLES:
+                cycle = _ROTATION_CYCLES[part[0]]
+                for i in range(part_turns):
+                    frame.update(
+                        {cycle[(j + 1) % 4]: frame[cycle[j]] for j in range(4)}
+                    )
+            else:
+                turns.append((Face[frame[part[0]]], part_turns))
+
+    folded = _fold(turns)
+    move_nums = np.array(
+        [3 * face + turns - 1 for face, turns in folded], dtype=np.int8
+    )
+    return MoveSequence(move_nums, permutation)
+
+
+def _fold(turns: Iterable[tuple[int, int]]) -> list[tuple[int, int]]:
+    """
+    Merges consecutive turns of the same face given as `(face, quarter_turns)` pairs, looking
+    past a single turn of the opposite face, which commutes with them.
+    """
+    folded: list[list[int]] = []
+
+    for face, quarter_turns in turns:
+        if folded and folded[-1][0] == face:
+            index = len(folded) - 1
+        elif (
+            len(folded) >= 2
+            and folded[-1][0] == (face + 3) % 6
+            and folded[-2][0] == face
+        ):
+            index = len(folded) - 2
+        else:
+            folded.append([face, quarter_turns % 4])
+            continue
+
+        folded[index][1] = (folded[index][1] + quarter_turns) % 4
+        if folded[index][1] == 0:
+            del folded[index]
+
+    return [(face, quarter_turns) for face, quarter_turns in folded if quarter_turns]
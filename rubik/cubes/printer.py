@@ -5,17 +5,17 @@ from stringcolor import cs
 
 
 def _flattened_pieces(cube: Cube) -> list[cs]:
-    up = cube.pieces[0].flatten()
-    top_rows = np.concatenate(
-        [cube.pieces[1][0], cube.pieces[2][0], cube.pieces[3][0], cube.pieces[4][0]]
-    )
+    # Worked out from the facelets on each access, so only once here
+    pieces = cube.pieces
+    up = pieces[0].flatten()
+    top_rows = np.concatenate([pieces[1][0], pieces[2][0], pieces[3][0], pieces[4][0]])
     middle_rows = np.concatenate(
-        [cube.pieces[1][1], cube.pieces[2][1], cube.pieces[3][1], cube.pieces[4][1]]
+        [pieces[1][1], pieces[2][1], pieces[3][1], pieces[4][1]]
     )
     bottom_rows = np.concatenate(
-        [cube.pieces[1][2], cube.pieces[2][2], cube.pieces[3][2], cube.pieces[4][2]]
+        [pieces[1][2], pieces[2][2], pieces[3][2], pieces[4][2]]
     )
-    down = cube.pieces[5].flatten()
+    down = pieces[5].flatten()
 
     total = np.concatenate([up, top_rows, middle_rows, bottom_rows, down])
 
@@ -0,0 +1,177 @@
+"""
+Ranking and unranking of the permutations and combinations that the coordinates of the cube
+are built from, both for single cubes and for arrays of many cubes at once.
+
+The rank of a permutation `p` of length n is its Lehmer code: with `s_j` the number of
+`p[i] > p[j]` for `i < j`, it is the sum of `s_j * j!`. The rank of a combination, given as
+flags marking which of n positions are chosen, adds `C(i, seen - 1)` for each position `i`
+that is not chosen but comes after `seen >= 1` chosen ones.
+"""
+from __future__ import annotations
+import numpy as np
+from functools import lru_cache
+from itertools import combinations
+from math import comb, factorial
+from typing import Sequence
+
+# The largest number of pieces of one kind
+_MAX_N = 12
+
+FACTORIALS = [factorial(n) for n in range(_MAX_N + 1)]
+# BINOMIALS[n][k] is C(n, k), which is 0 for k > n
+BINOMIALS = [[comb(n, k) for k in range(_MAX_N + 1)] for n in range(_MAX_N + 1)]
+
+_FACTORIALS_ARRAY = np.array(FACTORIALS, dtype=np.int64)
+_BINOMIALS_ARRAY = np.array(BINOMIALS, dtype=np.int64)
+
+
+# SINGLE PERMUTATIONS AND COMBINATIONS
+
+
+def rank_permutation(p: Sequence[int]) -> int:
+    """
+    Returns the rank of `p`, whose elements must be distinct integers from 0 to 11.
+    """
+    rank = 0
+    # A bit for each element seen so far
+    seen = 0
+
+    for j, x in enumerate(p):
+        rank += FACTORIALS[j] * (seen >> (x + 1)).bit_count()
+        seen |= 1 << x
+
+    return rank
+
+
+def unrank_permutation(rank: int, n: int) -> list[int]:
+    """
+    Returns the permutation of 0 to n - 1 with the given rank.
+    """
+    if n > 8:
+        # Too many permutations to list them all
+        return unrank_permutations(np.array([rank]), n)[0].tolist()
+
+    return _permutations(n)[rank].tolist()
+
+
+def permutation_parity(p: Sequence[int]) -> int:
+    """
+    Returns 1 if `p` is an odd permutation and 0 if it is even.
+    """
+    parity = 0
+    seen = 0
+
+    for x in p:
+        parity ^= (seen >> (x + 1)).bit_count() & 1
+        seen |= 1 << x
+
+    return parity
+
+
+def rank_combination(chosen: Sequence[bool]) -> int:
+    """
+    Returns the rank of the combination marked by the flags `chosen`.
+    """
+    rank = 0
+    seen = 0
+
+    for i, is_chosen in enumerate(chosen):
+        if is_chosen:
+            seen += 1
+        elif seen >= 1:
+            rank += BINOMIALS[i][seen - 1]
+
+    return rank
+
+
+def unrank_combination(rank: int, n: int, k: int) -> list[int]:
+    """
+    Returns the positions, in increasing order, of the combination of `k` out of `n` positions
+    with the given rank.
+    """
+    return _combinations(n, k)[rank].tolist()
+
+
+# ARRAYS OF PERMUTATIONS AND COMBINATIONS
+
+
+def rank_permutations(p: np.ndarray) -> np.ndarray:
+    """
+    Vectorized `rank_permutation` over an (N, n) array of permutations, whose elements only need
+    to be distinct within each row.
+    """
+    n = p.shape[1]
+    before = np.triu(np.ones((n, n), dtype=bool), 1)
+    greater = ((p[:, :, np.newaxis] > p[:, np.newaxis, :]) & before).sum(axis=1)
+    return greater @ _FACTORIALS_ARRAY[:n]
+
+
+def unrank_permutations(ranks: np.ndarray, n: int) -> np.ndarray:
+    """
+    Returns an (N, n) array with the permutations of 0 to n - 1 with the given ranks.
+    """
+    ranks = np.asarray(ranks, dtype=np.int64)
+    rows = np.arange(len(ranks))
+    remaining = np.tile(np.arange(n), (len(ranks), 1))
+    p = np.empty((len(ranks), n), dtype=np.int64)
+
+    # The element at j is preceded by `greater` larger elements, and so by `j - greater`
+    # smaller ones, which picks it out of the elements not placed after it
+    for j in range(n - 1, -1, -1):
+        greater = ranks // FACTORIALS[j] % (j + 1)
+        index = j - greater
+        p[:, j] = remaining[rows, index]
+        remaining = np.where(
+            np.arange(j) >= index[:, np.newaxis],
+            remaining[:, 1 : j + 1],
+            remaining[:, :j],
+        )
+
+    return p
+
+
+def rank_combinations(chosen: np.ndarray) -> np.ndarray:
+    """
+    Vectorized `rank_combination` over an (N, n) boolean array.
+    """
+    n = chosen.shape[1]
+    seen = np.cumsum(chosen, axis=1)
+    # Positions before the first chosen one add nothing, which the mask below takes care of
+    binomials = _BINOMIALS_ARRAY[np.arange(n), np.maximum(seen - 1, 0)]
+    return np.where(~chosen & (seen >= 1), binomials, 0).sum(axis=1)
+
+
+def unrank_combinations(ranks: np.ndarray, n: int, k: int) -> np.ndarray:
+    """
+    Returns an (N, n) boolean array with the combinations of `k` out of `n` positions with the
+    given ranks.
+    """
+    positions = _combinations(n, k)[np.asarray(ranks)]
+    chosen = np.zeros((len(positions), n), dtype=bool)
+    np.put_along_axis(chosen, positions, True, axis=1)
+    return chosen
+
+
+@lru_cache(maxsize=None)
+def _permutations(n: int) -> np.ndarray:
+    """
+    Returns every permutation of 0 to n - 1, ordered by rank.
+    """
+    p = unrank_permutations(np.arange(FACTORIALS[n]), n).astype(np.uint8)
+    p.flags.writeable = False
+    return p
+
+
+@lru_cache(maxsize=None)
+def _combinations(n: int, k: int) -> np.ndarray:
+    """
+    Returns the positions of every combination of `k` out of `n` positions, ordered by rank.
+    """
+    positions = np.array(list(combinations(range(n), k)), dtype=np.int64)
+    chosen = np.zeros((len(positions), n), dtype=bool)
+    np.put_along_axis(chosen, positions, True, axis=1)
+
+    ordered = np.empty_like(positions)
+    ordered[rank_combinations(chosen)] = positions
+    ordered.flags.writeable = False
+    return ordered
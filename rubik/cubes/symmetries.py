@@ -0,0 +1,214 @@
+"""
+The 16 symmetries of the cube that preserve the UD axis, and the symmetry reduction of
+coordinates with them.
+
+Every symmetry is a product F2^a U4^b LR2^c of a 180 degree rotation around the FB axis, a
+90 degree rotation around the UD axis and a reflection in the plane through the U, D, F and B
+centers, and has index `8 * a + 2 * b + c`. The reflection turns the cube into its mirror
+image, whose corners are marked by orientations 3 to 5 rather than 0 to 2.
+
+Conjugating a cube by one of these symmetries maps phase 1 and phase 2 positions onto other
+phase 1 and phase 2 positions at the same distance from the goal. Coordinates that are related
+by a symmetry therefore share a class, and pruning tables only need to store one entry per
+class.
+"""
+from __future__ import annotations
+import numpy as np
+from .pieces import Corner, Edge
+
+# The number of symmetries that preserve the UD axis
+N_SYM = 16
+
+# 180 degree rotation around the axis through the F and B centers
+_cpF2 = (
+    Corner.DLF,
+    Corner.DFR,
+    Corner.DRB,
+    Corner.DBL,
+    Corner.UFL,
+    Corner.URF,
+    Corner.UBR,
+    Corner.ULB,
+)
+_coF2 = (0, 0, 0, 0, 0, 0, 0, 0)
+_epF2 = (
+    Edge.DL,
+    Edge.DF,
+    Edge.DR,
+    Edge.DB,
+    Edge.UL,
+    Edge.UF,
+    Edge.UR,
+    Edge.UB,
+    Edge.FL,
+    Edge.FR,
+    Edge.BR,
+    Edge.BL,
+)
+_eoF2 = (0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+
+# 90 degree clockwise rotation around the axis through the U and D centers
+_cpU4 = (
+    Corner.UBR,
+    Corner.URF,
+    Corner.UFL,
+    Corner.ULB,
+    Corner.DRB,
+    Corner.DFR,
+    Corner.DLF,
+    Corner.DBL,
+)
+_coU4 = (0, 0, 0, 0, 0, 0, 0, 0)
+_epU4 = (
+    Edge.UB,
+    Edge.UR,
+    Edge.UF,
+    Edge.UL,
+    Edge.DB,
+    Edge.DR,
+    Edge.DF,
+    Edge.DL,
+    Edge.BR,
+    Edge.FR,
+    Edge.FL,
+    Edge.BL,
+)
+_eoU4 = (0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1)
+
+# Reflection at the plane through the U, D, F and B centers
+_cpLR2 = (
+    Corner.UFL,
+    Corner.URF,
+    Corner.UBR,
+    Corner.ULB,
+    Corner.DLF,
+    Corner.DFR,
+    Corner.DRB,
+    Corner.DBL,
+)
+_coLR2 = (3, 3, 3, 3, 3, 3, 3, 3)
+_epLR2 = (
+    Edge.UL,
+    Edge.UF,
+    Edge.UR,
+    Edge.UB,
+    Edge.DL,
+    Edge.DF,
+    Edge.DR,
+    Edge.DB,
+    Edge.FL,
+    Edge.FR,
+    Edge.BR,
+    Edge.BL,
+)
+_eoLR2 = (0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+
+
+def corner_multiply(
+    cp_a: np.ndarray, co_a: np.ndarray, cp_b: np.ndarray, co_b: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized `CubieCube.corner_multiply` over arrays of shape (..., 8), which also handles
+    mirror images (orientations 3 to 5).
+    """
+    shape = np.broadcast_shapes(cp_a.shape, cp_b.shape)
+    cp_b = np.broadcast_to(cp_b, shape)
+    cp = np.take_along_axis(np.broadcast_to(cp_a, shape), cp_b, axis=-1)
+    ori_a = np.take_along_axis(np.broadcast_to(co_a, shape), cp_b, axis=-1)
+    ori_b = co_b
+    mirror_a = ori_a >= 3
+    mirror_b = ori_b >= 3
+
+    # A mirror image reverses the direction in which the orientations of the other cube count
+    co = np.where(
+        mirror_a,
+        np.where(mirror_b, (ori_a - ori_b) % 3, (ori_a - ori_b) % 3 + 3),
+        np.where(mirror_b, (ori_a + ori_b) % 3 + 3, (ori_a + ori_b) % 3),
+    )
+    return cp, co
+
+
+def edge_multiply(
+    ep_a: np.ndarray, eo_a: np.ndarray, ep_b: np.ndarray, eo_b: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized `CubieCube.edge_multiply` over arrays of shape (..., 12).
+    """
+    shape = np.broadcast_shapes(ep_a.shape, ep_b.shape)
+    ep_b = np.broadcast_to(ep_b, shape)
+    ep = np.take_along_axis(np.broadcast_to(ep_a, shape), ep_b, axis=-1)
+    eo = (np.take_along_axis(np.broadcast_to(eo_a, shape), ep_b, axis=-1) + eo_b) % 2
+    return ep, eo
+
+
+def _symmetry_arrays() -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns the corner permutation, corner orientation, edge permutation and edge orientation
+    of all 16 symmetries, as arrays of shape (16, 8) and (16, 12).
+    """
+    basic = {
+        name: (np.array(cp), np.array(co), np.array(ep), np.array(eo))
+        for name, (cp, co, ep, eo) in {
+            "F2": (_cpF2, _coF2, _epF2, _eoF2),
+            "U4": (_cpU4, _coU4, _epU4, _eoU4),
+            "LR2": (_cpLR2, _coLR2, _epLR2, _eoLR2),
+        }.items()
+    }
+
+    cp, co = np.arange(8), np.zeros(8, dtype=np.int64)
+    ep, eo = np.arange(12), np.zeros(12, dtype=np.int64)
+    symmetries = []
+
+    def multiply(name: str):
+        nonlocal cp, co, ep, eo
+        b_cp, b_co, b_ep, b_eo = basic[name]
+        cp, co = corner_multiply(cp, co, b_cp, b_co)
+        ep, eo = edge_multiply(ep, eo, b_ep, b_eo)
+
+    for f2 in range(2):
+        for u4 in range(4):
+            for lr2 in range(2):
+                symmetries.append((cp, co, ep, eo))
+                multiply("LR2")
+            multiply("U4")
+        multiply("F2")
+
+    return tuple(np.array(part) for part in zip(*symmetries))  # type: ignore
+
+
+SYM_CP, SYM_CO, SYM_EP, SYM_EO = _symmetry_arrays()
+
+# The index of the inverse of each symmetry
+SYM_INV = np.array(
+    [
+        next(
+            j
+            for j in range(N_SYM)
+            if (SYM_CP[i][SYM_CP[j]] == np.arange(8)).all()
+            and (SYM_EP[i][SYM_EP[j]] == np.arange(12)).all()
+        )
+        for i in range(N_SYM)
+    ]
+)
+
+
+def conjugate_corners(
+    cp: np.ndarray, co: np.ndarray, s: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the corners of S * X * S^-1 for symmetry `s` and each cube X in the (N, 8)
+    arrays `cp` and `co`.
+    """
+    cp, co = corner_multiply(SYM_CP[s], SYM_CO[s], cp, co)
+    return corner_multiply(cp, co, SYM_CP[SYM_INV[s]], SYM_CO[SYM_INV[s]])
+
+
+def conjugate_edges(
+    ep: np.ndarray, eo: np.ndarray, s: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the edges of S * X * S^-1 for symmetry `s` and each cube X in the (N, 12)
+    arrays `ep` and `eo`.
+    """
+    ep, eo = edge_multiply(SYM_EP[s], SYM_EO[s], ep, eo)
+    return edge_multiply(ep, eo, SYM_EP[SYM_INV[s]], SYM_EO[SYM_INV[s]])
@@ -0,0 +1,654 @@
+"""
+Vectorized generation of the move and pruning tables.
+
+Rather than setting a coordinate on a `CubieCube` and applying each move to it one at a time,
+every table is computed with array operations over all of its coordinates at once: the cubies
+of all states are enumerated in coordinate order, each move is applied to all of them with a
+single gather, and the results are ranked back into coordinates. Pruning tables are filled by
+a breadth-first search that only expands the states found at the previous depth.
+"""
+from __future__ import annotations
+from math import factorial
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from multiprocessing.shared_memory import SharedMemory
+from time import perf_counter
+from typing import Callable, NamedTuple, Optional
+import numpy as np
+from .cubiecube import MOVE_CUBE
+from .ranking import (
+    rank_combinations,
+    rank_permutations,
+    unrank_combinations,
+    unrank_permutations,
+)
+from .symmetries import N_SYM, SYM_EP, SYM_INV, conjugate_corners, conjugate_edges
+
+# 3^7 possible corner orientations
+TWIST = 2187
+# 2^11 possible edge flips
+FLIP = 2048
+# 12C4 possible positions of FR, FL, BL, BR
+UDSLICE = 495
+# 4! possible permutations of FR, FL, BL, BR
+EDGE4 = 24
+# 8! possible permutations of UR, UF, UL, UB, DR, DF, DL, DB in phase two
+EDGE8 = 40320
+# 8! possible permutations of the corners
+CORNER = 40320
+# 12!/8! possible positions and orders of 4 edges (e.g. FR, FL, BL, BR)
+SORTED_EDGES = 11880
+# Flip and UD slice coordinates combined, `FLIP * udslice + flip`
+FLIPSLICE = UDSLICE * FLIP
+# The number of classes of flip-slice and corner permutation coordinates under the 16
+# symmetries
+FLIPSLICE_CLASSES = 64430
+CORNER_CLASSES = 2768
+# 6*3 possible moves
+MOVES = 18
+
+# The moves allowed in phase 2 (U*, D*, R2, F2, L2, B2)
+PHASE_2_MOVES = [m for m in range(MOVES) if m // 3 in (0, 3) or m % 3 == 1]
+
+
+def _move_arrays() -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns the corner permutation, corner orientation, edge permutation and edge orientation
+    of all 18 moves, as arrays of shape (18, 8) and (18, 12). Move 3 * i + k is face i turned
+    k + 1 times.
+    """
+    cp = np.zeros((MOVES, 8), dtype=np.int64)
+    co = np.zeros((MOVES, 8), dtype=np.int64)
+    ep = np.zeros((MOVES, 12), dtype=np.int64)
+    eo = np.zeros((MOVES, 12), dtype=np.int64)
+
+    for i, move in enumerate(MOVE_CUBE):
+        move_cp = np.array(move.corner_permutations)
+        move_co = np.array(move.corner_orientations)
+        move_ep = np.array(move.edge_permutations)
+        move_eo = np.array(move.edge_orientations)
+        cp[3 * i], co[3 * i] = move_cp, move_co
+        ep[3 * i], eo[3 * i] = move_ep, move_eo
+
+        for k in range(1, 3):
+            previous = 3 * i + k - 1
+            cp[3 * i + k] = cp[previous][move_cp]
+            co[3 * i + k] = (co[previous][move_cp] + move_co) % 3
+            ep[3 * i + k] = ep[previous][move_ep]
+            eo[3 * i + k] = (eo[previous][move_ep] + move_eo) % 2
+
+    return cp, co, ep, eo
+
+
+MOVE_CP, MOVE_CO, MOVE_EP, MOVE_EO = _move_arrays()
+
+# COORDINATES OF MANY CUBES AT ONCE
+
+
+def twist_coordinates(co: np.ndarray) -> np.ndarray:
+    """
+    Vectorized `CubieCube.phase_1_corner` over an (N, 8) array of corner orientations.
+    """
+    return co[:, :7] @ (3 ** np.arange(6, -1, -1))
+
+
+def flip_coordinates(eo: np.ndarray) -> np.ndarray:
+    """
+    Vectorized `CubieCube.phase_1_edge` over an (N, 12) array of edge orientations.
+    """
+    return eo[:, :11] @ (2 ** np.arange(10, -1, -1))
+
+
+def udslice_coordinates(in_slice: np.ndarray) -> np.ndarray:
+    """
+    Vectorized `CubieCube.phase_1_ud_slice` over an (N, 12) boolean array that is true at the
+    positions holding one of the UD slice edges.
+    """
+    return rank_combinations(in_slice)
+
+
+def permutation_coordinates(p: np.ndarray) -> np.ndarray:
+    """
+    Vectorized Lehmer code used by `CubieCube.phase_2_corner`, `phase_2_edge` and
+    `phase_2_ud_slice`, over an (N, n) array of permutations.
+    """
+    return rank_permutations(p)
+
+
+def sorted_edges_coordinates(pieces: np.ndarray) -> np.ndarray:
+    """
+    Vectorized `CubieCube.slice_sorted`, `u_edges` and `d_edges` over an (N, 12) array holding
+    the 4 tracked edges as 0 to 3 at their positions and -1 everywhere else.
+    """
+    tracked = pieces >= 0
+    order = pieces[tracked].reshape(len(pieces), 4)
+    return 24 * udslice_coordinates(tracked) + permutation_coordinates(order)
+
+
+def _all_permutations(n: int) -> np.ndarray:
+    return unrank_permutations(np.arange(factorial(n)), n)
+
+
+def _all_twists() -> np.ndarray:
+    co = (np.arange(TWIST)[:, np.newaxis] // 3 ** np.arange(6, -1, -1)) % 3
+    return np.hstack([co, (-co.sum(axis=1, keepdims=True)) % 3])
+
+
+def _all_flips() -> np.ndarray:
+    eo = (np.arange(FLIP)[:, np.newaxis] // 2 ** np.arange(10, -1, -1)) % 2
+    return np.hstack([eo, eo.sum(axis=1, keepdims=True) % 2])
+
+
+def _all_udslices() -> np.ndarray:
+    return unrank_combinations(np.arange(UDSLICE), 12, 4)
+
+
+# MOVE TABLES
+
+
+def make_twist_move() -> np.ndarray:
+    co = _all_twists()
+    return np.stack(
+        [twist_coordinates((co[:, MOVE_CP[m]] + MOVE_CO[m]) % 3) for m in range(MOVES)],
+        axis=1,
+    )
+
+
+def make_flip_move() -> np.ndarray:
+    eo = _all_flips()
+    return np.stack(
+        [flip_coordinates((eo[:, MOVE_EP[m]] + MOVE_EO[m]) % 2) for m in range(MOVES)],
+        axis=1,
+    )
+
+
+def make_udslice_move() -> np.ndarray:
+    in_slice = _all_udslices()
+    return np.stack(
+        [udslice_coordinates(in_slice[:, MOVE_EP[m]]) for m in range(MOVES)], axis=1
+    )
+
+
+def _make_phase_2_move(p: np.ndarray, move_p: np.ndarray) -> np.ndarray:
+    """
+    Builds the move table of a permutation coordinate that is only defined in phase 2, where
+    `p` holds the permutations of all coordinates and `move_p` the matching part of each move.
+    Moves outside of phase 2 are marked with -1.
+    """
+    table = np.full((len(p), MOVES), -1, dtype=np.int64)
+    for m in PHASE_2_MOVES:
+        table[:, m] = permutation_coordinates(p[:, move_p[m]])
+    return table
+
+
+def make_edge4_move() -> np.ndarray:
+    # Phase 2 moves keep the slice edges inside the slice
+    return _make_phase_2_move(_all_permutations(4), MOVE_EP[:, 8:] - 8)
+
+
+def make_edge8_move() -> np.ndarray:
+    return _make_phase_2_move(_all_permutations(8), MOVE_EP[:, :8])
+
+
+def make_corner_move() -> np.ndarray:
+    # Unlike the edge permutations, the corner permutation is defined outside of phase 2 too,
+    # so the table covers every move
+    corners = _all_permutations(8)
+    return np.stack(
+        [permutation_coordinates(corners[:, MOVE_CP[m]]) for m in range(MOVES)], axis=1
+    )
+
+
+def _all_sorted_edges() -> np.ndarray:
+    # Coordinate 24 * i + j places the 4 edges at combination i in the order of permutation j
+    in_slice = np.repeat(_all_udslices(), 24, axis=0)
+    pieces = np.full((SORTED_EDGES, 12), -1, dtype=np.int64)
+    pieces[in_slice] = np.tile(_all_permutations(4), (UDSLICE, 1)).reshape(-1)
+    return pieces
+
+
+def make_sorted_edges_move() -> np.ndarray:
+    # The table only tracks where 4 edges go, so it serves the slice, U and D edges alike
+    pieces = _all_sorted_edges()
+    return np.stack(
+        [sorted_edges_coordinates(pieces[:, MOVE_EP[m]]) for m in range(MOVES)], axis=1
+    )
+
+
+def make_edge8_merge() -> np.ndarray:
+    """
+    Combines the U and D edge coordinates into the phase 2 edge permutation coordinate. The
+    entry for U edge coordinate `u` and D edge coordinate `d` is at `24 * u + d % 24`: once
+    the U edges are among the first 8 positions, the D edges fill the rest, so only their
+    order is needed. Entries where the U edges are not among the first 8 positions are -1.
+    """
+    u_edges = _all_sorted_edges()
+    valid = (u_edges[:, 8:] == -1).all(axis=1)
+    table = np.full((SORTED_EDGES, 24), -1, dtype=np.int64)
+
+    for j, order in enumerate(_all_permutations(4)):
+        edges = u_edges[valid, :8].copy()
+        free = edges == -1
+        edges[free] = np.tile(order + 4, valid.sum())
+        table[valid, j] = permutation_coordinates(edges)
+
+    return table.reshape(-1)
+
+
+# SYMMETRY TABLES
+
+
+def _flipslice_conjugates(flipslices: np.ndarray) -> np.ndarray:
+    """
+    Returns the flip-slice coordinate (`FLIP * udslice + flip`) of S * X * S^-1 for each
+    symmetry S and each flip-slice coordinate of X in `flipslices`, as an (N, 16) array.
+
+    The edge orientations of S * X * S^-1 are those of X permuted by S^-1, flipped wherever
+    S flips the edges that the UD slice coordinate puts there. Both parts are tabulated
+    separately and combined with an XOR.
+    """
+    in_slice = _all_udslices()
+    # Any edge permutation with the slice edges at the right positions will do
+    ep = np.argsort(np.argsort(in_slice, axis=1, kind="stable"), axis=1)
+    eo = _all_flips()
+    udslice_conj = np.empty((UDSLICE, N_SYM), dtype=np.int64)
+    flip_offset = np.empty((UDSLICE, N_SYM), dtype=np.int64)
+    flip_conj = np.empty((FLIP, N_SYM), dtype=np.int64)
+
+    for s in range(N_SYM):
+        ep_s, eo_s = conjugate_edges(ep, np.zeros_like(ep), s)
+        udslice_conj[:, s] = udslice_coordinates(ep_s >= 8)
+        flip_offset[:, s] = flip_coordinates(eo_s)
+        flip_conj[:, s] = flip_coordinates(eo[:, SYM_EP[SYM_INV[s]]])
+
+    udslices, flips = np.divmod(flipslices, FLIP)
+    return FLIP * udslice_conj[udslices] + (flip_conj[flips] ^ flip_offset[udslices])
+
+
+def _corner_conjugates(corners: np.ndarray) -> np.ndarray:
+    cp = _all_permutations(8)[corners]
+    co = np.zeros_like(cp)
+    return np.stack(
+        [
+            permutation_coordinates(conjugate_corners(cp, co, s)[0])
+            for s in range(N_SYM)
+        ],
+        axis=1,
+    )
+
+
+def _symmetry_classes(conjugates: np.ndarray) -> np.ndarray:
+    """
+    Returns `N_SYM * c + s` for every coordinate, where `c` is its class and `s` the symmetry
+    that conjugates it to the representative of the class, the smallest coordinate in it.
+    """
+    representatives = conjugates.min(axis=1)
+    classes = np.searchsorted(np.unique(representatives), representatives)
+    return N_SYM * classes + conjugates.argmin(axis=1)
+
+
+def _class_representatives(classes: np.ndarray) -> np.ndarray:
+    # Only the representative itself is conjugated to the representative by the identity
+    return np.flatnonzero(classes % N_SYM == 0)
+
+
+def _stabilizers(conjugates: np.ndarray, representatives: np.ndarray) -> np.ndarray:
+    """
+    Returns a bit mask of the symmetries that leave each representative unchanged.
+    """
+    fixed = conjugates == representatives[:, np.newaxis]
+    return (fixed << np.arange(N_SYM)).sum(axis=1)
+
+
+def make_flipslice_class() -> np.ndarray:
+    return _symmetry_classes(_flipslice_conjugates(np.arange(FLIPSLICE)))
+
+
+def make_flipslice_rep(flipslice_class) -> np.ndarray:
+    return _class_representatives(flipslice_class)
+
+
+def make_corner_class() -> np.ndarray:
+    return _symmetry_classes(_corner_conjugates(np.arange(CORNER)))
+
+
+def make_corner_rep(corner_class) -> np.ndarray:
+    return _class_representatives(corner_class)
+
+
+def make_twist_conj() -> np.ndarray:
+    co = _all_twists()
+    cp = np.broadcast_to(np.arange(8), co.shape)
+    return np.stack(
+        [twist_coordinates(conjugate_corners(cp, co, s)[1]) for s in range(N_SYM)],
+        axis=1,
+    )
+
+
+def make_edge8_conj() -> np.ndarray:
+    ep = np.hstack(
+        [_all_permutations(8), np.broadcast_to(np.arange(8, 12), (EDGE8, 4))]
+    )
+    eo = np.zeros_like(ep)
+    return np.stack(
+        [
+            permutation_coordinates(conjugate_edges(ep, eo, s)[0][:, :8])
+            for s in range(N_SYM)
+        ],
+        axis=1,
+    )
+
+
+# PRUNING TABLES
+
+
+def make_pruning_table(
+    move_a: np.ndarray, move_b: np.ndarray, moves: list[int]
+) -> np.ndarray:
+    """
+    Computes the number of moves needed to bring the pair of coordinates (a, b) to (0, 0) for
+    every pair, stored at index `a * len(move_b) + b`. Only the states first reached at the
+    previous depth are expanded at each step.
+    """
+    stride = len(move_b)
+    move_a = move_a[:, moves].astype(np.int64)
+    move_b = move_b[:, moves].astype(np.int64)
+    table = np.full(len(move_a) * stride, -1, dtype=np.int8)
+    table[0] = 0
+    frontier = np.array([0])
+    depth = 0
+
+    while frontier.size:
+        a, b = np.divmod(frontier, stride)
+        neighbours = (move_a[a] * stride + move_b[b]).ravel()
+        neighbours = neighbours[table[neighbours] == -1]
+        table[neighbours] = depth + 1
+        frontier = np.flatnonzero(table == depth + 1)
+        depth += 1
+
+    return table
+
+
+def make_symmetric_pruning_table(
+    class_move: np.ndarray,
+    stabilizers: np.ndarray,
+    move_b: np.ndarray,
+    conj_b: np.ndarray,
+    moves: list[int],
+    chunk_size: int = 1 << 18,
+) -> np.ndarray:
+    """
+    Computes the number of moves needed to solve every pair of a symmetry class `c` of one
+    coordinate and a value `b` of another, stored at index `c * len(move_b) + b`. A state is
+    looked up by conjugating it to the representative of its class, so `b` is the second
+    coordinate of the conjugated state.
+
+    `class_move[c, m]` holds `N_SYM * class + symmetry` of the representative of class `c`
+    after move `m`, `conj_b` the conjugates of the second coordinate and `stabilizers` the
+    symmetries that leave each representative unchanged. States are expanded in chunks to
+    bound memory, and once most states have been reached the search works backwards from the
+    unreached states instead.
+    """
+    stride = len(move_b)
+    # 32 bits are enough for every index, and halve the memory traffic
+    class_move = class_move[:, moves].astype(np.int32)
+    moves_b = N_SYM * move_b[:, moves].astype(np.int32)
+    conj_b = conj_b.astype(np.int32).ravel()
+    table = np.full(len(class_move) * stride, -1, dtype=np.int8)
+    table[0] = 0
+    depth = 0
+    unreached = len(table) - 1
+
+    while unreached:
+        frontier = np.flatnonzero(table == depth).astype(np.int32)
+        if not len(frontier):
+            # The remaining states cannot be reached
+            break
+
+        backwards = len(frontier) > unreached
+        if backwards:
+            frontier = np.flatnonzero(table == -1).astype(np.int32)
+
+        for start in range(0, len(frontier), chunk_size):
+            states = frontier[start : start + chunk_size]
+            c, b = np.divmod(states, stride)
+            moved = class_move[c]
+            neighbours = (moved >> 4) * stride + conj_b[moves_b[b] + (moved & 15)]
+
+            if backwards:
+                table[states[(table[neighbours] == depth).any(axis=1)]] = depth + 1
+                continue
+
+            found = neighbours[table[neighbours] == -1]
+            table[found] = depth + 1
+
+            # States that are symmetric to the new ones are equally far from the goal. Only
+            # few representatives are left unchanged by any symmetry besides the identity.
+            c, b = np.divmod(found, stride)
+            symmetric = stabilizers[c] > 1
+            c, b = c[symmetric], b[symmetric]
+            for s in range(1, N_SYM):
+                fixed = (stabilizers[c] >> s) & 1 == 1
+                table[c[fixed] * stride + conj_b[N_SYM * b[fixed] + s]] = depth + 1
+
+        depth += 1
+        unreached = np.count_nonzero(table == -1)
+
+    return table
+
+
+def pack_nibbles(table: np.ndarray) -> np.ndarray:
+    """
+    Packs the distances in `table` two to a byte, starting from the low nibble. Distances
+    over 15 and unreachable entries are stored as 15, which is still a lower bound.
+    """
+    values = np.where(table < 0, 15, np.minimum(table, 15)).astype(np.uint8)
+    values = np.append(values, np.full(-len(values) % 2, 15, dtype=np.uint8))
+    return values[0::2] | (values[1::2] << 4)
+
+
+def pack_mod3(table: np.ndarray) -> np.ndarray:
+    """
+    Packs the distances in `table` modulo 3 four to a byte, starting from the lowest two bits.
+    Unreachable entries are stored as 3. The distance of a position differs by at most one
+    from that of the position before it, so the search can recover it from the remainder.
+    """
+    values = np.where(table < 0, 3, table % 3).astype(np.uint8)
+    values = np.append(values, np.full(-len(values) % 4, 3, dtype=np.uint8))
+    values = values.reshape(-1, 4)
+    return (
+        values[:, 0] | (values[:, 1] << 2) | (values[:, 2] << 4) | (values[:, 3] << 6)
+    )
+
+
+def make_flipslice_twist_prune(
+    flipslice_class, flipslice_rep, udslice_move, flip_move, twist_move, twist_conj
+) -> np.ndarray:
+    representatives = flipslice_rep.astype(np.int64)
+    udslices, flips = np.divmod(representatives, FLIP)
+    # The stored move tables are too narrow for flip-slice coordinates
+    moved = FLIP * udslice_move[udslices].astype(np.int64) + flip_move[flips]
+    class_move = flipslice_class[moved]
+    stabilizers = _stabilizers(_flipslice_conjugates(representatives), representatives)
+    return pack_mod3(
+        make_symmetric_pruning_table(
+            class_move, stabilizers, twist_move, twist_conj, list(range(MOVES))
+        )
+    )
+
+
+def make_corner_edge8_prune(
+    corner_class, corner_rep, corner_move, edge8_move, edge8_conj
+) -> np.ndarray:
+    representatives = corner_rep.astype(np.int64)
+    class_move = corner_class[corner_move[representatives]]
+    stabilizers = _stabilizers(_corner_conjugates(representatives), representatives)
+    return pack_nibbles(
+        make_symmetric_pruning_table(
+            class_move, stabilizers, edge8_move, edge8_conj, PHASE_2_MOVES
+        )
+    )
+
+
+def make_edge4_corner_prune(edge4_move, corner_move) -> np.ndarray:
+    return pack_nibbles(make_pruning_table(edge4_move, corner_move, PHASE_2_MOVES))
+
+
+class TableSpec(NamedTuple):
+    """
+    Describes how a table is built and stored.
+    """
+
+    builder: Callable[..., np.ndarray]
+    # The tables passed to `builder`
+    dependencies: tuple[str, ...]
+    shape: tuple[int, ...]
+    # The fixed-width type the table is stored with. The phase 2 permutation coordinates go up
+    # to 8! - 1 = 40319, which does not fit into 16 bits, and the -1 entries (moves outside of
+    # phase 2) rule out unsigned types for the move tables.
+    dtype: type
+
+
+# Every table, in an order that respects the dependencies between them
+TABLES: dict[str, TableSpec] = {
+    "twist_move": TableSpec(make_twist_move, (), (TWIST, MOVES), np.int16),
+    "flip_move": TableSpec(make_flip_move, (), (FLIP, MOVES), np.int16),
+    "udslice_move": TableSpec(make_udslice_move, (), (UDSLICE, MOVES), np.int16),
+    "edge4_move": TableSpec(make_edge4_move, (), (EDGE4, MOVES), np.int16),
+    "edge8_move": TableSpec(make_edge8_move, (), (EDGE8, MOVES), np.int32),
+    "corner_move": TableSpec(make_corner_move, (), (CORNER, MOVES), np.int32),
+    "sorted_edges_move": TableSpec(
+        make_sorted_edges_move, (), (SORTED_EDGES, MOVES), np.int16
+    ),
+    "edge8_merge": TableSpec(make_edge8_merge, (), (SORTED_EDGES * 24,), np.int32),
+    "twist_conj": TableSpec(make_twist_conj, (), (TWIST, N_SYM), np.uint16),
+    "edge8_conj": TableSpec(make_edge8_conj, (), (EDGE8, N_SYM), np.uint16),
+    "flipslice_class": TableSpec(make_flipslice_class, (), (FLIPSLICE,), np.uint32),
+    "flipslice_rep": TableSpec(
+        make_flipslice_rep, ("flipslice_class",), (FLIPSLICE_CLASSES,), np.uint32
+    ),
+    "corner_class": TableSpec(make_corner_class, (), (CORNER,), np.uint16),
+    "corner_rep": TableSpec(
+        make_corner_rep, ("corner_class",), (CORNER_CLASSES,), np.uint16
+    ),
+    "flipslice_twist_prune": TableSpec(
+        make_flipslice_twist_prune,
+        (
+            "flipslice_class",
+            "flipslice_rep",
+            "udslice_move",
+            "flip_move",
+            "twist_move",
+            "twist_conj",
+        ),
+        ((FLIPSLICE_CLASSES * TWIST + 3) // 4,),
+        np.uint8,
+    ),
+    "corner_edge8_prune": TableSpec(
+        make_corner_edge8_prune,
+        ("corner_class", "corner_rep", "corner_move", "edge8_move", "edge8_conj"),
+        (CORNER_CLASSES * EDGE8 // 2,),
+        np.uint8,
+    ),
+    "edge4_corner_prune": TableSpec(
+        make_edge4_corner_prune,
+        ("edge4_move", "corner_move"),
+        (EDGE4 * CORNER // 2,),
+        np.uint8,
+    ),
+}
+
+
+def generate_tables(
+    report: Optional[Callable[[str, float], None]] = None
+) -> dict[str, np.ndarray]:
+    """
+    Builds every table one after another. `report` is called with the name of each table and
+    the number of seconds it took to build once it is done.
+    """
+    tables: dict[str, np.ndarray] = {}
+
+    for name, spec in TABLES.items():
+        start = perf_counter()
+        table = spec.builder(*(tables[dependency] for dependency in spec.dependencies))
+        tables[name] = table.astype(spec.dtype)
+        if report is not None:
+            report(name, perf_counter() - start)
+
+    return tables
+
+
+def _shared_array(shm: SharedMemory, name: str) -> np.ndarray:
+    spec = TABLES[name]
+    return np.ndarray(spec.shape, dtype=spec.dtype, buffer=shm.buf)
+
+
+def _build_shared_table(name: str, shm_names: dict[str, str]) -> float:
+    """
+    Builds table `name` inside a worker process. The dependencies are read from, and the
+    result written to, the shared memory blocks named in `shm_names`.
+    """
+    start = perf_counter()
+    spec = TABLES[name]
+    blocks = {
+        table: SharedMemory(shm_names[table]) for table in (name, *spec.dependencies)
+    }
+
+    try:
+        dependencies = [
+            _shared_array(blocks[table], table) for table in spec.dependencies
+        ]
+        _shared_array(blocks[name], name)[...] = spec.builder(*dependencies)
+        # The arrays must be released before the blocks can be closed
+        del dependencies
+    finally:
+        for block in blocks.values():
+            block.close()
+
+    return perf_counter() - start
+
+
+def generate_tables_parallel(
+    workers: Optional[int] = None,
+    report: Optional[Callable[[str, float], None]] = None,
+) -> dict[str, np.ndarray]:
+    """
+    Builds every table on a pool of `workers` processes (by default, one per CPU). A table is
+    scheduled as soon as the tables it depends on are done, and workers write their results
+    directly into shared memory so that no table is pickled between processes.
+    """
+    blocks = {
+        name: SharedMemory(
+            create=True, size=int(np.prod(spec.shape)) * np.dtype(spec.dtype).itemsize
+        )
+        for name, spec in TABLES.items()
+    }
+    shm_names = {name: block.name for name, block in blocks.items()}
+
+    try:
+        with ProcessPoolExecutor(workers) as executor:
+            pending = dict(TABLES)
+            done: set[str] = set()
+            running: dict[Future, str] = {}
+
+            while pending or running:
+                for name, spec in list(pending.items()):
+                    if all(dependency in done for dependency in spec.dependencies):
+                        future = executor.submit(_build_shared_table, name, shm_names)
+                        running[future] = name
+                        del pending[name]
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    seconds = future.result()
+                    done.add(name)
+                    if report is not None:
+                        report(name, seconds)
+
+        return {
+            name: _shared_array(block, name).copy() for name, block in blocks.items()
+        }
+    finally:
+        for block in blocks.values():
+            block.close()
+            block.unlink()
@@ -1,24 +1,40 @@
-
-
-import json
 import os
-import requests
+import numpy as np
+from typing import Callable, Optional
 
-from .cubiecube import MOVE_CUBE, CubieCube
-from os import path
+from .tablegen import TABLES, generate_tables, generate_tables_parallel
+from .tablestore import load_table_store, table_store_lock, write_table_store
+
+TABLES_FILENAME = "tables.bin"
+# The environment variable holding the directory the tables are cached in
+TABLES_DIRECTORY_VARIABLE = "RUBIK_TABLES_DIR"
+# Incremented whenever the contents of the tables change, which invalidates existing stores
+TABLES_VERSION = 4
 
 
 class PruningTable:
     """
-    Helper class to allow pruning to be used as though they were 2-D tables
+    Helper class to allow pruning to be used as though they were 2-D tables. Entries are
+    packed `8 // bits` to a byte, starting from the lowest bits. A table with a `modulus` only
+    stores the distances modulo it, and the search recovers them from the distance of the
+    previous position.
     """
 
-    def __init__(self, table, stride):
+    def __init__(self, table, stride, bits=8, modulus=None):
         self.table = table
         self.stride = stride
+        self.bits = bits
+        self.modulus = modulus
+        self._per_byte = 8 // bits
+        self._mask = (1 << bits) - 1
 
     def __getitem__(self, x):
-        return self.table[x[0] * self.stride + x[1]]
+        i = x[0] * self.stride + x[1]
+        if self.bits == 8:
+            return self.table[i]
+
+        shift = self.bits * (i % self._per_byte)
+        return (self.table[i // self._per_byte] >> shift) & self._mask
 
 
 class Tables:
@@ -30,6 +46,11 @@ class Tables:
 
     Pruning tables are used to obtain lower bounds for the number of moves
     required to reach a solution given a particular pair of coordinates.
+
+    The two largest pruning tables only store one entry per symmetry class of their first
+    coordinate (see `rubik.cubes.symmetries`). They are looked up with the class and the
+    second coordinate conjugated by the symmetry that maps the first one to the
+    representative of its class, as `phase_1_distance` and `phase_2_distance` do.
     """
 
     _tables_loaded = False
@@ -46,263 +67,191 @@ class Tables:
     EDGE8 = 40320
     # 8! possible permutations of the corners
     CORNER = 40320
+    # 12!/8! possible positions and orders of 4 edges
+    SORTED_EDGES = 11880
     # 12! possible permutations of all edges
     EDGE = 479001600
     # 6*3 possible moves
     MOVES = 18
-
-    def __init__(self):
+    # Symmetries of the cube that preserve the UD axis
+    N_SYM = 16
+    # Classes of the flip and UD slice coordinates combined, and of the corner permutations,
+    # under these symmetries
+    FLIPSLICE_CLASSES = 64430
+    CORNER_CLASSES = 2768
+
+    def __init__(self, directory: Optional[str] = None):
         if not self._tables_loaded:
-            self.load_tables()
+            self.load_tables(directory)
+
+    @staticmethod
+    def tables_filename(directory: Optional[str] = None) -> str:
+        """
+        Returns the path of the table store inside `directory`. When no directory is given, the
+        `RUBIK_TABLES_DIR` environment variable is used, falling back to the user's cache
+        directory.
+        """
+        if directory is None:
+            directory = os.environ.get(TABLES_DIRECTORY_VARIABLE)
+        if directory is None:
+            cache = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+            directory = os.path.join(cache, "rubik")
+
+        return os.path.join(directory, TABLES_FILENAME)
 
     @classmethod
-    def load_tables(cls):
-        if os.path.isfile("tables.json"):
-            with open("tables.json", "r") as f:
-                tables = json.load(f)
-            cls.twist_move = tables["twist_move"]
-            cls.flip_move = tables["flip_move"]
-            cls.udslice_move = tables["udslice_move"]
-            cls.edge4_move = tables["edge4_move"]
-            cls.edge8_move = tables["edge8_move"]
-            cls.corner_move = tables["corner_move"]
-            cls.udslice_twist_prune = PruningTable(
-                tables["udslice_twist_prune"], cls.TWIST
-            )
-            cls.udslice_flip_prune = PruningTable(
-                tables["udslice_flip_prune"], cls.FLIP
-            )
-            cls.edge4_edge8_prune = PruningTable(tables["edge4_edge8_prune"], cls.EDGE8)
-            cls.edge4_corner_prune = PruningTable(
-                tables["edge4_corner_prune"], cls.CORNER
-            )
-        else:
-            # TODO: Attempt to download a pre-generated one
-            # response = requests.get(
-            #     "https://www.dropbox.com/s/1g77l5ih0y7vpae/tables.json",
-            #     allow_redirects=True,
-            # )
-            # print(response.status_code)
-            # print(response.content)
-            # if response.status_code != 200 or not path.exists("tables.json"):
-            #     print("failed")
-            # else:
-            #     print("succeeded")
-            # return
-
-            # Otherwise, generate it mnaually
-
-            print(
-                "Generating move and pruning tables. May take a few minutes to complete."
-            )
-            # ----------  Phase 1 move tables  ---------- #
-            print("Generating twist table")
-            cls.twist_move = cls.make_twist_table()
-            print("Generating flip table")
-            cls.flip_move = cls.make_flip_table()
-            print("Generating udslice table")
-            cls.udslice_move = cls.make_udslice_table()
-
-            # ----------  Phase 2 move tables  ---------- #
-            print("Generating edge4 table")
-            cls.edge4_move = cls.make_edge4_table()
-            print("Generating edge8 table")
-            cls.edge8_move = cls.make_edge8_table()
-            print("Generating corner table")
-            cls.corner_move = cls.make_corner_table()
-
-            # ----------  Phase 1 pruning tables  ---------- #
-            print("Generating udslice twist prune table")
-            cls.udslice_twist_prune = cls.make_udslice_twist_prune()
-            print("Generating udslice flip prune table")
-            cls.udslice_flip_prune = cls.make_udslice_flip_prune()
-
-            # --------  Phase 2 pruning tables  ---------- #
-            print("Generating edge4 edge8 prune table")
-            cls.edge4_edge8_prune = cls.make_edge4_edge8_prune()
-            print("Generating edge4 corner prune table\n")
-            cls.edge4_corner_prune = cls.make_edge4_corner_prune()
-
-            tables = {
-                "twist_move": cls.twist_move,
-                "flip_move": cls.flip_move,
-                "udslice_move": cls.udslice_move,
-                "edge4_move": cls.edge4_move,
-                "edge8_move": cls.edge8_move,
-                "corner_move": cls.corner_move,
-                "udslice_twist_prune": cls.udslice_twist_prune.table,
-                "udslice_flip_prune": cls.udslice_flip_prune.table,
-                "edge4_edge8_prune": cls.edge4_edge8_prune.table,
-                "edge4_corner_prune": cls.edge4_corner_prune.table,
-            }
-            with open("tables.json", "w") as f:
-                json.dump(tables, f)
-
+    def load_tables(cls, directory: Optional[str] = None):
+        filename = cls.tables_filename(directory)
+        tables = cls._load_table_store(filename)
+
+        if tables is None:
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+            with table_store_lock(filename):
+                # Another process may have generated the tables while we waited for the lock
+                tables = cls._load_table_store(filename)
+
+                if tables is None:
+                    print("Generating move and pruning tables.")
+                    tables = cls._build_table_store(
+                        filename,
+                        lambda name, seconds: print(
+                            f"Generated {name} in {seconds:.2f} seconds"
+                        ),
+                    )
+                    print()
+
+        cls._assign_tables(tables)
         cls._tables_loaded = True
 
-    @classmethod
-    def make_twist_table(cls):
-        twist_move = [[0] * cls.MOVES for i in range(cls.TWIST)]
-        a = CubieCube()
-        for i in range(cls.TWIST):
-            a.phase_1_corner = i
-            for j in range(6):
-                for k in range(3):
-                    a.corner_multiply(MOVE_CUBE[j])
-                    twist_move[i][3 * j + k] = a.phase_1_corner
-                a.corner_multiply(MOVE_CUBE[j])
-        return twist_move
+    @staticmethod
+    def _load_table_store(filename: str) -> Optional[dict[str, np.ndarray]]:
+        """
+        Maps the table store `filename`, or returns `None` if it is missing or outdated.
+        """
+        if not os.path.isfile(filename):
+            return None
 
-    @classmethod
-    def make_flip_table(cls):
-        flip_move = [[0] * cls.MOVES for i in range(cls.FLIP)]
-        a = CubieCube()
-        for i in range(cls.FLIP):
-            a.phase_1_edge = i
-            for j in range(6):
-                for k in range(3):
-                    a.edge_multiply(MOVE_CUBE[j])
-                    flip_move[i][3 * j + k] = a.phase_1_edge
-                a.edge_multiply(MOVE_CUBE[j])
-        return flip_move
+        try:
+            tables = load_table_store(filename, tables_version=TABLES_VERSION)
+        except ValueError as e:
+            print(f"Ignoring {filename}: {e}")
+            return None
 
-    @classmethod
-    def make_udslice_table(cls):
-        udslice_move = [[0] * cls.MOVES for i in range(cls.UDSLICE)]
-        a = CubieCube()
-        for i in range(cls.UDSLICE):
-            a.phase_1_ud_slice = i
-            for j in range(6):
-                for k in range(3):
-                    a.edge_multiply(MOVE_CUBE[j])
-                    udslice_move[i][3 * j + k] = a.phase_1_ud_slice
-                a.edge_multiply(MOVE_CUBE[j])
-        return udslice_move
+        if not all(name in tables for name in TABLES):
+            return None
 
-    @classmethod
-    def make_edge4_table(cls):
-        edge4_move = [[0] * cls.MOVES for i in range(cls.EDGE4)]
-        a = CubieCube()
-        for i in range(cls.EDGE4):
-            a.phase_2_ud_slice = i
-            for j in range(6):
-                for k in range(3):
-                    a.edge_multiply(MOVE_CUBE[j])
-                    if k % 2 == 0 and j % 3 != 0:
-                        edge4_move[i][3 * j + k] = -1
-                    else:
-                        edge4_move[i][3 * j + k] = a.phase_2_ud_slice
-                a.edge_multiply(MOVE_CUBE[j])
-        return edge4_move
+        return tables
 
     @classmethod
-    def make_edge8_table(cls):
-        edge8_move = [[0] * cls.MOVES for i in range(cls.EDGE8)]
-        a = CubieCube()
-        for i in range(cls.EDGE8):
-            a.phase_2_edge = i
-            for j in range(6):
-                for k in range(3):
-                    a.edge_multiply(MOVE_CUBE[j])
-                    if k % 2 == 0 and j % 3 != 0:
-                        edge8_move[i][3 * j + k] = -1
-                    else:
-                        edge8_move[i][3 * j + k] = a.phase_2_edge
-                a.edge_multiply(MOVE_CUBE[j])
-        return edge8_move
+    def _assign_tables(cls, tables: dict[str, np.ndarray]):
+        """
+        Exposes the memory-mapped arrays as class attributes. Move tables are flattened so that
+        the entry for coordinate `x` and move `m` is at `x * MOVES + m`, and so are the
+        symmetry conjugation tables, with the entry for symmetry `s` at `x * N_SYM + s`.
+        Memory views are used rather than the arrays themselves because indexing them yields
+        plain Python integers, which are much cheaper to work with in the search than NumPy
+        scalars.
+        """
+        cls.twist_move = memoryview(tables["twist_move"].reshape(-1))
+        cls.flip_move = memoryview(tables["flip_move"].reshape(-1))
+        cls.udslice_move = memoryview(tables["udslice_move"].reshape(-1))
+        cls.edge4_move = memoryview(tables["edge4_move"].reshape(-1))
+        cls.edge8_move = memoryview(tables["edge8_move"].reshape(-1))
+        cls.corner_move = memoryview(tables["corner_move"].reshape(-1))
+        cls.sorted_edges_move = memoryview(tables["sorted_edges_move"].reshape(-1))
+        cls.edge8_merge = memoryview(tables["edge8_merge"])
+        cls.twist_conj = memoryview(tables["twist_conj"].reshape(-1))
+        cls.edge8_conj = memoryview(tables["edge8_conj"].reshape(-1))
+        cls.flipslice_class = memoryview(tables["flipslice_class"])
+        cls.corner_class = memoryview(tables["corner_class"])
+        cls.flipslice_twist_prune = PruningTable(
+            memoryview(tables["flipslice_twist_prune"]), cls.TWIST, bits=2, modulus=3
+        )
+        cls.corner_edge8_prune = PruningTable(
+            memoryview(tables["corner_edge8_prune"]), cls.EDGE8, bits=4
+        )
+        cls.edge4_corner_prune = PruningTable(
+            memoryview(tables["edge4_corner_prune"]), cls.CORNER, bits=4
+        )
 
     @classmethod
-    def make_corner_table(cls):
-        corner_move = [[0] * cls.MOVES for i in range(cls.CORNER)]
-        a = CubieCube()
-        for i in range(cls.CORNER):
-            a.phase_2_corner = i
-            for j in range(6):
-                for k in range(3):
-                    a.corner_multiply(MOVE_CUBE[j])
-                    if k % 2 == 0 and j % 3 != 0:
-                        corner_move[i][3 * j + k] = -1
-                    else:
-                        corner_move[i][3 * j + k] = a.phase_2_corner
-                a.corner_multiply(MOVE_CUBE[j])
-        return corner_move
+    def phase_1_distance(cls, twist: int, flip: int, udslice: int) -> int:
+        """
+        Returns the number of moves needed to reach phase 2. The pruning table only holds this
+        modulo 3, so it is counted by making moves that bring the cube one move closer until
+        phase 2 is reached.
+        """
+        distance = 0
+        remainder = cls._phase_1_remainder(twist, flip, udslice)
+
+        while twist or flip or udslice:
+            for move_num in range(cls.MOVES):
+                new_twist = cls.twist_move[cls.MOVES * twist + move_num]
+                new_flip = cls.flip_move[cls.MOVES * flip + move_num]
+                new_udslice = cls.udslice_move[cls.MOVES * udslice + move_num]
+                new_remainder = cls._phase_1_remainder(new_twist, new_flip, new_udslice)
+
+                if new_remainder == (remainder - 1) % 3:
+                    twist, flip, udslice = new_twist, new_flip, new_udslice
+                    remainder = new_remainder
+                    distance += 1
+                    break
+
+        return distance
 
     @classmethod
-    def make_udslice_twist_prune(cls):
-        udslice_twist_prune = [-1] * (cls.UDSLICE * cls.TWIST)
-        udslice_twist_prune[0] = 0
-        count, depth = 1, 0
-        while count < cls.UDSLICE * cls.TWIST:
-            for i in range(cls.UDSLICE * cls.TWIST):
-                if udslice_twist_prune[i] == depth:
-                    m = [
-                        cls.udslice_move[i // cls.TWIST][j] * cls.TWIST
-                        + cls.twist_move[i % cls.TWIST][j]
-                        for j in range(18)
-                    ]
-                    for x in m:
-                        if udslice_twist_prune[x] == -1:
-                            count += 1
-                            udslice_twist_prune[x] = depth + 1
-            depth += 1
-        return PruningTable(udslice_twist_prune, cls.TWIST)
+    def _phase_1_remainder(cls, twist: int, flip: int, udslice: int) -> int:
+        flipslice = cls.flipslice_class[cls.FLIP * udslice + flip]
+        return cls.flipslice_twist_prune[
+            flipslice // cls.N_SYM,
+            cls.twist_conj[cls.N_SYM * twist + flipslice % cls.N_SYM],
+        ]
 
     @classmethod
-    def make_udslice_flip_prune(cls):
-        udslice_flip_prune = [-1] * (cls.UDSLICE * cls.FLIP)
-        udslice_flip_prune[0] = 0
-        count, depth = 1, 0
-        while count < cls.UDSLICE * cls.FLIP:
-            for i in range(cls.UDSLICE * cls.FLIP):
-                if udslice_flip_prune[i] == depth:
-                    m = [
-                        cls.udslice_move[i // cls.FLIP][j] * cls.FLIP
-                        + cls.flip_move[i % cls.FLIP][j]
-                        for j in range(18)
-                    ]
-                    for x in m:
-                        if udslice_flip_prune[x] == -1:
-                            count += 1
-                            udslice_flip_prune[x] = depth + 1
-            depth += 1
-        return PruningTable(udslice_flip_prune, cls.FLIP)
+    def phase_2_distance(cls, corner: int, edge8: int, edge4: int) -> int:
+        """
+        Returns a lower bound on the number of moves needed to solve a cube in phase 2.
+        """
+        corner_class = cls.corner_class[corner]
+        return max(
+            cls.edge4_corner_prune[edge4, corner],
+            cls.corner_edge8_prune[
+                corner_class // cls.N_SYM,
+                cls.edge8_conj[cls.N_SYM * edge8 + corner_class % cls.N_SYM],
+            ],
+        )
 
     @classmethod
-    def make_edge4_edge8_prune(cls):
-        edge4_edge8_prune = [-1] * (cls.EDGE4 * cls.EDGE8)
-        edge4_edge8_prune[0] = 0
-        count, depth = 1, 0
-        while count < cls.EDGE4 * cls.EDGE8:
-            for i in range(cls.EDGE4 * cls.EDGE8):
-                if edge4_edge8_prune[i] == depth:
-                    m = [
-                        cls.edge4_move[i // cls.EDGE8][j] * cls.EDGE8
-                        + cls.edge8_move[i % cls.EDGE8][j]
-                        for j in range(18)
-                    ]
-                    for x in m:
-                        if edge4_edge8_prune[x] == -1:
-                            count += 1
-                            edge4_edge8_prune[x] = depth + 1
-            depth += 1
-        return PruningTable(edge4_edge8_prune, cls.EDGE8)
+    def build_tables(
+        cls,
+        report: Optional[Callable[[str, float], None]] = None,
+        workers: int = 1,
+        directory: Optional[str] = None,
+    ) -> dict[str, np.ndarray]:
+        """
+        Generates every move and pruning table from scratch and writes them to the table
+        store in `directory` (see `tables_filename`). `report` is called with the name of each
+        table and the number of seconds it took to generate. With more than one worker,
+        independent tables are generated in parallel on a process pool.
+        """
+        filename = cls.tables_filename(directory)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+        with table_store_lock(filename):
+            return cls._build_table_store(filename, report, workers)
+
+    @staticmethod
+    def _build_table_store(
+        filename: str,
+        report: Optional[Callable[[str, float], None]] = None,
+        workers: int = 1,
+    ) -> dict[str, np.ndarray]:
+        if workers > 1:
+            tables = generate_tables_parallel(workers, report)
+        else:
+            tables = generate_tables(report)
 
-    @classmethod
-    def make_edge4_corner_prune(cls):
-        edge4_corner_prune = [-1] * (cls.EDGE4 * cls.CORNER)
-        edge4_corner_prune[0] = 0
-        count, depth = 1, 0
-        while count < cls.EDGE4 * cls.CORNER:
-            for i in range(cls.EDGE4 * cls.CORNER):
-                if edge4_corner_prune[i] == depth:
-                    m = [
-                        cls.edge4_move[i // cls.CORNER][j] * cls.CORNER
-                        + cls.corner_move[i % cls.CORNER][j]
-                        for j in range(18)
-                    ]
-                    for x in m:
-                        if edge4_corner_prune[x] == -1:
-                            count += 1
-                            edge4_corner_prune[x] = depth + 1
-            depth += 1
-        return PruningTable(edge4_corner_prune, cls.CORNER)
+        write_table_store(filename, tables, TABLES_VERSION)
+        # Map the freshly written file so that this process shares its pages with others
+        return load_table_store(filename)
@@ -0,0 +1,149 @@
+"""
+A versioned binary container for the move and pruning tables.
+
+The file starts with a fixed-size prefix (magic bytes, format version and header length)
+followed by a JSON header describing every table (dtype, shape, byte offset and CRC-32
+checksum) along with the version of their contents. The raw table data follows, with each
+table aligned so that it can be mapped directly into memory as a NumPy array. Loading a store
+therefore costs a single `mmap` call, and every process mapping the same file shares the same
+physical pages.
+"""
+import json
+import os
+import struct
+import tempfile
+import zlib
+from contextlib import contextmanager
+from typing import Optional
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+MAGIC = b"RUBIKTBL"
+VERSION = 2
+ALIGNMENT = 64
+
+# magic, version, header length
+_PREFIX = struct.Struct("<8sII")
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_table_store(
+    filename: str, tables: dict[str, np.ndarray], tables_version: int = 0
+):
+    """
+    Writes `tables` to `filename` in the binary table format. `tables_version` identifies how
+    the tables were generated so that outdated stores can be detected.
+    """
+    arrays = {name: np.ascontiguousarray(table) for name, table in tables.items()}
+    entries = {}
+    offset = 0
+
+    for name, array in arrays.items():
+        entries[name] = {
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "offset": offset,
+            "nbytes": array.nbytes,
+            "crc32": zlib.crc32(array),
+        }
+        offset = _align(offset + array.nbytes)
+
+    header = json.dumps({"tables_version": tables_version, "tables": entries}).encode()
+    data_start = _align(_PREFIX.size + len(header))
+
+    # Write to a temporary file first and move it into place at the end, so that readers never
+    # see a partially written store
+    fd, temp_filename = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(filename)),
+        prefix=os.path.basename(filename) + ".",
+        suffix=".tmp",
+    )
+
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_PREFIX.pack(MAGIC, VERSION, len(header)))
+            f.write(header)
+
+            for name, array in arrays.items():
+                f.seek(data_start + entries[name]["offset"])
+                f.write(array.tobytes())
+
+            f.truncate(data_start + offset)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # `mkstemp` only makes the file readable by its owner
+        os.chmod(temp_filename, 0o644)
+        os.replace(temp_filename, filename)
+    except BaseException:
+        os.remove(temp_filename)
+        raise
+
+
+@contextmanager
+def table_store_lock(filename: str):
+    """
+    Holds an exclusive lock on the table store `filename` (through a separate `.lock` file)
+    for the duration of the context, so that only one process generates the tables at a time.
+    Locking is skipped on platforms without `fcntl`, where writes are still atomic.
+    """
+    with open(filename + ".lock", "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def load_table_store(
+    filename: str, verify: bool = True, tables_version: Optional[int] = None
+) -> dict[str, np.ndarray]:
+    """
+    Memory-maps the tables stored in `filename`. The returned arrays are read-only, zero-copy
+    views into the file. A `ValueError` is raised if the file is not a valid table store, was
+    written with a different format version or `tables_version`, or (when `verify` is set)
+    fails its checksums.
+    """
+    if os.path.getsize(filename) < _PREFIX.size:
+        raise ValueError(f"{filename} is not a table store.")
+
+    data = np.memmap(filename, dtype=np.uint8, mode="r")
+    magic, version, header_length = _PREFIX.unpack(data[: _PREFIX.size].tobytes())
+
+    if magic != MAGIC:
+        raise ValueError(f"{filename} is not a table store.")
+    if version != VERSION:
+        raise ValueError(
+            f"{filename} has version {version} but version {VERSION} is required."
+        )
+
+    header_end = _PREFIX.size + header_length
+    header = json.loads(data[_PREFIX.size : header_end].tobytes())
+    if tables_version is not None and header["tables_version"] != tables_version:
+        raise ValueError(f"The tables in {filename} are outdated.")
+
+    data_start = _align(header_end)
+    tables = {}
+
+    for name, entry in header["tables"].items():
+        start = data_start + entry["offset"]
+        end = start + entry["nbytes"]
+        if end > data.size:
+            raise ValueError(f"{filename} is truncated.")
+
+        table = data[start:end].view(entry["dtype"]).reshape(entry["shape"])
+        if verify and zlib.crc32(table) != entry["crc32"]:
+            raise ValueError(f"The checksum of table {name} in {filename} is invalid.")
+
+        tables[name] = table
+
+    return tables
@@ -0,0 +1,317 @@
+"""
+Metrics in the Prometheus text format, and optional OpenTelemetry spans.
+
+The metrics are kept in memory by the process serving them and rendered on each scrape, so
+no client library is needed. Spans are only recorded if the `opentelemetry` package is
+installed and tracing is turned on; otherwise `span` does nothing.
+
+Running this module scrapes an endpoint and prints what it serves, as a stand-in for a
+Prometheus server when working offline.
+"""
+import math
+import urllib.request
+from argparse import ArgumentParser
+from bisect import bisect_left
+from contextlib import nullcontext
+from time import sleep
+from typing import Callable, Iterator, Optional
+from prettytable import PrettyTable
+
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+# Upper bounds, in seconds, of the buckets that latencies are counted in
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class Metric:
+    """
+    A named family of values, one for each combination of label values.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+
+    def samples(self) -> Iterator[tuple[str, Labels, float]]:
+        """
+        Yields the name, labels and value of each sample.
+        """
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class Counter(Metric):
+    """
+    A value that only goes up, such as a number of requests. Given `function`, the value is
+    read from it on each scrape instead of being counted here.
+    """
+
+    kind = "counter"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        function: Optional[Callable[[], float]] = None,
+    ):
+        super().__init__(name, description)
+        self.function = function
+        self._values: dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(sorted(labels.items()))
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def samples(self) -> Iterator[tuple[str, Labels, float]]:
+        if self.function is not None:
+            yield self.name, (), self.function()
+        for labels, value in self._values.items():
+            yield self.name, labels, value
+
+
+class Gauge(Metric):
+    """
+    A value that can go up and down. Given `function`, the value is read from it on each
+    scrape instead of being set.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        function: Optional[Callable[[], float]] = None,
+    ):
+        super().__init__(name, description)
+        self.function = function
+        self._value = 0.0
+
+    def set(self, value: float):
+        self._value = value
+
+    def value(self) -> float:
+        return self.function() if self.function is not None else self._value
+
+    def samples(self) -> Iterator[tuple[str, Labels, float]]:
+        yield self.name, (), self.value()
+
+
+class Histogram(Metric):
+    """
+    Counts observations, such as latencies, in buckets of increasing upper bounds.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, description)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # The count in each bucket (not cumulative) and the sum of the observations, for
+        # each combination of label values
+        self._counts: dict[Labels, list[int]] = {}
+        self._sums: dict[Labels, float] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        if key not in self._counts:
+            self._counts[key] = [0] * len(self.buckets)
+            self._sums[key] = 0.0
+
+        self._counts[key][bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    def count(self, **labels: str) -> int:
+        return sum(self._counts.get(tuple(sorted(labels.items())), []))
+
+    def samples(self) -> Iterator[tuple[str, Labels, float]]:
+        for labels, counts in self._counts.items():
+            total = 0
+            for bound, count in zip(self.buckets, counts):
+                total += count
+                le = (("le", _format_value(bound)),)
+                yield f"{self.name}_bucket", labels + le, total
+            yield f"{self.name}_sum", labels, self._sums[labels]
+            yield f"{self.name}_count", labels, total
+
+
+class Registry:
+    """
+    The metrics served together by one endpoint.
+    """
+
+    def __init__(self):
+        self.metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"A metric named {metric.name!r} is already registered.")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self,
+        name: str,
+        description: str,
+        function: Optional[Callable[[], float]] = None,
+    ) -> Counter:
+        return self.register(Counter(name, description, function))
+
+    def gauge(
+        self,
+        name: str,
+        description: str,
+        function: Optional[Callable[[], float]] = None,
+    ) -> Gauge:
+        return self.register(Gauge(name, description, function))
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, description, buckets))
+
+    def render(self) -> str:
+        """
+        Returns every metric in the Prometheus text format.
+        """
+        return "".join(metric.render() for metric in self.metrics.values())
+
+
+def parse(text: str) -> dict[str, float]:
+    """
+    Returns the value of each sample in a scrape, keyed by its name and labels as they appear
+    in it.
+    """
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+_tracer = None
+
+
+def enable_tracing(name: str = "rubik") -> bool:
+    """
+    Makes `span` record OpenTelemetry spans, with whatever tracer provider has been set up.
+    Returns False if `opentelemetry` is not installed.
+    """
+    global _tracer
+
+    if trace is None:
+        return False
+    _tracer = trace.get_tracer(name)
+    return True
+
+
+def span(name: str, **attributes):
+    """
+    Returns a context manager that records a span around its body if tracing is enabled.
+    """
+    if _tracer is None:
+        return nullcontext()
+    return _tracer.start_as_current_span(name, attributes=attributes)
+
+
+def scrape(url: str) -> dict[str, float]:
+    with urllib.request.urlopen(url) as response:
+        return parse(response.read().decode())
+
+
+def main():
+    """
+    Scrapes a metrics endpoint every few seconds and prints the samples, along with how much
+    each one changed since the previous scrape.
+    """
+    parser = ArgumentParser(description="Scrape a Prometheus metrics endpoint")
+    parser.add_argument(
+        "url",
+        nargs="?",
+        default="http://localhost:8000/api/metrics",
+        help="The endpoint to scrape (default: http://localhost:8000/api/metrics)",
+    )
+    parser.add_argument(
+        "-i",
+        "--interval",
+        type=float,
+        default=5,
+        help="The number of seconds between scrapes (default: 5)",
+    )
+    parser.add_argument(
+        "-n",
+        "--scrapes",
+        type=int,
+        default=1,
+        help="The number of scrapes, or 0 to keep scraping (default: 1)",
+    )
+
+    args = parser.parse_args()
+    previous: dict[str, float] = {}
+    i = 0
+
+    while True:
+        samples = scrape(args.url)
+
+        table = PrettyTable()
+        table.field_names = ["Sample", "Value", "Change"]
+        table.align["Sample"] = "l"
+        for name, value in samples.items():
+            change = value - previous[name] if name in previous else ""
+            table.add_row([name, value, change])
+        print(table)
+
+        previous = samples
+        i += 1
+        if i == args.scrapes:
+            break
+        sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,6 @@
 from .kociembasolver import *
 from .solver import *
 from .kociembafastsolver import KociembaFastSolver
+from .parallelsolver import ParallelKociembaSolver
+from .batch import SolveResult, load_tables, solve_cube, solve_many
+from .cache import SolutionCache
@@ -0,0 +1,193 @@
+"""
+Solves many cubes on a pool of processes, yielding each result as soon as it is ready.
+
+The input is consumed lazily in chunks, and only a bounded number of chunks are handed to the
+pool at a time, so that corpora of millions of cubes can be streamed through without holding
+them (or their results) in memory. Each worker maps the table store once when it starts, and
+every worker shares its pages.
+"""
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from itertools import islice
+from queue import Queue
+from threading import Event
+from time import time
+from typing import Any, Iterable, Iterator, NamedTuple, Optional, Union
+from rubik.cubes import Cube, Tables
+from .kociembasolver import ENGINES, KociembaSolver, SearchCancelled
+
+# The number of seconds between checks of the `stop` event of `solve_cube`, as checking an
+# event shared with another process takes a round trip to it
+STOP_CHECK_INTERVAL = 0.05
+
+
+class SolveResult(NamedTuple):
+    """
+    The outcome of solving one of the cubes given to `solve_many`.
+    """
+
+    # The position of the cube in the input
+    index: int
+    cube_str: str
+    # Empty if the cube was already solved or could not be solved
+    moves: list[str]
+    # Why the cube could not be solved, if it could not be
+    error: Optional[str]
+    time_to_solve: float
+    # What the search did, as in `SolverStats`, if asked for
+    stats: Optional[dict[str, Any]] = None
+
+
+def load_tables(directory: Optional[str] = None):
+    """
+    Maps the tables into this process, for use as the initializer of a worker pool.
+    """
+    Tables(directory)
+
+
+def solve_cube(
+    cube_str: str,
+    max_length: Optional[int] = None,
+    timeout_ms: Optional[int] = None,
+    engine: str = "recursive",
+    time_limit_ms: Optional[int] = None,
+    index: int = 0,
+    updates: Optional[Queue] = None,
+    collect_stats: bool = False,
+    stop: Optional[Event] = None,
+) -> SolveResult:
+    """
+    Solves a single cube without printing anything, as the workers of `solve_many` do.
+    Given `time_limit_ms`, the search stops once that many milliseconds have passed, with
+    the shortest solution found so far, or with an error if it found none. Each better
+    solution found along the way is put on `updates`, if given. With `collect_stats`, the
+    result carries the `SolverStats` of the search. Setting `stop` stops the search as
+    running out of time does.
+    """
+    try:
+        solver = KociembaSolver(Cube(cube_str), engine, collect_stats=collect_stats)
+        solver.verbose = False
+        if updates is not None:
+            solver.on_improvement = updates.put
+
+        time_limit = (
+            time() + time_limit_ms / 1000 if time_limit_ms is not None else None
+        )
+        next_check = 0.0
+
+        def cancelled() -> bool:
+            nonlocal next_check
+            now = time()
+            if time_limit is not None and now >= time_limit:
+                return True
+            if stop is not None and now >= next_check:
+                next_check = now + STOP_CHECK_INTERVAL
+                return stop.is_set()
+            return False
+
+        if time_limit is not None or stop is not None:
+            solver.cancelled = cancelled
+
+        solver.solve(max_length, timeout_ms)
+    except SearchCancelled:
+        time_to_solve = round(time() - solver.start, 5)
+        if not solver.best_moves:
+            error = (
+                "The solve was stopped."
+                if stop is not None and stop.is_set()
+                else "No solution found in time."
+            )
+            return SolveResult(index, cube_str, [], error, time_to_solve)
+
+        # Settle for the shortest solution found before the search was stopped
+        moves = solver._generate_moves(solver.best_moves)
+        stats = solver._stats()._asdict() if collect_stats else None
+        return SolveResult(index, cube_str, moves, None, time_to_solve, stats)
+    except (ValueError, RuntimeError) as e:
+        return SolveResult(index, cube_str, [], str(e), 0)
+
+    stats = solver.stats._asdict() if solver.stats is not None else None
+    return SolveResult(index, cube_str, solver.moves, None, solver.time_to_solve, stats)
+
+
+def _solve_chunk(
+    chunk: list[tuple[int, str]],
+    max_length: Optional[int],
+    timeout_ms: Optional[int],
+    engine: str,
+) -> list[SolveResult]:
+    return [
+        solve_cube(cube_str, max_length, timeout_ms, engine, index=index)
+        for index, cube_str in chunk
+    ]
+
+
+def solve_many(
+    cubes: Iterable[Union[str, Cube]],
+    workers: Optional[int] = None,
+    chunk_size: int = 64,
+    max_pending: Optional[int] = None,
+    max_length: Optional[int] = None,
+    timeout_ms: Optional[int] = None,
+    engine: str = "recursive",
+    executor: Optional[ProcessPoolExecutor] = None,
+    tables_directory: Optional[str] = None,
+) -> Iterator[SolveResult]:
+    """
+    Solves each of `cubes` with `KociembaSolver` and yields the results in the order they
+    finish (see `SolveResult.index`). Cubes that cannot be solved are reported through
+    `SolveResult.error` instead of stopping the others.
+
+    :param cubes: Cube strings in the format taken by `Cube`, or cubes
+    :param workers: The number of processes to solve with (default: CPU count)
+    :param chunk_size: The number of cubes sent to a process at once
+    :param max_pending: The number of chunks handed to the pool before waiting for one to
+        finish (default: twice the number of workers). The input is not read any further
+        ahead than this.
+    :param max_length: Passed on to `KociembaSolver.solve` for every cube
+    :param timeout_ms: Passed on to `KociembaSolver.solve` for every cube
+    :param engine: The search engine (see `KociembaSolver`)
+    :param executor: A pool to solve on instead of starting one. Its processes load the tables
+        on first use.
+    :param tables_directory: Where the pool started here loads the tables from
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown search engine {engine!r}.")
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+
+    if executor is None:
+        # Generate the tables here if they are missing, rather than in every worker
+        Tables(tables_directory)
+        pool = ProcessPoolExecutor(
+            workers, initializer=load_tables, initargs=(tables_directory,)
+        )
+    else:
+        pool = executor
+
+    indexed = ((i, str(cube)) for i, cube in enumerate(cubes))
+    pending: set[Future] = set()
+
+    try:
+        while True:
+            chunk = list(islice(indexed, chunk_size))
+            if chunk:
+                pending.add(
+                    pool.submit(_solve_chunk, chunk, max_length, timeout_ms, engine)
+                )
+
+            # Wait for a chunk to finish once enough are queued, or once the input runs out
+            while pending and (not chunk or len(pending) >= max_pending):
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+
+            if not chunk:
+                break
+    finally:
+        # The caller may stop reading the results early
+        for future in pending:
+            future.cancel()
+        if pool is not executor:
+            pool.shutdown(cancel_futures=True)
@@ -0,0 +1,212 @@
+"""
+A cache of solutions shared by every cube that is the same up to the choice of colors and a
+rotation of the whole cube.
+
+Cubes are keyed by the permutation and orientation of each corner and edge, packed into bytes
+as `CubieCube` stores them. These are read relative to the centers, and so do not depend on
+the colors. Out of the 24 rotations of a cube, the one with the smallest key is stored, along
+with its solution. A rotated cube is solved by the same moves with each face renamed after
+where the rotation takes it, which is how a cached solution is handed back in the frame of
+the cube that was asked about.
+"""
+import os
+import sqlite3
+from collections import OrderedDict
+from threading import Lock
+from time import time
+from typing import Optional
+import numpy as np
+from rubik.cubes import Cube
+from rubik.cubes.coordinates import facelet_cubies
+from rubik.cubes.cube import MOVE_NAMES, MOVE_PERMUTATIONS, TRANSFORMATIONS
+
+_MOVE_INDICES = {name: i for i, name in enumerate(MOVE_NAMES)}
+
+
+def _rotations() -> np.ndarray:
+    """
+    Returns the facelet permutations of the 24 rotations of the whole cube.
+    """
+    rotations = {tuple(range(54)): np.arange(54)}
+    frontier = list(rotations.values())
+
+    while frontier:
+        rotation = frontier.pop()
+        for name in ("X", "Y", "Z"):
+            rotated = rotation[TRANSFORMATIONS[name]]
+            if tuple(rotated) not in rotations:
+                rotations[tuple(rotated)] = rotated
+                frontier.append(rotated)
+
+    return np.array(list(rotations.values()))
+
+
+ROTATIONS = _rotations()
+
+
+def _conjugate_moves() -> np.ndarray:
+    """
+    Returns, for each rotation R, the move that R followed by each move and then by the
+    inverse of R amounts to.
+    """
+    move_indices = {tuple(p): i for i, p in enumerate(MOVE_PERMUTATIONS.tolist())}
+    conjugates = np.empty((len(ROTATIONS), 18), dtype=np.int64)
+
+    for r, rotation in enumerate(ROTATIONS):
+        inverse = np.argsort(rotation)
+        for m, move in enumerate(MOVE_PERMUTATIONS):
+            conjugates[r, m] = move_indices[tuple(rotation[move][inverse])]
+
+    return conjugates
+
+
+# A solution of the cube rotated by rotation `r` solves the cube itself once each move `m` in
+# it is replaced with `CONJUGATE_MOVES[r][m]`
+CONJUGATE_MOVES = _conjugate_moves()
+
+
+class SolutionCache:
+    """
+    A least recently used cache of solutions, optionally backed by an SQLite database that
+    survives restarts. The cubes passed in must be valid. The cache may be shared between
+    threads, which take turns using it.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        ttl: Optional[float] = None,
+        filename: Optional[str] = None,
+    ):
+        """
+        :param max_size: The number of solutions kept in memory
+        :param ttl: The number of seconds a solution is kept for, or `None` to keep it until
+            it is evicted
+        :param filename: The database to also store the solutions in, if any
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        # The moves of each key in its own frame, and the time they were stored at
+        self._entries: OrderedDict[bytes, tuple[bytes, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Held while the entries or the database are in use
+        self._lock = Lock()
+
+        self._db: Optional[sqlite3.Connection] = None
+        if filename is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+            self._db = sqlite3.connect(
+                filename, isolation_level=None, check_same_thread=False
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS solutions "
+                "(key BLOB PRIMARY KEY, moves BLOB NOT NULL, stored REAL NOT NULL)"
+            )
+
+    @staticmethod
+    def canonical_key(cube: Cube) -> tuple[bytes, int]:
+        """
+        Returns the key of `cube` and the index in `ROTATIONS` of the rotation that takes the
+        cube to the state the key describes.
+        """
+        cp, co, ep, eo = facelet_cubies(cube.facelets[ROTATIONS])
+        packed = np.concatenate([3 * cp + co, 2 * ep + eo], axis=1).astype(np.uint8)
+        keys = [row.tobytes() for row in packed]
+        rotation = min(range(len(keys)), key=keys.__getitem__)
+        return keys[rotation], rotation
+
+    def get(self, cube: Cube, max_length: Optional[int] = None) -> Optional[list[str]]:
+        """
+        Returns the cached solution of `cube`, unless there is none of at most `max_length`
+        moves.
+        """
+        key, rotation = self.canonical_key(cube)
+        with self._lock:
+            moves = self._lookup(key)
+
+            if moves is None or (max_length is not None and len(moves) > max_length):
+                self.misses += 1
+                return None
+
+            self.hits += 1
+        return [MOVE_NAMES[CONJUGATE_MOVES[rotation, m]] for m in moves]
+
+    def put(self, cube: Cube, moves: list[str]):
+        """
+        Stores the solution `moves` of `cube`, unless a shorter one is already stored.
+        """
+        key, rotation = self.canonical_key(cube)
+        # Rotating the cube by the inverse rotation brings the moves into its frame
+        inverse = np.argsort(CONJUGATE_MOVES[rotation])
+        stored = bytes(int(inverse[_MOVE_INDICES[move]]) for move in moves)
+
+        with self._lock:
+            existing = self._lookup(key)
+            if existing is not None and len(existing) <= len(moves):
+                return
+
+            now = time()
+            self._store(key, stored, now)
+
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO solutions VALUES (?, ?, ?)",
+                    (key, stored, now),
+                )
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def clear(self):
+        """
+        Empties the cache, including the database.
+        """
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM solutions")
+
+    def _expired(self, stored: float) -> bool:
+        return self.ttl is not None and time() - stored > self.ttl
+
+    def _lookup(self, key: bytes) -> Optional[bytes]:
+        entry = self._entries.get(key)
+
+        if entry is None and self._db is not None:
+            row = self._db.execute(
+                "SELECT moves, stored FROM solutions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                entry = row
+                self._store(key, *entry)
+
+        if entry is None:
+            return None
+
+        moves, stored = entry
+        if self._expired(stored):
+            self._entries.pop(key, None)
+            self.evictions += 1
+            if self._db is not None:
+                self._db.execute("DELETE FROM solutions WHERE key = ?", (key,))
+            return None
+
+        if key in self._entries:
+            self._entries.move_to_end(key)
+        return moves
+
+    def _store(self, key: bytes, moves: bytes, stored: float):
+        self._entries[key] = (moves, stored)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
@@ -26,8 +26,7 @@ class KociembaFastSolver(Solver):
         self.moves = kociemba.solve(self.cube.face_str()).split(" ")
 
         # Apply transformations gathered from the solver
-        for transformation in self.moves:
-            self.cube.transform(transformation)
+        self.cube.apply(self.moves)
 
         if not self.cube.is_solved():
             raise RuntimeError("The cube could not be solved!")
@@ -1,13 +1,132 @@
 import numpy as np
-from time import time
+from array import array
+from time import perf_counter, time
+from typing import Callable, NamedTuple, Optional
 from rubik.cubes import CoordCube
 from rubik.cubes import Cube
 from rubik.cubes import Face
 from rubik.cubes import Tables
+from rubik.cubes.coordinates import (
+    STATUS_MESSAGES,
+    cube_status,
+    facelet_cubie_cube,
+)
+from rubik.cubes.tablegen import PHASE_2_MOVES
+from .cache import SolutionCache
 from .solver import Solver
 import kociemba
 
 
+def _next_moves(allowed: list[int]) -> list[tuple[int, ...]]:
+    """
+    Returns, for each previous move (or 18 for no previous move), the moves out of `allowed`
+    that may follow it. We don't want to turn the same face on consecutive moves, and turning
+    two opposite faces is only tried in one order (e.g. U D, but not D U).
+    """
+    next_moves = []
+
+    for previous in range(19):
+        face = previous // 3
+        next_moves.append(
+            tuple(
+                m for m in allowed if previous == 18 or face not in (m // 3, m // 3 + 3)
+            )
+        )
+
+    return next_moves
+
+
+PHASE_1_NEXT_MOVES = _next_moves(list(range(18)))
+PHASE_2_NEXT_MOVES = _next_moves(PHASE_2_MOVES)
+
+ENGINES = ("recursive", "iterative")
+
+# The number of nodes phase 1 expands between checks of the deadline and `cancelled`, which
+# are otherwise only checked on leaving phase 2
+CHECK_INTERVAL = 1024
+
+# The phase 1 pruning table only stores distances modulo 3. As a move changes the distance by
+# at most one, the distance after a move from a position at distance `d` with remainder `r` is
+# `MOD_3_DISTANCES[d][r]`.
+MOD_3_DISTANCES = tuple(
+    tuple(
+        next(d for d in (distance - 1, distance, distance + 1) if d % 3 == r)
+        for r in range(3)
+    )
+    for distance in range(20)
+)
+
+
+class SolverStats(NamedTuple):
+    """
+    What a search of `KociembaSolver` did, collected when it is created with `collect_stats`.
+    The lists hold a count for each depth, that is, number of moves from the scrambled cube.
+    """
+
+    phase_1_nodes: list[int]
+    # The nodes whose distance to phase 2 was looked up, of which `phase_1_nodes` were close
+    # enough to visit
+    phase_1_evaluations: list[int]
+    phase_2_nodes: list[int]
+    phase_2_evaluations: list[int]
+    # The number of phase 1 solutions that phase 2 was started from
+    phase_1_solutions: int
+    # The seconds spent bringing the phase 2 coordinates up to date on entering phase 2, and
+    # searching phase 2
+    phase_2_entry_time: float
+    phase_2_search_time: float
+    # The seconds spent searching overall, unlike `time_to_solve`, which also includes
+    # checking the solution
+    search_time: float
+    # The number of entries looked up in the move and pruning tables by the search. Every
+    # evaluation and every entry into phase 2 looks up a fixed number of them, so this is
+    # counted exactly, but it leaves out working out the distance of the scrambled cube.
+    table_lookups: int
+
+
+class SearchCancelled(Exception):
+    """
+    Raised by the search once `KociembaSolver.cancelled` returns True.
+    """
+
+
+class SearchBuffers:
+    """
+    The preallocated state of the search: the move made at each depth and the coordinates
+    reached after it. Along the phase 1 path, `phase_2_corner`, `slice_sorted`, `u_edges` and
+    `d_edges` hold coordinates that are defined outside of phase 2 too, from which the phase 2
+    coordinates are derived on entering phase 2. Buffers are pooled by `KociembaSolver` and
+    reused across solves.
+    """
+
+    __slots__ = (
+        "moves",
+        "cursors",
+        "candidates",
+        "phase_1_corner",
+        "phase_1_edge",
+        "phase_1_ud_slice",
+        "phase_1_distance",
+        "phase_2_corner",
+        "phase_2_edge",
+        "phase_2_ud_slice",
+        "slice_sorted",
+        "u_edges",
+        "d_edges",
+        "entry_moves",
+    )
+
+    def __init__(self, length: int):
+        for name in self.__slots__[3:]:
+            setattr(self, name, array("i", [0]) * (length + 1))
+
+        self.moves = array("i", [0]) * (length + 1)
+        # The position of the next move to try at each depth in `candidates`, which holds the
+        # moves to try at each depth. Both are only used by the iterative engine.
+        self.cursors = array("i", [0]) * (length + 1)
+        self.candidates: list[tuple[int, ...]] = [()] * (length + 1)
+
+
 class KociembaSolver(Solver):
     """
     A basic implementation of Herbert Kociemba's Two Phase algorithm. Further details, including
@@ -15,67 +134,176 @@ class KociembaSolver(Solver):
     website (http://kociemba.org/cube.htm).
     """
 
-    def __init__(self, cube: Cube):
+    # Buffers of finished solves, which later solves reuse instead of allocating their own
+    _buffer_pool: list[SearchBuffers] = []
+
+    def __init__(
+        self,
+        cube: Cube,
+        engine: str = "recursive",
+        cache: Optional[SolutionCache] = None,
+        collect_stats: bool = False,
+    ):
+        """
+        :param cube: The cube to solve
+        :param engine: How the search is run: "recursive" (one function call per node) or
+            "iterative" (a single loop over an explicit stack). Both find the same solution.
+        :param cache: Where to look the solution up before searching for it, and to store it
+            after
+        :param collect_stats: Whether to time the phases of the search and leave a
+            `SolverStats` in `stats` after solving
+        """
         super().__init__(cube)
+
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown search engine {engine!r}.")
+
+        self.engine = engine
+        self.cache = cache
+        self.collect_stats = collect_stats
+        self.stats: Optional[SolverStats] = None
         self.max_moves_length = 29  # Upper bound of the kociemba algorithm
         self.moves = []
         self.start = 0
         self.end = 0
         self.time_to_solve = 0
         self.tables = Tables()
-
-        self.face_cube = self.cube.to_face_cube()
-        self.cubie_cube = self.face_cube.to_cubie_cube()
-        self.coord_cube = CoordCube.from_cubie_cube(self.cubie_cube)
+        # Whether `solve` prints the solution
+        self.verbose = True
 
         # Validate cube
         self._validate_cube()
 
-        # `moves_face` stores the moves' face whereas `moves_turn` stores the moves' number of
-        # quarter turns (i.e., 1 for clockwise, 2 for clockwise twice, and 3 for counterclockwise).
-        # These are used to generate the list of strings for `moves` once solved.
-        self.moves_face = [0 for i in range(self.max_moves_length)]
-        self.moves_turn = [0 for i in range(self.max_moves_length)]
-
-        # Coordinates needed for phase 1
-        self.phase_1_corner = [0 for i in range(self.max_moves_length)]
-        self.phase_1_corner[0] = self.coord_cube.phase_1_corner
-        self.phase_1_edge = [0 for i in range(self.max_moves_length)]
-        self.phase_1_edge[0] = self.coord_cube.phase_1_edge
-        self.phase_1_ud_slice = [0 for i in range(self.max_moves_length)]
-        self.phase_1_ud_slice[0] = self.coord_cube.phase_1_ud_slice
-
-        # Coordinates needed for phase 2
-        self.phase_2_corner = [0 for i in range(self.max_moves_length)]
-        self.phase_2_corner[0] = self.coord_cube.phase_2_corner
-        self.phase_2_edge = [0 for i in range(self.max_moves_length)]
-        self.phase_2_edge[0] = self.coord_cube.phase_2_edge
-        self.phase_2_ud_slice = [0 for i in range(self.max_moves_length)]
-        self.phase_2_ud_slice[0] = self.coord_cube.phase_2_ud_slice
-
-        # This stores the minimum number of moves required to complete phase 1 or 2 after n moves
-        # and are derived from the pruning tables.
-        self.phase_1_min_distance = [0 for i in range(self.max_moves_length)]
-        self.phase_1_min_distance[0] = self._phase_1_heuristic(0)
-        self.phase_2_min_distance = [0 for i in range(self.max_moves_length)]
+        self.cubie_cube = facelet_cubie_cube(self.cube.facelets)
+        self.coord_cube = CoordCube.from_cubie_cube(self.cubie_cube)
 
         # Used for finding out which moves were calculated in phase 1 and phase 2
         self.phase_1_moves_index = 0
+        # The nodes visited in phase 1 and phase 2, with the count of the nodes reached at depth
+        # `n + 1` by move `m` at `18 * n + m`. Counting them is all the search does per node,
+        # and the rest of `SolverStats` is worked out from them afterwards.
+        self.phase_1_nodes = array("q", [0]) * (18 * (self.max_moves_length + 2))
+        self.phase_2_nodes = array("q", [0]) * (18 * (self.max_moves_length + 2))
+        # The phase 1 nodes that phase 2 was entered from, counted like `phase_1_nodes`. These
+        # are not expanded in phase 1.
+        self.phase_2_entry_nodes = array("q", [0]) * (18 * (self.max_moves_length + 2))
+        # The heuristic evaluations at each depth that the nodes expanded do not account for:
+        # those of the roots of the searches, less those skipped by returning early
+        self.phase_1_evaluations = array("q", [0]) * (self.max_moves_length + 2)
+        self.phase_2_evaluations = array("q", [0]) * (self.max_moves_length + 2)
+        # The number of times phase 2 was entered and of depths whose phase 2 coordinates were
+        # brought up to date on entering it, and, if `collect_stats` is set, the seconds spent
+        # entering phase 2 and searching it
+        self.phase_2_entries = array("q", [0, 0])
+        self.phase_2_times = array("d", [0, 0])
+        self.search_time = 0.0
+        # The search stops once it finds a solution of at most `target_length` moves or the
+        # time passes `deadline`
+        self.target_length = self.max_moves_length
+        self.deadline: Optional[float] = None
+        # The length of the phase 1 solutions searched for and the shortest solution so far
+        self.phase_1_depth = 0
+        self.best_moves: list[int] = []
+        # The moves that phase 1 solutions may start with, which splits the search between
+        # solvers that each take some of them
+        self.first_moves: tuple[int, ...] = PHASE_1_NEXT_MOVES[18]
+        # Checked along with the deadline. Once it returns True, the search is abandoned by
+        # raising `SearchCancelled`
+        self.cancelled: Optional[Callable[[], bool]] = None
+        # Called with each solution found that is shorter than the ones before it, which
+        # `solve` keeps looking for when given `max_length` or `timeout_ms`
+        self.on_improvement: Optional[Callable[[list[str]], None]] = None
+
+    @property
+    def nodes(self) -> list[int]:
+        """
+        The number of nodes visited in phase 1 and phase 2.
+        """
+        return [sum(self.phase_1_nodes), sum(self.phase_2_nodes)]
+
+    @staticmethod
+    def _depth_counts(counts: array) -> list[int]:
+        """
+        Adds up counts kept for each depth and move, such as `phase_1_nodes`, for each depth.
+        """
+        depths = [0] + [sum(counts[i : i + 18]) for i in range(0, len(counts), 18)]
+        while depths and depths[-1] == 0:
+            depths.pop()
+        return depths
+
+    @staticmethod
+    def _evaluations(
+        expanded: list[int], corrections: array, next_moves: list[tuple[int, ...]]
+    ) -> list[int]:
+        """
+        Returns the number of heuristic evaluations at each depth, given the number of nodes
+        expanded at each depth and move, as every expanded node evaluates each move that may
+        follow the one it was reached by.
+        """
+        evaluations = corrections.tolist()
+        for i, count in enumerate(expanded):
+            if count:
+                n, move_num = divmod(i, 18)
+                evaluations[n + 2] += count * len(next_moves[move_num])
+
+        while evaluations and evaluations[-1] == 0:
+            evaluations.pop()
+        return evaluations
 
-    def solve(self):
+    def solve(self, max_length: Optional[int] = None, timeout_ms: Optional[int] = None):
+        """
+        By default, the first solution found is returned. Given `max_length` or `timeout_ms`,
+        the search keeps going through longer phase 1 solutions for shorter solutions overall,
+        as the full two phase algorithm does.
+
+        :param max_length: Stop as soon as a solution of at most this many moves is found
+        :param timeout_ms: Stop with the shortest solution found so far once this many
+            milliseconds have passed. Without `max_length`, the search only stops early once it
+            runs out of time or the solution is known to be the shortest it can find.
+        """
         if self.cube.is_solved():
-            print("The cube is already solved.")
+            if self.verbose:
+                print("The cube is already solved.")
             return
 
         self.start = time()
 
-        # My implementation of Kocimeba
-        # We first run phase 1 and when it ends, phase 2 will automatically be called
-        self._phase_1()
+        if max_length is not None:
+            self.target_length = max_length
+        elif timeout_ms is not None:
+            self.target_length = 0
+        else:
+            self.target_length = self.max_moves_length
+
+        if timeout_ms is not None:
+            self.deadline = self.start + timeout_ms / 1000
+        else:
+            self.deadline = None
+
+        cached = None
+        if self.cache is not None:
+            # Only a solution that the search would have stopped at will do
+            cached = self.cache.get(self.cube, self.target_length)
+
+        if cached is not None:
+            self.moves = cached
+        else:
+            search_start = perf_counter()
+            try:
+                self._search()
+            finally:
+                # Counted even if the search is cancelled
+                self.search_time += perf_counter() - search_start
+
+            if not self.best_moves:
+                raise RuntimeError("Unable to find solution.")
+
+            self.moves = self._generate_moves(self.best_moves)
+            if self.cache is not None:
+                self.cache.put(self.cube, self.moves)
 
         # Apply transformations gathered from the solver
-        for transformation in self.moves:
-            self.cube.transform(transformation)
+        self.cube.apply(self.moves)
 
         if not self.cube.is_solved():
             raise RuntimeError("The cube could not be solved!")
@@ -83,11 +311,15 @@ class KociembaSolver(Solver):
         self.end = time()
         self.time_to_solve = round(self.end - self.start, 5)
 
-        print(
-            f"The solution requires {len(self.moves)} moves and took "
-            + f"{self.time_to_solve} seconds."
-        )
-        print(" ".join(self.moves))
+        if self.collect_stats:
+            self.stats = self._stats()
+
+        if self.verbose:
+            print(
+                f"The solution requires {len(self.moves)} moves and took "
+                + f"{self.time_to_solve} seconds."
+            )
+            print(" ".join(self.moves))
 
         # Determine which moves were calculated in phase 1 and phase 2
         # phase_1_moves = " ".join(self.moves[:self.phase_1_moves_index])
@@ -95,188 +327,648 @@ class KociembaSolver(Solver):
         # print(f"\nPhase 1 Moves: {phase_1_moves}")
         # print(f"Phase 2 Moves: {phase_2_moves}")
 
-    def _phase_1(self):
-        for depth in range(self.max_moves_length):
-            length = self._phase_1_search(0, depth)
-            if length >= 0:
-                self.moves = self._generate_moves(length)
-                return
+    def _stats(self) -> SolverStats:
+        # Phase 1 nodes go on to phase 2 instead of being expanded once it is reached. Phase 2
+        # nodes are all expanded but the solved ones, which `phase_2_evaluations` makes up for.
+        phase_1_evaluations = self._evaluations(
+            [a - b for a, b in zip(self.phase_1_nodes, self.phase_2_entry_nodes)],
+            self.phase_1_evaluations,
+            PHASE_1_NEXT_MOVES,
+        )
+        phase_2_evaluations = self._evaluations(
+            self.phase_2_nodes, self.phase_2_evaluations, PHASE_2_NEXT_MOVES
+        )
 
-        raise RuntimeError("Unable to find solution.")
+        entries, updated_depths = self.phase_2_entries
+        return SolverStats(
+            phase_1_nodes=self._depth_counts(self.phase_1_nodes),
+            phase_1_evaluations=phase_1_evaluations,
+            phase_2_nodes=self._depth_counts(self.phase_2_nodes),
+            phase_2_evaluations=phase_2_evaluations,
+            phase_1_solutions=entries,
+            phase_2_entry_time=self.phase_2_times[0],
+            phase_2_search_time=self.phase_2_times[1],
+            search_time=self.search_time,
+            # Each evaluation looks up 6 entries in phase 1 and 7 in phase 2. Entering phase 2
+            # takes 4 per depth brought up to date, 1 to merge the edges and 4 for the distance
+            table_lookups=6 * sum(phase_1_evaluations)
+            + 7 * sum(phase_2_evaluations)
+            + 4 * updated_depths
+            + 5 * entries,
+        )
 
-    def _phase_1_heuristic(self, i: int) -> int:
+    def _counters(self) -> tuple[list[int], ...]:
         """
-        This heuristic returns a lower bound on the number of moves to reach phase 2.
+        Returns the counters of the search, for `_add_counters` of another solver.
         """
-        return max(
-            self.tables.udslice_twist_prune[
-                self.phase_1_ud_slice[i], self.phase_1_corner[i]
-            ],
-            self.tables.udslice_flip_prune[
-                self.phase_1_ud_slice[i], self.phase_1_edge[i]
-            ],
+        return (
+            self.phase_1_nodes.tolist(),
+            self.phase_1_evaluations.tolist(),
+            self.phase_2_entry_nodes.tolist(),
+            self.phase_2_nodes.tolist(),
+            self.phase_2_evaluations.tolist(),
+            self.phase_2_entries.tolist(),
+            self.phase_2_times.tolist(),
         )
 
-    def _phase_1_search(self, n: int, depth: int) -> int:
+    def _add_counters(self, counters: tuple[list[int], ...]):
         """
-        An implementation of the IDA* search algorithm, which is used to find the minimum number
-        of moves to reduce the corner and edge orientation coordinates to 0 and the ud slice
-        coordinate to 0 (i.e. the precondition to move on to phase 2).
+        Adds the counters of a search made by another solver to those of this one.
         """
-        # If the estimated distance to complete phase 1 is 0, then we move on to phase 2
-        if self.phase_1_min_distance[n] == 0:
-            # Move to phase 2
-            self.phase_1_moves_index = n
-            return self._phase_2(n)
-        elif self.phase_1_min_distance[n] <= depth:
-            # The range 0...5 represents the 6 main moves (U, R, F, D, L, B) in that order
-            for i in range(6):
-                # We don't want to turn the same and opposite face on consecutive moves
-                if n > 0 and self.moves_face[n - 1] in (i, i + 3):
-                    continue
+        own = (
+            self.phase_1_nodes,
+            self.phase_1_evaluations,
+            self.phase_2_entry_nodes,
+            self.phase_2_nodes,
+            self.phase_2_evaluations,
+            self.phase_2_entries,
+            self.phase_2_times,
+        )
+        for totals, counts in zip(own, counters):
+            for i, count in enumerate(counts):
+                totals[i] += count
 
-                # 1 => Clockwise, 2 => Clockwise twice, 3 => Counterclockwise
-                for j in range(1, 4):
-                    self.moves_face[n] = i
-                    self.moves_turn[n] = j
-                    move_num = 3 * i + j - 1
-
-                    # Update phase 1 coordinates using tables and heuristic
-                    self.phase_1_corner[n + 1] = self.tables.twist_move[
-                        self.phase_1_corner[n]
-                    ][move_num]
-                    self.phase_1_edge[n + 1] = self.tables.flip_move[
-                        self.phase_1_edge[n]
-                    ][move_num]
-                    self.phase_1_ud_slice[n + 1] = self.tables.udslice_move[
-                        self.phase_1_ud_slice[n]
-                    ][move_num]
-                    self.phase_1_min_distance[n + 1] = self._phase_1_heuristic(n + 1)
+    def _search(self):
+        """
+        Searches for a solution, leaving the best one found in `best_moves`.
+        """
+        # My implementation of Kocimeba
+        # We first run phase 1 and when it ends, phase 2 will automatically be called
+        if self._buffer_pool:
+            buffers = self._buffer_pool.pop()
+        else:
+            buffers = SearchBuffers(self.max_moves_length)
+
+        try:
+            self._phase_1(buffers)
+        finally:
+            self._buffer_pool.append(buffers)
+
+    def _phase_1(self, buffers: SearchBuffers):
+        buffers.phase_1_corner[0] = self.coord_cube.phase_1_corner
+        buffers.phase_1_edge[0] = self.coord_cube.phase_1_edge
+        buffers.phase_1_ud_slice[0] = self.coord_cube.phase_1_ud_slice
+        buffers.phase_2_corner[0] = self.cubie_cube.phase_2_corner
+        buffers.slice_sorted[0] = self.cubie_cube.slice_sorted
+        buffers.u_edges[0] = self.cubie_cube.u_edges
+        buffers.d_edges[0] = self.cubie_cube.d_edges
+        # None of the coordinates past the root are up to date
+        buffers.entry_moves[0] = -1
+        distance = self._phase_1_heuristic(buffers)
+        buffers.phase_1_distance[0] = distance
+
+        if self.engine == "iterative":
+            phase_2 = self._phase_2(buffers, self._iterative_phase_2_search(buffers))
+            search = self._iterative_phase_1_search(buffers, phase_2)
+        else:
+            phase_2 = self._phase_2(buffers, self._recursive_phase_2_search(buffers))
+            search = self._recursive_phase_1_search(buffers, phase_2)
+
+        self.phase_1_depth = 0
+        self.best_moves = []
+        # When phase 1 is already solved, phase 2 is tried straight away
+        length = phase_2(0) if distance == 0 else -1
+
+        if length < 0:
+            for depth in range(max(distance, 1), self.max_moves_length):
+                if self.best_moves and depth >= len(self.best_moves):
+                    # Every solution left is at least as long as the best one
+                    break
+
+                self.phase_1_depth = depth
+                self.phase_1_evaluations[1] += len(self.first_moves)
+                length = search(0, depth)
+                if length >= 0:
+                    break
+
+    def _out_of_time(self) -> bool:
+        """
+        Returns True if a solution has been found and the deadline has passed, and raises
+        `SearchCancelled` if `cancelled` returns True.
+        """
+        if self.best_moves and self.deadline is not None and time() >= self.deadline:
+            return True
 
-                    # Start search from next node
-                    next = self._phase_1_search(n + 1, depth - 1)
-                    if next >= 0:
-                        return next
-
-        # Unable to find an adequate solution at this depth
-        return -1
-
-    def _phase_2(self, n: int) -> int:
-        # Perform all the moves that we have done in phase 1 to the cubie cube
-        for i in range(n):
-            for j in range(self.moves_turn[i]):
-                self.cubie_cube.move(self.moves_face[i])
-
-        self.phase_2_corner[n] = self.cubie_cube.phase_2_corner
-        self.phase_2_edge[n] = self.cubie_cube.phase_2_edge
-        self.phase_2_ud_slice[n] = self.cubie_cube.phase_2_ud_slice
-        self.phase_2_min_distance[n] = self._phase_2_heuristic(n)
-
-        for depth in range(self.max_moves_length - n):
-            length = self._phase_2_search(n, depth)
-            if length >= 0:
-                return length
+        if self.cancelled is not None and self.cancelled():
+            raise SearchCancelled()
 
-        return -1
+        return False
 
-    def _phase_2_heuristic(self, i: int) -> int:
+    def _phase_1_heuristic(self, buffers: SearchBuffers) -> int:
         """
-        This heuristic returns a lower bound on the number of moves to solve the cube.
+        This heuristic returns the number of moves to reach phase 2 from the starting position.
         """
-        return max(
-            self.tables.edge4_corner_prune[
-                self.phase_2_ud_slice[i], self.phase_2_corner[i]
-            ],
-            self.tables.edge4_edge8_prune[
-                self.phase_2_ud_slice[i], self.phase_2_edge[i]
-            ],
+        return self.tables.phase_1_distance(
+            buffers.phase_1_corner[0],
+            buffers.phase_1_edge[0],
+            buffers.phase_1_ud_slice[0],
         )
 
-    def _phase_2_search(self, n: int, depth: int) -> int:
-        # If the estimated distance to complete phase 2 is 0, then we return the
-        # current depth, `n`
-        if self.phase_2_min_distance[n] == 0:
-            return n
-        elif self.phase_2_min_distance[n] <= depth:
-            # The range 0...5 represents the 6 main moves (U, R, F, D, L, B) in that order
-            for i in range(6):
-                # We don't want to turn the same and opposite face on consecutive moves
-                if n > 0 and self.moves_face[n - 1] in (i, i + 3):
-                    continue
+    def _recursive_phase_1_search(
+        self, buffers: SearchBuffers, phase_2: Callable[[int], int]
+    ) -> Callable[[int, int], int]:
+        """
+        Returns an implementation of the IDA* search algorithm, which is used to find the
+        minimum number of moves to reduce the corner and edge orientation coordinates to 0 and
+        the ud slice coordinate to 0 (i.e. the precondition to move on to phase 2). Once phase
+        1 is solved, `phase_2` is called with the length of the phase 1 solution.
 
-                # 1 => Clockwise, 2 => Clockwise twice, 3 => Counterclockwise
-                for j in range(1, 4):
-                    # We limit moves to U*, D*, R2, L2, F2, B2
-                    if i in (1, 2, 4, 5) and j != 2:
-                        continue
-
-                    self.moves_face[n] = i
-                    self.moves_turn[n] = j
-
-                    move_num = 3 * i + j - 1
-
-                    # Update phase 2 coordinates using tables and heuristic
-                    self.phase_2_corner[n + 1] = self.tables.corner_move[
-                        self.phase_2_corner[n]
-                    ][move_num]
-                    self.phase_2_edge[n + 1] = self.tables.edge8_move[
-                        self.phase_2_edge[n]
-                    ][move_num]
-                    self.phase_2_ud_slice[n + 1] = self.tables.edge4_move[
-                        self.phase_2_ud_slice[n]
-                    ][move_num]
-                    self.phase_2_min_distance[n + 1] = self._phase_2_heuristic(n + 1)
+        The tables and buffers are bound to local variables of the closure, so the search does
+        no attribute lookups or allocations per node.
+        """
+        moves = buffers.moves
+        corners = buffers.phase_1_corner
+        edges = buffers.phase_1_edge
+        ud_slices = buffers.phase_1_ud_slice
+        distances = buffers.phase_1_distance
+        twist_move = self.tables.twist_move
+        flip_move = self.tables.flip_move
+        udslice_move = self.tables.udslice_move
+        flipslice_class = self.tables.flipslice_class
+        twist_conj = self.tables.twist_conj
+        flipslice_twist_prune = self.tables.flipslice_twist_prune.table
+        mod_3_distances = MOD_3_DISTANCES
+        next_moves = PHASE_1_NEXT_MOVES[:18] + [self.first_moves]
+        nodes = self.phase_1_nodes
+        evaluations = self.phase_1_evaluations
+        countdown = CHECK_INTERVAL
+
+        def search(n: int, depth: int) -> int:
+            # The node at depth `n` is at least 1 and at most `depth` moves away from phase 2
+            nonlocal countdown
+            corner = 18 * corners[n]
+            edge = 18 * edges[n]
+            ud_slice = 18 * ud_slices[n]
+            next_distances = mod_3_distances[distances[n]]
+
+            moves_to_try = next_moves[moves[n - 1] if n > 0 else 18]
+
+            countdown -= 1
+            if not countdown:
+                countdown = CHECK_INTERVAL
+                if self._out_of_time():
+                    # Stop with the best solution, without expanding this node
+                    evaluations[n + 1] -= len(moves_to_try)
+                    return len(self.best_moves)
+
+            for move_num in moves_to_try:
+                # Update phase 1 coordinates using tables and heuristic
+                new_corner = twist_move[corner + move_num]
+                new_edge = flip_move[edge + move_num]
+                new_ud_slice = udslice_move[ud_slice + move_num]
+                # Look the distance up through the symmetry class of flip and UD slice
+                flipslice = flipslice_class[2048 * new_ud_slice + new_edge]
+                index = (
+                    2187 * (flipslice >> 4)
+                    + twist_conj[16 * new_corner + (flipslice & 15)]
+                )
+                # Entries are packed four to a byte
+                distance = next_distances[
+                    (flipslice_twist_prune[index >> 2] >> ((index & 3) << 1)) & 3
+                ]
+
+                # Unable to reach phase 2 within the remaining depth
+                if distance >= depth:
+                    continue
 
+                nodes[18 * n + move_num] += 1
+                moves[n] = move_num
+                corners[n + 1] = new_corner
+                edges[n + 1] = new_edge
+                ud_slices[n + 1] = new_ud_slice
+                distances[n + 1] = distance
+
+                if distance == 0:
+                    # Move to phase 2
+                    length = phase_2(n + 1)
+                else:
                     # Start search from next node
-                    next = self._phase_2_search(n + 1, depth - 1)
-                    if next >= 0:
-                        return next
-
-        return -1
-
-    def _generate_moves(self, length: int):
-        # TODO: Redo to be more like Java code
-        def recover_move(axis_power):
-            axis, power = axis_power
-            if power == 1:
-                return Face(axis).name
-            elif power == 2:
-                return Face(axis).name + "2"
-            elif power == 3:
-                return Face(axis).name + "'"
-            raise RuntimeError("Invalid move in solution.")
-
-        return list(
-            map(recover_move, zip(self.moves_face[:length], self.moves_turn[:length]))
-        )
+                    length = search(n + 1, depth - 1)
 
-    def _validate_cube(self):
-        count = [0 for i in range(6)]
+                if length >= 0:
+                    # The moves after this one are never evaluated
+                    evaluations[n + 1] -= (
+                        len(moves_to_try) - 1 - moves_to_try.index(move_num)
+                    )
+                    return length
+
+            # Unable to find an adequate solution at this depth
+            return -1
 
-        for char in self.cube.face_str():
-            count[Face[char]] += 1
+        return search
 
-        for i in range(6):
-            if count[i] != 9:
-                # status = -1
-                raise ValueError("Not all colors appear exactly 9 times.")
+    def _iterative_phase_1_search(
+        self, buffers: SearchBuffers, phase_2: Callable[[int], int]
+    ) -> Callable[[int, int], int]:
+        """
+        The same search as `_recursive_phase_1_search`, but run as a single loop over an
+        explicit stack instead of one function call per node. The stack is made of the
+        coordinate buffers together with `buffers.candidates[n]` and `buffers.cursors[n]`, the
+        moves to try at depth `n` and the position of the next one.
+        """
+        moves = buffers.moves
+        corners = buffers.phase_1_corner
+        edges = buffers.phase_1_edge
+        ud_slices = buffers.phase_1_ud_slice
+        distances = buffers.phase_1_distance
+        cursors = buffers.cursors
+        candidates = buffers.candidates
+        twist_move = self.tables.twist_move
+        flip_move = self.tables.flip_move
+        udslice_move = self.tables.udslice_move
+        flipslice_class = self.tables.flipslice_class
+        twist_conj = self.tables.twist_conj
+        flipslice_twist_prune = self.tables.flipslice_twist_prune.table
+        mod_3_distances = MOD_3_DISTANCES
+        next_moves = PHASE_1_NEXT_MOVES[:18] + [self.first_moves]
+        nodes = self.phase_1_nodes
+        evaluations = self.phase_1_evaluations
+        countdown = CHECK_INTERVAL
+
+        def search(start: int, depth: int) -> int:
+            # The node at depth `start` is at least 1 and at most `depth` moves away from phase 2
+            nonlocal countdown
+            limit = start + depth
+            n = start
+            # The state of the current depth is kept in local variables and only saved to the
+            # buffers when descending
+            moves_to_try = next_moves[moves[n - 1] if n > 0 else 18]
+            i = 0
+            corner = 18 * corners[n]
+            edge = 18 * edges[n]
+            ud_slice = 18 * ud_slices[n]
+            next_distances = mod_3_distances[distances[n]]
+
+            while True:
+                if i == len(moves_to_try):
+                    # Every move at this depth has been tried, so backtrack
+                    n -= 1
+                    if n < start:
+                        # Unable to find an adequate solution at this depth
+                        return -1
+
+                    moves_to_try = candidates[n]
+                    i = cursors[n]
+                    corner = 18 * corners[n]
+                    edge = 18 * edges[n]
+                    ud_slice = 18 * ud_slices[n]
+                    next_distances = mod_3_distances[distances[n]]
+                    continue
 
-        status = self.cubie_cube.validate()
-        error_message = ""
+                move_num = moves_to_try[i]
+                i += 1
+
+                # Update phase 1 coordinates using tables and heuristic
+                new_corner = twist_move[corner + move_num]
+                new_edge = flip_move[edge + move_num]
+                new_ud_slice = udslice_move[ud_slice + move_num]
+                # Look the distance up through the symmetry class of flip and UD slice
+                flipslice = flipslice_class[2048 * new_ud_slice + new_edge]
+                index = (
+                    2187 * (flipslice >> 4)
+                    + twist_conj[16 * new_corner + (flipslice & 15)]
+                )
+                # Entries are packed four to a byte
+                distance = next_distances[
+                    (flipslice_twist_prune[index >> 2] >> ((index & 3) << 1)) & 3
+                ]
+
+                # Unable to reach phase 2 within the remaining depth
+                if distance >= limit - n:
+                    continue
 
-        if status == 0:
-            return
-        elif status == -1:
-            error_message = "Not all colors appear exactly 9 times."
-        elif status == -2:
-            error_message = "Not all edges exist exactly once."
-        elif status == -3:
-            error_message = "One edge must be flipped."
-        elif status == -4:
-            error_message = "Not all corners exist exactly once."
-        elif status == -5:
-            error_message = "One corner must be twisted."
-        elif status == -6:
-            error_message = "Two corners or edges must be swapped."
-
-        raise ValueError(error_message)
+                nodes[18 * n + move_num] += 1
+                moves[n] = move_num
+                corners[n + 1] = new_corner
+                edges[n + 1] = new_edge
+                ud_slices[n + 1] = new_ud_slice
+                distances[n + 1] = distance
+
+                if distance == 0:
+                    # Move to phase 2
+                    length = phase_2(n + 1)
+                    if length >= 0:
+                        # The moves left at each depth are never evaluated
+                        evaluations[n + 1] -= len(moves_to_try) - i
+                        for k in range(start, n):
+                            evaluations[k + 1] -= len(candidates[k]) - cursors[k]
+                        return length
+                    continue
+
+                # Descend into the next node
+                candidates[n] = moves_to_try
+                cursors[n] = i
+                n += 1
+                moves_to_try = next_moves[move_num]
+                i = 0
+                corner = 18 * new_corner
+                edge = 18 * new_edge
+                ud_slice = 18 * new_ud_slice
+                next_distances = mod_3_distances[distance]
+
+                countdown -= 1
+                if not countdown:
+                    countdown = CHECK_INTERVAL
+                    if self._out_of_time():
+                        # Stop with the best solution, without expanding this node
+                        evaluations[n + 1] -= len(moves_to_try)
+                        for k in range(start, n):
+                            evaluations[k + 1] -= len(candidates[k]) - cursors[k]
+                        return len(self.best_moves)
+
+        return search
+
+    def _phase_2(
+        self, buffers: SearchBuffers, search: Callable[[int, int], int]
+    ) -> Callable[[int], int]:
+        """
+        Returns the function that solves phase 2 with `search` from the phase 1 solution of
+        length `n` stored in the buffers, returning the total length of the solution (or -1).
+
+        The coordinates needed to enter phase 2 are only brought up to date along the phase 1
+        path when phase 2 is entered. `buffers.entry_moves` holds the moves they were last
+        computed with, so only the depths after the first move that changed since the last
+        entry are recomputed, with one table lookup per coordinate each.
+        """
+        moves = buffers.moves
+        entry_moves = buffers.entry_moves
+        corners = buffers.phase_2_corner
+        edges = buffers.phase_2_edge
+        ud_slices = buffers.phase_2_ud_slice
+        slices = buffers.slice_sorted
+        u_edges = buffers.u_edges
+        d_edges = buffers.d_edges
+        corner_move = self.tables.corner_move
+        sorted_edges_move = self.tables.sorted_edges_move
+        edge8_merge = self.tables.edge8_merge
+        max_moves_length = self.max_moves_length
+        entries = self.phase_2_entries
+        entry_nodes = self.phase_2_entry_nodes
+        evaluations = self.phase_2_evaluations
+        next_moves = PHASE_2_NEXT_MOVES
+        times = self.phase_2_times if self.collect_stats else None
+
+        def phase_2(n: int) -> int:
+            if n > 0:
+                entry_nodes[18 * (n - 1) + moves[n - 1]] += 1
+
+            if n < self.phase_1_depth:
+                # This phase 1 solution was already tried in an earlier iteration
+                return -1
+
+            if times is not None:
+                entered = perf_counter()
+
+            i = 0
+            while i < n and entry_moves[i] == moves[i]:
+                i += 1
+
+            entries[0] += 1
+            entries[1] += n - i
+
+            for i in range(i, n):
+                move_num = moves[i]
+                corners[i + 1] = corner_move[18 * corners[i] + move_num]
+                slices[i + 1] = sorted_edges_move[18 * slices[i] + move_num]
+                u_edges[i + 1] = sorted_edges_move[18 * u_edges[i] + move_num]
+                d_edges[i + 1] = sorted_edges_move[18 * d_edges[i] + move_num]
+                entry_moves[i] = move_num
+
+            # The phase 2 search overwrites the coordinates past depth `n`
+            entry_moves[n] = -1
+
+            # The UD slice edges are back in the slice, so only their order is left
+            ud_slices[n] = slices[n]
+            edges[n] = edge8_merge[24 * u_edges[n] + d_edges[n] % 24]
+            distance = self.tables.phase_2_distance(corners[n], edges[n], ud_slices[n])
+
+            if times is not None:
+                searching = perf_counter()
+                times[0] += searching - entered
+
+            # Only solutions shorter than the best one so far are of interest
+            best = len(self.best_moves) if self.best_moves else max_moves_length
+            if distance == 0:
+                length = n
+            else:
+                length = -1
+                root_evaluations = len(next_moves[moves[n - 1] if n > 0 else 18])
+                for depth in range(distance, best - n):
+                    evaluations[n + 1] += root_evaluations
+                    length = search(n, depth)
+                    if length >= 0:
+                        # The solved node that the search stopped at is not expanded
+                        evaluations[length + 1] -= len(next_moves[moves[length - 1]])
+                        break
+
+            if times is not None:
+                times[1] += perf_counter() - searching
+
+            if length >= 0:
+                self.best_moves = list(moves[:length])
+                self.phase_1_moves_index = n
+                if self.on_improvement is not None:
+                    self.on_improvement(self._generate_moves(self.best_moves))
+                if length <= self.target_length:
+                    return length
+
+            if self._out_of_time():
+                return len(self.best_moves)
+
+            # Keep searching for a shorter solution
+            return -1
+
+        return phase_2
+
+    def _recursive_phase_2_search(
+        self, buffers: SearchBuffers
+    ) -> Callable[[int, int], int]:
+        """
+        Returns the IDA* search of phase 2, which only uses the moves that keep the cube in the
+        phase 2 subgroup.
+        """
+        moves = buffers.moves
+        corners = buffers.phase_2_corner
+        edges = buffers.phase_2_edge
+        ud_slices = buffers.phase_2_ud_slice
+        corner_move = self.tables.corner_move
+        edge8_move = self.tables.edge8_move
+        edge4_move = self.tables.edge4_move
+        corner_class = self.tables.corner_class
+        edge8_conj = self.tables.edge8_conj
+        edge4_corner_prune = self.tables.edge4_corner_prune.table
+        corner_edge8_prune = self.tables.corner_edge8_prune.table
+        next_moves = PHASE_2_NEXT_MOVES
+        nodes = self.phase_2_nodes
+        evaluations = self.phase_2_evaluations
+
+        def search(n: int, depth: int) -> int:
+            # The node at depth `n` is at least 1 and at most `depth` moves away from the goal
+            corner = 18 * corners[n]
+            edge = 18 * edges[n]
+            ud_slice = 18 * ud_slices[n]
+
+            moves_to_try = next_moves[moves[n - 1] if n > 0 else 18]
+
+            for move_num in moves_to_try:
+                # Update phase 2 coordinates using tables and heuristic
+                new_corner = corner_move[corner + move_num]
+                new_edge = edge8_move[edge + move_num]
+                new_ud_slice = edge4_move[ud_slice + move_num]
+                # Entries are packed two to a byte
+                index = 40320 * new_ud_slice + new_corner
+                distance = (edge4_corner_prune[index >> 1] >> ((index & 1) << 2)) & 15
+                # Look the second distance up through the symmetry class of the corners
+                corners_sym = corner_class[new_corner]
+                index = (
+                    40320 * (corners_sym >> 4)
+                    + edge8_conj[16 * new_edge + (corners_sym & 15)]
+                )
+                edge_distance = (
+                    corner_edge8_prune[index >> 1] >> ((index & 1) << 2)
+                ) & 15
+                if edge_distance > distance:
+                    distance = edge_distance
+
+                if distance >= depth:
+                    continue
+
+                nodes[18 * n + move_num] += 1
+                moves[n] = move_num
+                corners[n + 1] = new_corner
+                edges[n + 1] = new_edge
+                ud_slices[n + 1] = new_ud_slice
+
+                # If the distance to complete phase 2 is 0, then the cube is solved
+                if distance == 0:
+                    # The moves after this one are never evaluated
+                    evaluations[n + 1] -= (
+                        len(moves_to_try) - 1 - moves_to_try.index(move_num)
+                    )
+                    return n + 1
+
+                # Start search from next node
+                length = search(n + 1, depth - 1)
+                if length >= 0:
+                    # The moves after this one are never evaluated
+                    evaluations[n + 1] -= (
+                        len(moves_to_try) - 1 - moves_to_try.index(move_num)
+                    )
+                    return length
+
+            return -1
+
+        return search
+
+    def _iterative_phase_2_search(
+        self, buffers: SearchBuffers
+    ) -> Callable[[int, int], int]:
+        """
+        The same search as `_recursive_phase_2_search`, run over an explicit stack.
+        """
+        moves = buffers.moves
+        corners = buffers.phase_2_corner
+        edges = buffers.phase_2_edge
+        ud_slices = buffers.phase_2_ud_slice
+        cursors = buffers.cursors
+        candidates = buffers.candidates
+        corner_move = self.tables.corner_move
+        edge8_move = self.tables.edge8_move
+        edge4_move = self.tables.edge4_move
+        corner_class = self.tables.corner_class
+        edge8_conj = self.tables.edge8_conj
+        edge4_corner_prune = self.tables.edge4_corner_prune.table
+        corner_edge8_prune = self.tables.corner_edge8_prune.table
+        next_moves = PHASE_2_NEXT_MOVES
+        nodes = self.phase_2_nodes
+        evaluations = self.phase_2_evaluations
+
+        def search(start: int, depth: int) -> int:
+            # The node at depth `start` is at least 1 and at most `depth` moves away from the goal
+            limit = start + depth
+            n = start
+            moves_to_try = next_moves[moves[n - 1] if n > 0 else 18]
+            i = 0
+            corner = 18 * corners[n]
+            edge = 18 * edges[n]
+            ud_slice = 18 * ud_slices[n]
+
+            while True:
+                if i == len(moves_to_try):
+                    n -= 1
+                    if n < start:
+                        return -1
+
+                    moves_to_try = candidates[n]
+                    i = cursors[n]
+                    corner = 18 * corners[n]
+                    edge = 18 * edges[n]
+                    ud_slice = 18 * ud_slices[n]
+                    continue
+
+                move_num = moves_to_try[i]
+                i += 1
+
+                # Update phase 2 coordinates using tables and heuristic
+                new_corner = corner_move[corner + move_num]
+                new_edge = edge8_move[edge + move_num]
+                new_ud_slice = edge4_move[ud_slice + move_num]
+                # Entries are packed two to a byte
+                index = 40320 * new_ud_slice + new_corner
+                distance = (edge4_corner_prune[index >> 1] >> ((index & 1) << 2)) & 15
+                # Look the second distance up through the symmetry class of the corners
+                corners_sym = corner_class[new_corner]
+                index = (
+                    40320 * (corners_sym >> 4)
+                    + edge8_conj[16 * new_edge + (corners_sym & 15)]
+                )
+                edge_distance = (
+                    corner_edge8_prune[index >> 1] >> ((index & 1) << 2)
+                ) & 15
+                if edge_distance > distance:
+                    distance = edge_distance
+
+                if distance >= limit - n:
+                    continue
+
+                nodes[18 * n + move_num] += 1
+                moves[n] = move_num
+                corners[n + 1] = new_corner
+                edges[n + 1] = new_edge
+                ud_slices[n + 1] = new_ud_slice
+
+                # If the distance to complete phase 2 is 0, then the cube is solved
+                if distance == 0:
+                    # The moves left at each depth are never evaluated
+                    evaluations[n + 1] -= len(moves_to_try) - i
+                    for k in range(start, n):
+                        evaluations[k + 1] -= len(candidates[k]) - cursors[k]
+                    return n + 1
+
+                candidates[n] = moves_to_try
+                cursors[n] = i
+                n += 1
+                moves_to_try = next_moves[move_num]
+                i = 0
+                corner = 18 * new_corner
+                edge = 18 * new_edge
+                ud_slice = 18 * new_ud_slice
+
+        return search
+
+    def _generate_moves(self, moves: list[int]) -> list[str]:
+        def recover_move(move_num: int) -> str:
+            face, turns = divmod(move_num, 3)
+            if turns == 0:
+                return Face(face).name
+            elif turns == 1:
+                return Face(face).name + "2"
+            return Face(face).name + "'"
+
+        return [recover_move(move_num) for move_num in moves]
+
+    def _validate_cube(self):
+        status = cube_status(self.cube.facelets)
+
+        if status != 0:
+            raise ValueError(STATUS_MESSAGES[status])
@@ -0,0 +1,137 @@
+import os
+import numpy as np
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing.shared_memory import SharedMemory
+from time import time
+from typing import Optional
+from rubik.cubes import Cube
+from .cache import SolutionCache
+from .kociembasolver import KociembaSolver, SearchCancelled
+
+
+def _search_part(
+    facelets: np.ndarray,
+    engine: str,
+    first_moves: tuple[int, ...],
+    target_length: int,
+    deadline: Optional[float],
+    stop_name: str,
+    collect_stats: bool,
+) -> tuple[list[int], int, tuple[list[int], ...]]:
+    """
+    Searches for solutions starting with one of `first_moves` inside a worker process, until
+    one of at most `target_length` moves is found, `deadline` passes or the flag in the shared
+    memory block `stop_name` is set. Returns the best solution found (if any), the length of
+    its phase 1 part and the counters of the search.
+    """
+    stop = SharedMemory(stop_name)
+
+    try:
+        solver = KociembaSolver(
+            Cube.from_facelets(facelets), engine, collect_stats=collect_stats
+        )
+        solver.target_length = target_length
+        solver.deadline = deadline
+        solver.first_moves = first_moves
+        solver.cancelled = lambda: stop.buf[0] != 0
+
+        try:
+            solver._search()
+        except SearchCancelled:
+            pass
+
+        return solver.best_moves, solver.phase_1_moves_index, solver._counters()
+    finally:
+        stop.close()
+
+
+class ParallelKociembaSolver(KociembaSolver):
+    """
+    Runs the search of `KociembaSolver` on several processes at once, each one only trying
+    the phase 1 solutions that start with some of the moves. The tables are memory mapped, so
+    the processes share them rather than loading copies of their own.
+
+    Without a budget, the first solution found is taken and the other processes are stopped.
+    With `max_length` or `timeout_ms`, the shortest solution found by any process is.
+    """
+
+    def __init__(
+        self,
+        cube: Cube,
+        workers: Optional[int] = None,
+        engine: str = "recursive",
+        executor: Optional[ProcessPoolExecutor] = None,
+        cache: Optional[SolutionCache] = None,
+        collect_stats: bool = False,
+    ):
+        """
+        :param cube: The cube to solve
+        :param workers: The number of processes to split the search between (default: CPU
+            count). As the search is split by the first move, at most 18 are used.
+        :param engine: The search engine of each process (see `KociembaSolver`)
+        :param executor: A pool to run the search on, which should have at least `workers`
+            processes. Without one, a pool is started for each solve.
+        :param cache: See `KociembaSolver`
+        :param collect_stats: See `KociembaSolver`. The counts and times are added up over
+            the processes.
+        """
+        super().__init__(cube, engine, cache, collect_stats)
+
+        self.workers = min(workers or os.cpu_count() or 1, 18)
+        self.executor = executor
+
+    def _search(self):
+        # Deal the moves out in turn, so that each process gets moves of different faces
+        parts = [self.first_moves[i :: self.workers] for i in range(self.workers)]
+        stop = SharedMemory(create=True, size=1)
+        stop.buf[0] = 0
+        executor = self.executor or ProcessPoolExecutor(self.workers)
+
+        try:
+            futures = [
+                executor.submit(
+                    _search_part,
+                    self.cube.facelets,
+                    self.engine,
+                    part,
+                    self.target_length,
+                    self.deadline,
+                    stop.name,
+                    self.collect_stats,
+                )
+                for part in parts
+            ]
+
+            pending = set(futures)
+            while pending:
+                # Once there is a solution, wake up at the deadline even if no process
+                # finishes by then, as those still without a solution of their own keep going
+                timeout = None
+                if self.best_moves and self.deadline is not None and not stop.buf[0]:
+                    timeout = max(self.deadline - time(), 0)
+                done, pending = wait(pending, timeout, FIRST_COMPLETED)
+
+                for future in done:
+                    moves, phase_1_moves_index, counters = future.result()
+                    self._add_counters(counters)
+
+                    if moves and (
+                        not self.best_moves or len(moves) < len(self.best_moves)
+                    ):
+                        self.best_moves = moves
+                        self.phase_1_moves_index = phase_1_moves_index
+                        if self.on_improvement is not None:
+                            self.on_improvement(self._generate_moves(moves))
+
+                if self.best_moves and (
+                    len(self.best_moves) <= self.target_length
+                    or (self.deadline is not None and time() >= self.deadline)
+                ):
+                    # Good enough or out of time, so the other processes can stop
+                    stop.buf[0] = 1
+        finally:
+            stop.buf[0] = 1
+            if executor is not self.executor:
+                executor.shutdown()
+            stop.close()
+            stop.unlink()
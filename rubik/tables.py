@@ -0,0 +1,59 @@
+import os
+from argparse import ArgumentParser
+from time import perf_counter
+from typing import Optional
+from prettytable import PrettyTable
+from rubik.cubes import Tables
+
+
+def build(workers: int = 1, directory: Optional[str] = None):
+    """
+    Generates every move and pruning table on `workers` processes and stores them in
+    `directory`, reporting how long each one took.
+    """
+    table = PrettyTable()
+    table.title = "Table Generation"
+    table.field_names = ["Table", "Time"]
+    table.align["Table"] = "l"
+
+    def report(name: str, seconds: float):
+        table.add_row([name, round(seconds, 5)])
+
+    start = perf_counter()
+    Tables.build_tables(report, workers, directory)
+    table.add_row(["total", round(perf_counter() - start, 5)])
+
+    print(table)
+
+
+def main():
+    """
+    The entry point for managing the move and pruning tables.
+    """
+    parser = ArgumentParser(description="Manage the move and pruning tables")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser(
+        "build", help="Generate the tables and write them to disk"
+    )
+    build_parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="The number of processes to generate the tables with (default: CPU count)",
+    )
+    build_parser.add_argument(
+        "-d",
+        "--directory",
+        help="The directory to store the tables in (default: $RUBIK_TABLES_DIR or "
+        "~/.cache/rubik)",
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build(args.workers, args.directory)
+
+
+if __name__ == "__main__":
+    main()
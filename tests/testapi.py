@@ -0,0 +1,125 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from unittest import TestCase
+from rubik.cubes import Cube, Tables
+from rubik.metrics import scrape
+
+API_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(__file__)), "api")
+
+
+class TestAPI(TestCase):
+    CUBE_STR = "OBBOBRBYOGYYBOOBOGOBWBWYWWGBGRRRWOORYWYRYRYGWRGWGGWRYG"
+
+    @classmethod
+    def setUpClass(cls):
+        # Generate the tables here if they are missing, so that the server only maps them
+        Tables()
+
+        with socket.socket() as s:
+            s.bind(("localhost", 0))
+            port = s.getsockname()[1]
+
+        cls.url = f"http://localhost:{port}/api"
+        env = dict(
+            os.environ,
+            PYTHONPATH=os.path.dirname(API_DIRECTORY),
+            RUBIK_API_WORKERS="1",
+            RUBIK_API_MAX_QUEUED="0",
+            RUBIK_API_TIMEOUT_MS="2000",
+        )
+        cls.server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "index:app", "--port", str(port)],
+            cwd=API_DIRECTORY,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+        # Wait for the tables to be mapped in the workers, for as long as the server runs
+        while cls.server.poll() is None:
+            try:
+                scrape(f"{cls.url}/metrics")
+                return
+            except OSError:
+                time.sleep(0.5)
+        raise RuntimeError("The API did not start.")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.terminate()
+        cls.server.wait()
+
+    def pending_solves(self) -> float:
+        return scrape(f"{self.url}/metrics")["rubik_api_pending_solves"]
+
+    def test_settles_for_best_solution(self):
+        # No solution this short is found before the time runs out
+        url = f"{self.url}/solve/stream?cube={self.CUBE_STR}&maxLength=12"
+        with urllib.request.urlopen(url) as response:
+            events = [
+                line.split(": ", 1)[1]
+                for line in response.read().decode().splitlines()
+                if line
+            ]
+
+        self.assertEqual(events[-2], "done")
+        cube = Cube(self.CUBE_STR)
+        cube.apply(json.loads(events[-1])["moves"])
+        self.assertTrue(cube.is_solved())
+        self.assertEqual(self.pending_solves(), 0)
+
+    def test_batch_overloaded(self):
+        url = f"{self.url}/solve/stream?cube={self.CUBE_STR}&maxLength=12"
+        with urllib.request.urlopen(url) as response:
+            response.readline()
+
+            # The only process is busy and no solve may wait for it
+            request = urllib.request.Request(
+                f"{self.url}/solve/batch",
+                json.dumps([self.CUBE_STR]).encode(),
+                {"Content-Type": "application/json"},
+            )
+            with self.assertRaises(urllib.error.HTTPError) as context:
+                urllib.request.urlopen(request)
+            self.assertEqual(context.exception.code, 503)
+
+        time.sleep(1)
+        self.assertEqual(self.pending_solves(), 0)
+
+    def test_client_goes_away(self):
+        url = f"{self.url}/solve/stream?cube={self.CUBE_STR}&maxLength=12"
+        with urllib.request.urlopen(url) as response:
+            response.readline()
+            self.assertEqual(self.pending_solves(), 1)
+
+        # The solve stops well before its time runs out
+        time.sleep(1)
+        self.assertEqual(self.pending_solves(), 0)
+
+    def test_batch_errors(self):
+        key = 'rubik_api_errors_total{reason="malformed"}'
+        errors = scrape(f"{self.url}/metrics").get(key, 0)
+        request = urllib.request.Request(
+            f"{self.url}/solve/batch",
+            b'{"cube": null}\n[\n"' + self.CUBE_STR.encode() + b'"\n',
+            {"Content-Type": "application/x-ndjson"},
+        )
+        with urllib.request.urlopen(request) as response:
+            lines = [json.loads(line) for line in response.read().splitlines()]
+
+        lines.sort(key=lambda line: line["index"])
+        self.assertEqual(
+            [(line["cube"], line["error"]) for line in lines[:2]],
+            [
+                ('{"cube": null}', "Expected a cube string."),
+                ("[", "Expected a line of JSON."),
+            ],
+        )
+        self.assertIsNone(lines[2]["error"])
+        self.assertEqual(scrape(f"{self.url}/metrics")[key], errors + 2)
@@ -0,0 +1,36 @@
+from unittest import TestCase
+from rubik.benchmark import CORPORA, compare, corpus, run
+from rubik.cubes import CubeBatch
+
+
+class TestBenchmark(TestCase):
+    def test_corpus(self):
+        for name in CORPORA:
+            cube_strs = corpus(name, 20, seed=1)
+            self.assertEqual(corpus(name, 10, seed=1), cube_strs[:10])
+            self.assertNotEqual(corpus(name, 10, seed=2), cube_strs[:10])
+            self.assertTrue(CubeBatch.from_strs(cube_strs).is_valid().all())
+
+    def test_compare(self):
+        report = run(["recursive"], ["moves-10"], trials=5, warmup=1, repeats=1)
+        result = report["results"]["recursive/moves-10"]
+        self.assertEqual(result["cubes"], 5)
+        self.assertLessEqual(result["time_ms"]["p50"], result["time_ms"]["p95"])
+
+        table, regressed = compare(report, report)
+        self.assertFalse(regressed)
+
+        slower = {
+            "meta": report["meta"],
+            "results": {
+                "recursive/moves-10": {
+                    **result,
+                    "time_ms": {
+                        **result["time_ms"],
+                        "p50": 2 * result["time_ms"]["p50"],
+                    },
+                }
+            },
+        }
+        table, regressed = compare(slower, report, threshold=0.5)
+        self.assertTrue(regressed)
@@ -1,12 +1,300 @@
 from unittest import TestCase
-from rubik.cubes import Cube
+import numpy as np
+from rubik.cubes import Cube, CubeBatch, CubieCube, MoveSequence, compile_moves
+from rubik.cubes.coordinates import (
+    _CORNER_FACELETS,
+    _EDGE_FACELETS,
+    cube_status,
+    cubies_facelets,
+    facelet_coordinates,
+    facelet_cubies,
+    facelet_status,
+)
+from rubik.cubes.cube import MOVE_PERMUTATIONS, SOLVED_CUBE_STR, TRANSFORMATIONS
+from rubik.cubes.ranking import (
+    permutation_parity,
+    rank_combination,
+    rank_combinations,
+    rank_permutation,
+    rank_permutations,
+    unrank_combination,
+    unrank_combinations,
+    unrank_permutation,
+    unrank_permutations,
+)
 
 
 class TestCube(TestCase):
     def test_init(self):
         cube = Cube("OBBOBRBYOGYYBOOBOGOBWBWYWWGBGRRROOORYWYRYRYGWRGWGGWRYG")
-        self.assertEqual(0, 0)
+        self.assertEqual(
+            str(cube), "OBBOBRBYOGYYBOOBOGOBWBWYWWGBGRRROOORYWYRYRYGWRGWGGWRYG"
+        )
+        self.assertEqual(cube.pieces.shape, (6, 3, 3))
+        self.assertEqual(cube.pieces[1][0][2], "Y")
+
+        with self.assertRaises(ValueError):
+            Cube("OBBOBRBYOGYYBOOBOGOBWBWYWWGBGRRROOORYWYRYRYGWRGWGGWRYX")
 
     def test_transformation(self):
         cube = Cube("OBBOBRBYOGYYBOOBOGOBWBWYWWGBGRRROOORYWYRYRYGWRGWGGWRYG")
-        self.assertEqual(0, 0)
+        cube_str = str(cube)
+
+        for name in TRANSFORMATIONS:
+            for i in range(4):
+                cube.transform(name)
+            self.assertEqual(str(cube), cube_str)
+
+        for face in "ULFRBDY":
+            cube.apply([face, face + "2", face])
+            self.assertEqual(str(cube), cube_str)
+            cube.apply([face, face + "'"])
+            self.assertEqual(str(cube), cube_str)
+
+    def test_moves_match_cubie_cube(self):
+        for move_num in range(18):
+            cube = Cube(SOLVED_CUBE_STR)
+            cube.move(move_num)
+            cubie_cube = cube.to_face_cube().to_cubie_cube()
+
+            face, turns = divmod(move_num, 3)
+            expected = CubieCube()
+            for i in range(turns + 1):
+                expected.move(face)
+
+            self.assertEqual(
+                cubie_cube.corner_permutations, expected.corner_permutations
+            )
+            self.assertEqual(
+                cubie_cube.corner_orientations, expected.corner_orientations
+            )
+            self.assertEqual(cubie_cube.edge_permutations, expected.edge_permutations)
+            self.assertEqual(cubie_cube.edge_orientations, expected.edge_orientations)
+
+        self.assertEqual(MOVE_PERMUTATIONS.shape, (18, 54))
+
+    def test_is_solved(self):
+        cube = Cube(SOLVED_CUBE_STR)
+        self.assertTrue(cube.is_solved())
+        self.assertEqual(cube.face_str(), "".join(face * 9 for face in "URFDLB"))
+
+        cube.transform("Y")
+        self.assertTrue(cube.is_solved())
+
+        cube.transform("R")
+        self.assertFalse(cube.is_solved())
+
+    def test_duplicate_centers(self):
+        # The left center swapped with an up facelet, so no center is blue
+        cube_str = "B" + SOLVED_CUBE_STR[1:13] + "R" + SOLVED_CUBE_STR[14:]
+        with self.assertRaises(ValueError):
+            Cube(cube_str).face_str()
+        with self.assertRaises(ValueError):
+            CubeBatch.from_cubes([Cube(), Cube(cube_str)]).face_str()
+
+    def test_pieces_are_copies(self):
+        cube = Cube(SOLVED_CUBE_STR)
+        cube.front_face()[0, 0] = "B"
+        self.assertTrue(cube.is_solved())
+
+        face = cube.front_face()
+        face[0, 0] = "B"
+        cube.set_front_face(face)
+        self.assertEqual(cube.pieces[2][0][0], "B")
+
+
+class TestCubeBatch(TestCase):
+    def test_matches_cube(self):
+        cubes = [Cube() for i in range(20)]
+        batch = CubeBatch.from_cubes(cubes)
+        self.assertEqual(batch.cube_strs(), [str(cube) for cube in cubes])
+
+        # Pad some of the sequences with -1
+        moves = np.random.default_rng(0).integers(-1, 18, size=(20, 25))
+        batch.apply_moves(moves)
+        batch.apply(["R", "U'", "Y2"])
+
+        for cube, sequence in zip(cubes, moves):
+            for move_num in sequence[sequence >= 0]:
+                cube.move(move_num)
+            cube.apply(["R", "U'", "Y2"])
+
+        self.assertEqual(batch.cube_strs(), [str(cube) for cube in cubes])
+        self.assertEqual(batch.face_str(), [cube.face_str() for cube in cubes])
+        self.assertEqual(str(batch[7]), str(cubes[7]))
+
+    def test_is_solved(self):
+        batch = CubeBatch.solved(3)
+        batch.move(np.array([-1, 0, 5]))
+        self.assertEqual(batch.is_solved().tolist(), [True, False, False])
+        self.assertTrue(batch.is_valid().all())
+
+        batch = CubeBatch.from_strs(
+            [
+                "OBBOBRBYOGYYBOOBOGOBWBWYWWGBGRRRWOORYWYRYRYGWRGWGGWRYG",
+                "OBBOBRBYOGYYBOOBOGOBWBWYWWGBGRRROOORYWYRYRYGWRGWGGWRYG",
+            ]
+        )
+        self.assertEqual(batch.is_valid().tolist(), [True, False])
+
+    def test_random_states(self):
+        batch = CubeBatch.random_states(200, np.random.default_rng(0))
+        self.assertTrue(batch.is_valid().all())
+        self.assertEqual(len(set(batch.cube_strs())), 200)
+        again = CubeBatch.random_states(200, np.random.default_rng(0))
+        self.assertEqual(again.cube_strs(), batch.cube_strs())
+
+
+class TestMoveSequence(TestCase):
+    def test_folding(self):
+        self.assertEqual(str(compile_moves("R U U' R'")), "")
+        self.assertEqual(str(compile_moves("U D U'")), "D")
+        self.assertEqual(str(compile_moves("R U R' U2 x y'")), "R U R' U2")
+        # After x2 and y', the F and B layers hold the L and R centers
+        self.assertEqual(str(compile_moves("M2 E S'")), "R2 L2 D U' L R'")
+        self.assertEqual(str(compile_moves("Rw r2' x")), "L'")
+
+        with self.assertRaises(ValueError):
+            compile_moves("R Q")
+
+    def test_apply(self):
+        moves = "R U R' U2 x y' M E2 Rw d' F B L2 S z"
+        sequence = compile_moves(moves)
+
+        cube = Cube(SOLVED_CUBE_STR)
+        cube.apply(moves.split())
+        compiled = Cube(SOLVED_CUBE_STR)
+        sequence.apply(compiled)
+        self.assertEqual(str(compiled), str(cube))
+
+        # Without the rotations, the face turns leave the centers where they are
+        face_turns = Cube(SOLVED_CUBE_STR)
+        MoveSequence.from_moves(sequence).apply(face_turns)
+        cubie_cube = CubieCube()
+        sequence.apply(cubie_cube)
+        expected = face_turns.to_face_cube().to_cubie_cube()
+        self.assertEqual(cubie_cube.corner_permutations, expected.corner_permutations)
+        self.assertEqual(cubie_cube.corner_orientations, expected.corner_orientations)
+        self.assertEqual(cubie_cube.edge_permutations, expected.edge_permutations)
+        self.assertEqual(cubie_cube.edge_orientations, expected.edge_orientations)
+
+        sequence.inverse().apply(compiled)
+        self.assertTrue(compiled.is_solved())
+
+
+class TestCubieCube(TestCase):
+    def test_multiply(self):
+        sequence = compile_moves("R U2 F' L D B2 R'")
+        cube = CubieCube()
+        sequence.apply(cube)
+
+        # Multiplying by the cube of a move is the same as making the move
+        for face in range(6):
+            move = CubieCube()
+            move.move(face)
+            product = CubieCube()
+            cube.multiply(move, out=product)
+
+            moved = cube.copy()
+            moved.move(face)
+            self.assertEqual(product.corners, moved.corners)
+            self.assertEqual(product.edges, moved.edges)
+            self.assertEqual(product.validate(), 0)
+
+        # A cube followed by its inverse is solved
+        inverse = CubieCube()
+        sequence.inverse().apply(inverse)
+        cube.multiply(inverse)
+        self.assertEqual(cube.corners, CubieCube().corners)
+        self.assertEqual(cube.edges, CubieCube().edges)
+
+    def test_piece_lists_are_copies(self):
+        cube = CubieCube()
+        cube.corner_orientations[0] = 1
+        cube.edge_permutations[0] = 1
+        self.assertEqual(cube.corners, CubieCube().corners)
+        self.assertEqual(cube.edges, CubieCube().edges)
+
+        # A changed list takes effect once it is assigned back
+        orientations = cube.corner_orientations
+        orientations[:2] = [1, 2]
+        cube.corner_orientations = orientations
+        self.assertEqual(cube.corner_orientations[:3], [1, 2, 0])
+        permutations = cube.edge_permutations
+        permutations[:2] = [1, 0]
+        cube.edge_permutations = permutations
+        self.assertEqual(cube.edge_permutations[:3], [1, 0, 2])
+
+
+class TestCoordinates(TestCase):
+    def test_coordinates(self):
+        cubes = [Cube() for i in range(20)]
+        coordinates = CubeBatch.from_cubes(cubes).coordinates()
+
+        for cube, row in zip(cubes, coordinates):
+            cubie_cube = cube.to_face_cube().to_cubie_cube()
+            expected = [
+                cubie_cube.phase_1_corner,
+                cubie_cube.phase_1_edge,
+                cubie_cube.phase_1_ud_slice,
+                cubie_cube.phase_2_corner,
+                cubie_cube.phase_2_edge,
+                cubie_cube.phase_2_ud_slice,
+                cubie_cube.slice_sorted,
+                cubie_cube.u_edges,
+                cubie_cube.d_edges,
+            ]
+            self.assertEqual(row.tolist(), expected)
+
+    def test_status(self):
+        solved = Cube(SOLVED_CUBE_STR).facelets
+        flipped = solved.copy()
+        flipped[_EDGE_FACELETS[0]] = solved[_EDGE_FACELETS[0][::-1]]
+        twisted = solved.copy()
+        twisted[_CORNER_FACELETS[0]] = solved[np.roll(_CORNER_FACELETS[0], 1)]
+        swapped = solved.copy()
+        swapped[_EDGE_FACELETS[0]] = solved[_EDGE_FACELETS[1]]
+        swapped[_EDGE_FACELETS[1]] = solved[_EDGE_FACELETS[0]]
+        recolored = solved.copy()
+        recolored[0] = recolored[9]
+
+        facelets = np.array([solved, flipped, twisted, swapped, recolored])
+        self.assertEqual(facelet_status(facelets).tolist(), [0, -3, -5, -6, -1])
+        self.assertEqual([cube_status(cube) for cube in facelets], [0, -3, -5, -6, -1])
+
+    def test_cubies_facelets(self):
+        batch = CubeBatch.solved(20)
+        batch.randomize(30, np.random.default_rng(0))
+        cubies = facelet_cubies(batch.facelets)
+        self.assertEqual(cubies_facelets(*cubies).tolist(), batch.facelets.tolist())
+
+
+class TestRanking(TestCase):
+    def test_permutations(self):
+        permutations = unrank_permutations(np.arange(40320), 8)
+        self.assertEqual(len(np.unique(permutations, axis=0)), 40320)
+        self.assertTrue((rank_permutations(permutations) == np.arange(40320)).all())
+
+        for rank in (0, 1, 5039, 40319):
+            permutation = unrank_permutation(rank, 8)
+            self.assertEqual(permutation, permutations[rank].tolist())
+            self.assertEqual(rank_permutation(permutation), rank)
+
+        self.assertEqual(permutation_parity([1, 0, 2, 3]), 1)
+        self.assertEqual(permutation_parity([1, 2, 0, 3]), 0)
+        # Only the order of the elements matters
+        self.assertEqual(
+            rank_permutation([9, 11, 8, 10]), rank_permutation([1, 3, 0, 2])
+        )
+
+    def test_combinations(self):
+        combinations = unrank_combinations(np.arange(495), 12, 4)
+        self.assertTrue((combinations.sum(axis=1) == 4).all())
+        self.assertTrue((rank_combinations(combinations) == np.arange(495)).all())
+
+        for rank in (0, 1, 494):
+            positions = unrank_combination(rank, 12, 4)
+            self.assertEqual(np.flatnonzero(combinations[rank]).tolist(), positions)
+            self.assertEqual(
+                rank_combination([i in positions for i in range(12)]), rank
+            )
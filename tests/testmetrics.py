@@ -0,0 +1,40 @@
+from unittest import TestCase
+from rubik.metrics import Registry, parse, span
+
+
+class TestRegistry(TestCase):
+    def test_render(self):
+        metrics = Registry()
+        requests = metrics.counter("requests_total", "Requests")
+        metrics.gauge("workers", "Workers", lambda: 4)
+        latency = metrics.histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+
+        requests.inc(status="200")
+        requests.inc(2, status="503")
+        for seconds in [0.05, 0.5, 0.5, 3]:
+            latency.observe(seconds, endpoint="/api/solve")
+
+        text = metrics.render()
+        self.assertIn("# TYPE latency_seconds histogram\n", text)
+
+        samples = parse(text)
+        self.assertEqual(samples['requests_total{status="200"}'], 1)
+        self.assertEqual(samples['requests_total{status="503"}'], 2)
+        self.assertEqual(samples["workers"], 4)
+        buckets = [
+            samples[f'latency_seconds_bucket{{endpoint="/api/solve",le="{le}"}}']
+            for le in ["0.1", "1", "+Inf"]
+        ]
+        self.assertEqual(buckets, [1, 3, 4])
+        self.assertEqual(samples['latency_seconds_sum{endpoint="/api/solve"}'], 4.05)
+        self.assertEqual(latency.count(endpoint="/api/solve"), 4)
+
+    def test_duplicate_name(self):
+        metrics = Registry()
+        metrics.counter("requests_total", "Requests")
+        with self.assertRaises(ValueError):
+            metrics.gauge("requests_total", "Requests")
+
+    def test_span_without_tracing(self):
+        with span("search", engine="recursive"):
+            pass
@@ -1,6 +1,20 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import TemporaryDirectory
+from multiprocessing.shared_memory import SharedMemory
+from time import sleep, time
 from unittest import TestCase
-from rubik.solvers import KociembaSolver
-from rubik.cubes import Cube
+from unittest.mock import patch
+from rubik.solvers import (
+    KociembaSolver,
+    ParallelKociembaSolver,
+    SolutionCache,
+    solve_cube,
+    solve_many,
+)
+from rubik.solvers import parallelsolver
+from rubik.solvers.cache import ROTATIONS
+from rubik.cubes import COLORS, Cube
 
 
 class TestKociembaSolver(TestCase):
@@ -10,3 +24,210 @@ class TestKociembaSolver(TestCase):
         solver.solve()
         self.assertEqual(cube.is_solved(), True)
         print("Tests passed!")
+
+    def test_engines_match(self):
+        cube_str = "OBBOBRBYOGYYBOOBOGOBWBWYWWGBGRRRWOORYWYRYRYGWRGWGGWRYG"
+        recursive = KociembaSolver(Cube(cube_str), engine="recursive")
+        recursive.solve()
+        iterative = KociembaSolver(Cube(cube_str), engine="iterative")
+        iterative.solve()
+
+        self.assertEqual(recursive.moves, iterative.moves)
+        self.assertEqual(list(recursive.nodes), list(iterative.nodes))
+
+    def test_max_length(self):
+        cube = Cube("OBBOBRBYOGYYBOOBOGOBWBWYWWGBGRRRWOORYWYRYRYGWRGWGGWRYG")
+        solver = KociembaSolver(cube)
+        solver.solve(max_length=21)
+        self.assertEqual(cube.is_solved(), True)
+        self.assertLessEqual(len(solver.moves), 21)
+
+    def test_improvements(self):
+        cube = Cube("OBBOBRBYOGYYBOOBOGOBWBWYWWGBGRRRWOORYWYRYRYGWRGWGGWRYG")
+        solver = KociembaSolver(cube)
+        solutions = []
+        solver.on_improvement = solutions.append
+        solver.solve(max_length=20)
+
+        lengths = [len(moves) for moves in solutions]
+        self.assertEqual(lengths, sorted(set(lengths), reverse=True))
+        self.assertEqual(solutions[-1], solver.moves)
+
+    def test_checks_during_phase_1(self):
+        cube = Cube("OBBOBRBYOGYYBOOBOGOBWBWYWWGBGRRRWOORYWYRYRYGWRGWGGWRYG")
+        solver = KociembaSolver(cube)
+        checks = []
+        solver.cancelled = lambda: checks.append(True) and False
+        solver.solve(max_length=20)
+
+        # Leaving phase 2 checks once, so the rest were made by phase 1
+        self.assertGreater(len(checks), solver.phase_2_entries[0])
+
+    def test_stats(self):
+        cube_str = "OBBOBRBYOGYYBOOBOGOBWBWYWWGBGRRRWOORYWYRYRYGWRGWGGWRYG"
+        recursive = KociembaSolver(Cube(cube_str), collect_stats=True)
+        recursive.solve(max_length=21)
+        iterative = KociembaSolver(Cube(cube_str), "iterative", collect_stats=True)
+        iterative.solve(max_length=21)
+
+        stats = recursive.stats
+        self.assertEqual(stats[:5], iterative.stats[:5])
+        self.assertEqual(stats.table_lookups, iterative.stats.table_lookups)
+        self.assertEqual(
+            [sum(stats.phase_1_nodes), sum(stats.phase_2_nodes)], recursive.nodes
+        )
+        for nodes, evaluations in [
+            (stats.phase_1_nodes, stats.phase_1_evaluations),
+            (stats.phase_2_nodes, stats.phase_2_evaluations),
+        ]:
+            self.assertTrue(all(n <= e for n, e in zip(nodes, evaluations)))
+        self.assertGreater(stats.phase_1_solutions, 1)
+        self.assertLessEqual(
+            stats.phase_2_entry_time + stats.phase_2_search_time, stats.search_time
+        )
+
+
+class TestParallelKociembaSolver(TestCase):
+    def test_solve(self):
+        cube = Cube("OBBOBRBYOGYYBOOBOGOBWBWYWWGBGRRRWOORYWYRYRYGWRGWGGWRYG")
+        solver = ParallelKociembaSolver(cube, workers=2)
+        solver.solve()
+        self.assertEqual(cube.is_solved(), True)
+
+    def test_max_length(self):
+        cube = Cube("OBBOBRBYOGYYBOOBOGOBWBWYWWGBGRRRWOORYWYRYRYGWRGWGGWRYG")
+        solver = ParallelKociembaSolver(cube, workers=3)
+        solver.solve(max_length=21)
+        self.assertEqual(cube.is_solved(), True)
+        self.assertLessEqual(len(solver.moves), 21)
+
+    def test_timeout(self):
+        search_part = parallelsolver._search_part
+
+        def slow_search_part(facelets, engine, first_moves, *args):
+            # Stands in for a process that finds no solution of its own until it is stopped
+            if 0 in first_moves:
+                stop = SharedMemory(args[2])
+                start = time()
+                while not stop.buf[0] and time() < start + 10:
+                    sleep(0.01)
+                stop.close()
+            return search_part(facelets, engine, first_moves, *args)
+
+        cube = Cube("OBBOBRBYOGYYBOOBOGOBWBWYWWGBGRRRWOORYWYRYRYGWRGWGGWRYG")
+        with ThreadPoolExecutor(3) as executor, patch.object(
+            parallelsolver, "_search_part", slow_search_part
+        ):
+            solver = ParallelKociembaSolver(cube, workers=3, executor=executor)
+            start = time()
+            solver.solve(timeout_ms=500)
+
+        self.assertEqual(cube.is_solved(), True)
+        self.assertLess(time() - start, 2)
+
+
+class TestSolveMany(TestCase):
+    def test_solve_many(self):
+        cubes = [Cube() for i in range(20)]
+        cube_strs = [str(cube) for cube in cubes] + ["R" * 54]
+        results = list(solve_many(cube_strs, workers=2, chunk_size=3, max_pending=2))
+
+        self.assertEqual(sorted(result.index for result in results), list(range(21)))
+        for result in results:
+            if result.index == 20:
+                self.assertIsNotNone(result.error)
+                continue
+
+            self.assertIsNone(result.error)
+            cube = Cube(result.cube_str)
+            cube.apply(result.moves)
+            self.assertTrue(cube.is_solved())
+
+    def test_time_limit(self):
+        cube_str = "OBBOBRBYOGYYBOOBOGOBWBWYWWGBGRRRWOORYWYRYRYGWRGWGGWRYG"
+        # No solution this short is found in time, but longer ones are
+        result = solve_cube(cube_str, max_length=12, time_limit_ms=3000)
+
+        self.assertIsNone(result.error)
+        self.assertGreater(len(result.moves), 12)
+        cube = Cube(cube_str)
+        cube.apply(result.moves)
+        self.assertTrue(cube.is_solved())
+
+
+class TestSolutionCache(TestCase):
+    CUBE_STR = "OBBOBRBYOGYYBOOBOGOBWBWYWWGBGRRRWOORYWYRYRYGWRGWGGWRYG"
+
+    def test_symmetric_cubes(self):
+        cache = SolutionCache()
+        solver = KociembaSolver(Cube(self.CUBE_STR), cache=cache)
+        solver.solve()
+
+        # Every rotation of the cube in other colors shares the solution
+        recolor = str.maketrans(COLORS, "GYORBW")
+        for rotation in ROTATIONS:
+            rotated = Cube.from_facelets(Cube(self.CUBE_STR).facelets[rotation])
+            cube = Cube(str(rotated).translate(recolor))
+            moves = cache.get(cube)
+            self.assertEqual(len(moves), len(solver.moves))
+            cube.apply(moves)
+            self.assertTrue(cube.is_solved())
+
+        self.assertEqual(cache.hits, 24)
+        self.assertEqual(cache.misses, 1)
+        self.assertIsNone(
+            cache.get(Cube(self.CUBE_STR), max_length=len(solver.moves) - 1)
+        )
+
+    def test_target_length(self):
+        cache = SolutionCache()
+        first = KociembaSolver(Cube(self.CUBE_STR), cache=cache)
+        first.solve()
+
+        # A search for the shortest solution in the time given does not settle for this one
+        KociembaSolver(Cube(self.CUBE_STR), cache=cache).solve(timeout_ms=100)
+        self.assertEqual(cache.hits, 0)
+        solver = KociembaSolver(Cube(self.CUBE_STR), cache=cache)
+        solver.solve(max_length=len(first.moves))
+        self.assertEqual(cache.hits, 1)
+
+    def test_threads(self):
+        with TemporaryDirectory() as directory:
+            cache = SolutionCache(filename=os.path.join(directory, "solutions.db"))
+            scrambles = [["R"], ["U"], ["F2"], ["L", "D"], ["D'"], ["B", "U2"]]
+            solutions = [["R'"], ["U'"], ["F2"], ["D'", "L'"], ["D"], ["U2", "B'"]]
+            cubes = []
+            for moves in scrambles:
+                cube = Cube("".join(color * 9 for color in COLORS))
+                cube.apply(moves)
+                cubes.append(cube)
+
+            with ThreadPoolExecutor(3) as executor:
+                list(executor.map(cache.put, cubes, solutions))
+                cached = list(executor.map(cache.get, cubes))
+
+            for cube, moves in zip(cubes, cached):
+                cube.apply(moves)
+                self.assertTrue(cube.is_solved())
+
+    def test_eviction(self):
+        cache = SolutionCache(max_size=2, ttl=0)
+        cubes = [Cube() for i in range(3)]
+        for cube in cubes:
+            cache.put(cube, ["U"])
+
+        self.assertEqual(cache.evictions, 1)
+        # The entries expire straight away
+        self.assertIsNone(cache.get(cubes[2]))
+        self.assertEqual(cache.evictions, 2)
+
+    def test_disk(self):
+        with TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "solutions.db")
+            solver = KociembaSolver(
+                Cube(self.CUBE_STR), cache=SolutionCache(filename=filename)
+            )
+            solver.solve()
+
+            cache = SolutionCache(filename=filename)
+            self.assertEqual(cache.get(Cube(self.CUBE_STR)), solver.moves)
@@ -0,0 +1,187 @@
+import os
+import subprocess
+import sys
+import numpy as np
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+from rubik.cubes import CubieCube, PruningTable, Tables, tablegen
+from rubik.cubes.tablestore import load_table_store, write_table_store
+
+
+# Loads the tables in the directory given as the first argument, generating a small fake table
+# instead of the real ones, slowly enough for concurrent loads to overlap
+_FAKE_GENERATION = """
+import sys, time
+import numpy as np
+from unittest.mock import patch
+from rubik.cubes import Tables, tablegen
+
+def generate_tables(report=None):
+    time.sleep(0.5)
+    return {"fake": np.arange(10)}
+
+with patch.dict(tablegen.TABLES, {"fake": None}, clear=True), patch(
+    "rubik.cubes.tables.generate_tables", generate_tables
+), patch.object(Tables, "_assign_tables"):
+    Tables.load_tables(sys.argv[1])
+"""
+
+
+class TestTableStore(TestCase):
+    def test_round_trip(self):
+        tables = {
+            "moves": np.arange(18 * 5, dtype=np.int16).reshape(5, 18),
+            "prune": np.array([0, 1, 2, -1], dtype=np.int8),
+        }
+
+        with TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "tables.bin")
+            write_table_store(filename, tables)
+            loaded = load_table_store(filename)
+
+            for name, table in tables.items():
+                self.assertEqual(loaded[name].dtype, table.dtype)
+                self.assertTrue(np.array_equal(loaded[name], table))
+            del loaded
+
+    def test_corrupted_store(self):
+        with TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "tables.bin")
+            write_table_store(filename, {"prune": np.zeros(128, dtype=np.int8)})
+
+            with open(filename, "r+b") as f:
+                f.seek(-1, os.SEEK_END)
+                f.write(b"\x01")
+
+            with self.assertRaises(ValueError):
+                load_table_store(filename)
+
+
+class TestTableGeneration(TestCase):
+    def test_move_tables_match_cubie_cube(self):
+        twist_move = tablegen.make_twist_move()
+        udslice_move = tablegen.make_udslice_move()
+        corner_move = tablegen.make_corner_move()
+
+        for coordinate in (0, 17, 494):
+            for face in range(6):
+                cube = CubieCube()
+                cube.phase_1_corner = coordinate
+                cube.phase_1_ud_slice = coordinate
+                cube.phase_2_corner = coordinate
+                cube.move(face)
+
+                self.assertEqual(twist_move[coordinate][3 * face], cube.phase_1_corner)
+                self.assertEqual(
+                    udslice_move[coordinate][3 * face], cube.phase_1_ud_slice
+                )
+                self.assertEqual(corner_move[coordinate][3 * face], cube.phase_2_corner)
+
+    def test_phase_2_entry_tables(self):
+        sorted_edges_move = tablegen.make_sorted_edges_move()
+        edge8_merge = tablegen.make_edge8_merge()
+        cube = CubieCube()
+        coordinates = [cube.slice_sorted, cube.u_edges, cube.d_edges]
+
+        # The T permutation (R U R' U' R' F R2 U' R' U' R U R' F') leaves phase 2 and comes back
+        for move_num in (3, 0, 5, 2, 5, 6, 4, 2, 5, 2, 3, 0, 5, 8):
+            for i in range(move_num % 3 + 1):
+                cube.move(move_num // 3)
+            coordinates = [sorted_edges_move[x][move_num] for x in coordinates]
+            self.assertEqual(
+                coordinates, [cube.slice_sorted, cube.u_edges, cube.d_edges]
+            )
+
+        slice_sorted, u_edges, d_edges = coordinates
+        self.assertEqual(slice_sorted, cube.phase_2_ud_slice)
+        self.assertEqual(edge8_merge[24 * u_edges + d_edges % 24], cube.phase_2_edge)
+
+    def test_pruning_table(self):
+        edge4_move = tablegen.make_edge4_move()
+        corner_move = tablegen.make_corner_move()
+        prune = PruningTable(
+            tablegen.make_edge4_corner_prune(edge4_move, corner_move), 40320, bits=4
+        )
+
+        self.assertEqual(prune[0, 0], 0)
+        # R2 from the solved state needs exactly one move to undo
+        self.assertEqual(prune[edge4_move[0][4], corner_move[0][4]], 1)
+
+    def test_packed_pruning_tables(self):
+        distances = np.array([0, 1, 2, 3, 4, 17, -1], dtype=np.int8)
+        nibbles = PruningTable(tablegen.pack_nibbles(distances), 7, bits=4)
+        remainders = PruningTable(tablegen.pack_mod3(distances), 7, bits=2, modulus=3)
+
+        self.assertEqual([nibbles[0, i] for i in range(7)], [0, 1, 2, 3, 4, 15, 15])
+        self.assertEqual([remainders[0, i] for i in range(7)], [0, 1, 2, 0, 1, 2, 3])
+
+    def test_symmetry_classes(self):
+        corner_class = tablegen.make_corner_class()
+        corner_rep = tablegen.make_corner_rep(corner_class)
+        conjugates = tablegen._corner_conjugates(np.arange(tablegen.CORNER))
+
+        self.assertEqual(len(corner_rep), tablegen.CORNER_CLASSES)
+        self.assertEqual(
+            len(tablegen.make_flipslice_rep(tablegen.make_flipslice_class())),
+            tablegen.FLIPSLICE_CLASSES,
+        )
+        # Every coordinate is conjugated to the representative of its class
+        classes, symmetries = np.divmod(corner_class, 16)
+        self.assertTrue(
+            np.array_equal(
+                conjugates[np.arange(tablegen.CORNER), symmetries], corner_rep[classes]
+            )
+        )
+
+    def test_parallel_generation(self):
+        # The symmetry-reduced pruning tables take a while, so only the smaller tables are
+        # compared
+        small = {
+            name: spec
+            for name, spec in tablegen.TABLES.items()
+            if not name.endswith("prune") or name == "edge4_corner_prune"
+        }
+
+        with patch.dict(tablegen.TABLES, small, clear=True):
+            sequential = tablegen.generate_tables()
+            parallel = tablegen.generate_tables_parallel(workers=2)
+
+        for name, table in sequential.items():
+            self.assertTrue(np.array_equal(table, parallel[name]))
+
+
+class TestTableCache(TestCase):
+    def test_tables_filename(self):
+        with TemporaryDirectory() as directory:
+            self.assertEqual(
+                Tables.tables_filename(directory), os.path.join(directory, "tables.bin")
+            )
+
+            with patch.dict(os.environ, {"RUBIK_TABLES_DIR": directory}):
+                self.assertEqual(
+                    Tables.tables_filename(), os.path.join(directory, "tables.bin")
+                )
+
+    def test_concurrent_loads_generate_once(self):
+        with TemporaryDirectory() as directory:
+            processes = [
+                subprocess.Popen(
+                    [
+                        sys.executable,
+                        "-c",
+                        _FAKE_GENERATION,
+                        directory,
+                    ],
+                    stdout=subprocess.PIPE,
+                    text=True,
+                )
+                for i in range(3)
+            ]
+            outputs = [process.communicate()[0] for process in processes]
+
+            self.assertTrue(all(process.returncode == 0 for process in processes))
+            self.assertEqual(
+                sum("Generating move and pruning tables" in out for out in outputs), 1
+            )
+            self.assertFalse([f for f in os.listdir(directory) if f.endswith(".tmp")])